@@ -5,13 +5,25 @@ import asyncio
 import click
 
 from rkiv.arm.tui import ARMUserInterface
+from rkiv.titleselect import TitleRules
 
 # from pydvdid import compute  # type: ignore
 
 
 @click.command()
 # @click.option("-d", "--dev", required=True)
-def arm():
+@click.option(
+    "-b",
+    "--backup-first",
+    is_flag=True,
+    default=False,
+    help="Decrypt each disc to the workspace and eject it, then remux the titles from the backup",
+)
+@click.option("-w", "--remux-workers", default=4, help="Titles remuxed at once from a backup")
+@click.option("--rerip", is_flag=True, default=False, help="Rip discs whose fingerprint is already in the archive")
+@click.option("--extras", is_flag=True, default=False, help="Also rip titles that are not the feature or an episode")
+@click.option("--all-titles", is_flag=True, default=False, help="Rip every title, no title selection")
+def arm(backup_first: bool, remux_workers: int, rerip: bool, extras: bool, all_titles: bool):
     """arm"""
 
     # get_disc_type
@@ -27,6 +39,10 @@ def arm():
     # print(json.dumps(json.loads(dvd_xml), indent=4))
     try:
         ui = ARMUserInterface()
+        ui.backup_first = backup_first
+        ui.remux_workers = remux_workers
+        ui.skip_archived = not rerip
+        ui.title_rules = None if all_titles else TitleRules(extras=extras)
         asyncio.run(ui.run())
     except KeyboardInterrupt:
         asyncio.run(ui.shutdown())
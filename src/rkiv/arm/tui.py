@@ -12,7 +12,10 @@ from enum import Enum
 import click
 
 from rkiv.arm import UserInput, UserInputRequest, DriveManagerStatus, DriveManagerState
-from rkiv.makemkv import MakeMKVInfo, MakeMKVRipper
+from rkiv.fingerprint import disc_fingerprint
+from rkiv.inventoryindex import InventoryIndex
+from rkiv.makemkv import MakeMKVInfo, MakeMKVRipper, classify_output
+from rkiv.titleselect import TitleRules, TitleSelection, select_titles
 from rkiv.opticaldevices import OpticalDrive, get_optical_drives
 from rkiv.video import RipperStatus, RipperMessage, Notification
 from rkiv.config import Config
@@ -69,6 +72,11 @@ class ARMUserInterface:
     drive_status: dict[str, DriveManagerStatus] = {}
     notifications: list[Notification] = []
     disc_manger_tasks: list[Task] = []
+    remux_tasks: list[Task] = []
+    backup_first: bool = False
+    remux_workers: int = 4
+    skip_archived: bool = True
+    title_rules: TitleRules | None = TitleRules()
     _shutdown_signal: bool = False
 
     def get_drive_status(self, drive: OpticalDrive) -> DriveManagerStatus:
@@ -334,18 +342,31 @@ class ARMUserInterface:
         Parse makemkv output prior to dumping in log file
         """
 
-        # Grep for error
-        errors = [line for line in output.splitlines() if "error" in line.lower()]
-        if len(errors) > 0:
-            _notification = Notification(drive_name=drive.device_name, disc_name=user_input.name, problems=errors)
+        problems = [i.line for i in classify_output(output.splitlines())]
+        if len(problems) > 0:
+            _notification = Notification(drive_name=drive.device_name, disc_name=user_input.name, problems=problems)
             self.notifications.append(_notification)
 
-        # Grep for fail, exclude makemkv's drive read fails
-        exclude = "Failed to get full access to drive"
-        failures = [line for line in output.splitlines() if "fail" in line.lower() and exclude not in line]
-        if len(failures) > 0:
-            _notification = Notification(drive_name=drive.device_name, disc_name=user_input.name, problems=failures)
-            self.notifications.append(_notification)
+    async def remux_backup(
+        self, backup: Path, selection: TitleSelection | None, user_input: UserInput, drive: OpticalDrive
+    ) -> None:
+        """
+        Remux the selected titles of a decrypted backup, progress is not shown since the drive has moved on. Nothing
+        awaits the task until shutdown, so a remux that raises or is cancelled is notified here instead of lost.
+        """
+
+        event_loop = asyncio.get_event_loop()
+        ripper = MakeMKVRipper(stage="remux", progress=0.0, drive=drive, progress_callback=lambda *_: None)
+        try:
+            out = await ripper.remux(input=user_input, backup=backup, selection=selection, workers=self.remux_workers)
+        except asyncio.CancelledError:
+            self.parse_makemkv_output(
+                f"rkiv: remux failed, interrupted, the backup is kept at {backup}", user_input, drive
+            )
+            raise
+        except Exception as e:
+            out = f"rkiv: remux failed, {e!r}, the backup is kept at {backup}"
+        await event_loop.run_in_executor(None, self.parse_makemkv_output, out, user_input, drive)
 
     async def drive_manager(self, drive: OpticalDrive) -> None:
         """ """
@@ -356,6 +377,21 @@ class ARMUserInterface:
         while not self._shutdown_signal:
             mount_location = await event_loop.run_in_executor(None, drive.get_mount_location)
             if mount_location != "":
+                fingerprint = await event_loop.run_in_executor(None, disc_fingerprint, drive)
+                if fingerprint is not None and self.skip_archived:
+                    archived = await event_loop.run_in_executor(None, InventoryIndex().find_fingerprint, fingerprint)
+                    if len(archived) > 0:
+                        self.notifications.append(
+                            Notification(
+                                drive_name=drive.device_name,
+                                disc_name=mount_location,
+                                problems=[f"Already archived at {path}" for path in archived],
+                            )
+                        )
+                        await event_loop.run_in_executor(None, subprocess.run, ["eject", str(drive.device_path)])
+                        await asyncio.sleep(0.5)
+                        continue
+
                 mkvinfo = await event_loop.run_in_executor(None, MakeMKVInfo.scan_disc, drive)
                 request = UserInputRequest(
                     device_name=drive.device_name,
@@ -373,9 +409,33 @@ class ARMUserInterface:
                 ripper = MakeMKVRipper(stage="", progress=0.0, drive=drive, progress_callback=self.set_drive_progress)
                 self.set_drive_status(drive, DriveManagerStatus(DriveManagerState.RIPPING, 0.0))
 
-                out = await ripper.extract(input=user_input, drive=drive)
-                await event_loop.run_in_executor(None, self.parse_makemkv_output, out, user_input, drive)
-                self.set_drive_status(drive, DriveManagerStatus(DriveManagerState.WAITING, 0.0))
+                # Every title is ripped with selection turned off or when the rules select nothing
+                selection = None if self.title_rules is None else select_titles(mkvinfo, self.title_rules)
+                if selection is not None and len(selection.selected) == 0:
+                    self.notifications.append(
+                        Notification(
+                            drive_name=drive.device_name,
+                            disc_name=user_input.name,
+                            problems=["No titles were selected, ripping every title"],
+                        )
+                    )
+                    selection = None
+                if self.backup_first:
+                    backup, out = await ripper.backup(input=user_input, drive=drive)
+                    await event_loop.run_in_executor(None, self.parse_makemkv_output, out, user_input, drive)
+                    self.set_drive_status(drive, DriveManagerStatus(DriveManagerState.WAITING, 0.0))
+                    # The drive takes the next disc while the titles are remuxed from the backup
+                    self.remux_tasks.append(
+                        asyncio.create_task(self.remux_backup(backup, selection, user_input, drive))
+                    )
+                else:
+                    out = await ripper.extract(input=user_input, drive=drive, selection=selection)
+                    await event_loop.run_in_executor(None, self.parse_makemkv_output, out, user_input, drive)
+                    self.set_drive_status(drive, DriveManagerStatus(DriveManagerState.WAITING, 0.0))
+
+                if fingerprint is not None:
+                    _, output, _ = MakeMKVRipper.rip_paths(user_input)
+                    await event_loop.run_in_executor(None, InventoryIndex().add_fingerprint, output, fingerprint)
 
             await asyncio.sleep(0.5)
 
@@ -441,6 +501,15 @@ class ARMUserInterface:
         for disc_manger_task in self.disc_manger_tasks:
             click.echo(f"{disc_manger_task} done: {disc_manger_task.done()}")
 
+        # Remuxes left running finish before the notifications are dumped, their problems are notified by the task
+        pending = [t for t in self.remux_tasks if not t.done()]
+        if len(pending) > 0:
+            click.echo(f"Waiting for {len(pending)} remuxes to finish...")
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        for remux_task in self.remux_tasks:
+            click.echo(f"{remux_task} done: {remux_task.done()}")
+
         click.echo("")
         self.notification_dump()
 
@@ -18,8 +18,7 @@ from rkiv import __version__
 from rkiv.config import Config
 from rkiv.audio import auto_audio_ripper, audio_rip_dash
 from rkiv import opticaldevices
-from rkiv.inventory import ArchivedDisc, MediaCategory
-from rkiv.makemkv import MakeMKV, extract_mkv
+from rkiv.inventory import MediaCategory
 from rkiv.dgmap import DiscGroupMap
 
 CONFIG = Config()
@@ -66,13 +65,15 @@ def dgmap(directory: str) -> None:
 
 
 @cli.command()
-def unreleased() -> None:
+@click.option("--full", is_flag=True, default=False, help="Rescan every directory instead of using the index")
+@click.option("-s", "--min-score", default=80, help="Show stream titles scoring at least this as near misses")
+def unreleased(full: bool, min_score: int) -> None:
     """
     Find any unreleased media (Movies and TV) not in the Stream
     """
     from rkiv.inventory import Inventory
 
-    inventory = Inventory.take_inventory()
+    inventory = Inventory.take_inventory(full=full)
 
     click.echo("")
     click.echo(f"Archived Discs:    {len(inventory.video_archive)}")
@@ -81,12 +82,19 @@ def unreleased() -> None:
     click.echo(f"Unreleased Movies: {len(inventory.unreleased_movies)}")
     click.secho("\nUnreleased Movies", bold=True)
 
+    def _echo_unreleased(disc) -> None:
+        near_miss = inventory.near_miss(disc)
+        if near_miss is not None and near_miss.score >= min_score:
+            click.echo(f"{disc.title}  (near miss: {near_miss.match_name} {near_miss.score})")
+        else:
+            click.echo(disc.title)
+
     for movie in inventory.unreleased_movies:
-        click.echo(movie.title)
+        _echo_unreleased(movie)
 
     click.secho("\nUnreleased TV Shows", bold=True)
     for show in inventory.unreleased_tv:
-        click.echo(show.title)
+        _echo_unreleased(show)
 
 
 @cli.command()
@@ -142,15 +150,137 @@ def video(drive: str):
     auto_video_ripper.run()
 
 
-@cli.command()
-def inventory() -> None:
-    """inventory"""
+@cli.group(invoke_without_command=True)
+@click.option("-r", "--refresh", is_flag=True, default=False, help="Walk the archive and write a new snapshot")
+@click.option("-w", "--workers", default=16, help="Number of discs sized at once")
+@click.pass_context
+def inventory(ctx: click.Context, refresh: bool, workers: int) -> None:
+    """
+    Stats summary of the archive, computed from the archive snapshot
+    """
+    if ctx.invoked_subcommand is not None:
+        return None
+
+    from rkiv.inventory import DiscArchiveDataFrame
+    from rkiv.inventoryindex import InventoryIndex
+
+    snapshot = DiscArchiveDataFrame.snapshot_path()
+    index = InventoryIndex()
+
+    if refresh or not snapshot.exists():
+        click.secho("Walking the Archive", bold=True)
+        archived_discs = []
+        for scan in index.walk_disc_archives(root_paths=CONFIG.video_archives):
+            archived_discs += scan.discs
+            click.echo(f"  [{len(scan.discs)}] {scan.root_path} ({scan.seconds:.2f}s)")
+        index.save()
+
+        click.secho("Sizing the Archive", bold=True)
+        start = time.perf_counter()
+        sizes = index.disc_sizes(archived_discs, max_workers=workers)
+        click.echo(f"  Walked {index.sized} of {len(archived_discs)} discs ({time.perf_counter() - start:.2f}s)")
+
+        archive = DiscArchiveDataFrame.from_archive_list(archived_discs)
+        archive.df["size_bytes"] = [sizes[d.path] for d in archived_discs]
+        archive.to_parquet(snapshot)
+
+    archive = DiscArchiveDataFrame.from_parquet(snapshot, columns=["title", "category", "type", "size_bytes"])
+    titles = archive.title_counts()
+
+    def tb(size: float) -> str:
+        return f"{size / 1024**4:.2f} TB"
+
+    click.secho(f"\nArchive ({snapshot})", bold=True)
+    click.echo(f"Discs:     {len(archive.df)}")
+    click.echo(f"Movies:    {titles[MediaCategory.MOVIE.value]}")
+    click.echo(f"TV Shows:  {titles[MediaCategory.TV.value]}")
+    click.echo(f"Size:      {tb(archive.df['size_bytes'].sum())}")
+    click.echo(f"Streaming: {len(index.stream_objects())}")
+
+    click.secho("\nDiscs by category and type", bold=True)
+    click.echo(archive.disc_counts().to_string())
+
+    for column in ("category", "type"):
+        click.secho(f"\nSize by {column}", bold=True)
+        for name, size in archive.size_by(column).items():
+            click.echo(f"  {name : <10} {tb(size)}")
+
+
+@inventory.command()
+@click.option("-s", "--settle", default=2.0, help="Seconds to wait for a burst of changes to settle before walking")
+def watch(settle: float) -> None:
+    """
+    Keep the inventory live with inotify and serve it to other rkiv commands (Linux only)
+    """
+    from rkiv.inventorywatch import watch_inventory
+
+    watch_inventory(settle_seconds=settle)
+
+
+@inventory.command()
+@click.option("-w", "--workers", default=16, help="Number of discs fingerprinted at once")
+def duplicates(workers: int) -> None:
+    """
+    Discs archived more than once, matched on their disc fingerprint
+    """
+    from rkiv.fingerprint import duplicate_discs
+    from rkiv.inventoryindex import InventoryIndex
+
+    index = InventoryIndex()
+    archived_discs = [d for scan in index.walk_disc_archives(root_paths=CONFIG.video_archives) for d in scan.discs]
+    index.save()
+
+    start = time.perf_counter()
+    fingerprints = index.disc_fingerprints(archived_discs, max_workers=workers)
     click.echo(
-        "Stats summary (archive and stream): number of discs in archive, number of movies, number of shows, size"
+        f"Fingerprinted {index.fingerprinted} of {len(archived_discs)} discs ({time.perf_counter() - start:.2f}s)"
     )
-    click.echo("list of unreleased movies and tv shows by season")
-    pass
-    # stat
+
+    groups = duplicate_discs(fingerprints)
+    for group in groups:
+        click.secho(f"\n{fingerprints[group[0]]}", bold=True)
+        for path in group:
+            click.echo(f"  {path}")
+
+    unreadable = sum(1 for fp in fingerprints.values() if fp is None)
+    click.echo(f"\n{len(groups)} duplicated discs, {unreadable} discs could not be fingerprinted")
+
+
+@cli.group(invoke_without_command=True)
+@click.option("--reset", is_flag=True, default=False, help="Zero the hit and miss counts after printing them")
+@click.pass_context
+def scancache(ctx: click.Context, reset: bool) -> None:
+    """
+    Hit rates of the MakeMKV and HandBrake disc scan cache
+    """
+    if ctx.invoked_subcommand is not None:
+        return None
+
+    from rkiv.scancache import ScanCache
+
+    cache = ScanCache()
+    click.secho(f"Scan Cache ({cache.path})", bold=True)
+    for stats in cache.stats():
+        click.echo(
+            f"  {stats.tool:<12} {stats.entries:>5} scans  {stats.hits:>5} hits  {stats.misses:>5} misses  "
+            f"{stats.hit_rate:>6.1%}  {stats.seconds_saved / 60:.1f} min saved"
+        )
+
+    if reset:
+        cache.reset_stats()
+
+
+@scancache.command()
+@click.option("-t", "--tool", default=None, help="Only clear scans by this tool (makemkvcon, HandBrakeCLI)")
+@click.option("-p", "--path", default=None, help="Only clear scans of discs under this directory")
+def clear(tool: Optional[str], path: Optional[str]) -> None:
+    """
+    Invalidate cached scans
+    """
+    from rkiv.scancache import ScanCache
+
+    removed = ScanCache().invalidate(tool=tool, path=None if path is None else Path(path).absolute())
+    click.echo(f"Removed {removed} cached scans")
 
 
 @cli.group()
@@ -212,89 +342,284 @@ def release(collection: str, number: int, exclude: Optional[str]) -> None:
 @cli.command()
 @click.option("-c", "--collection", is_flag=False, default=None, help="Exctract archived discs found here")
 @click.option("-o", "--output", is_flag=False, default=None, help="Store .mkv files here")
-def extract(collection: str, output: str):
+@click.option("--full", is_flag=True, default=False, help="Rescan every directory instead of using the index")
+@click.option("-w", "--workers", default=4, type=click.IntRange(min=1), help="Number of discs extracted at once")
+@click.option(
+    "--per-source",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Discs scanned or extracted at once from the same source filesystem",
+)
+@click.option(
+    "--per-destination",
+    default=2,
+    type=click.IntRange(min=1),
+    help="Discs extracted at once to the same destination filesystem",
+)
+@click.option("--progress-seconds", default=10.0, help="Seconds between progress lines of the running extractions")
+def extract(
+    collection: str,
+    output: str,
+    full: bool,
+    workers: int,
+    per_source: int,
+    per_destination: int,
+    progress_seconds: float,
+):
     """
     Extracts mkv files from disc media. Defaults to searching for main feature.
     Checks consensus between handbrake and longest title
     """
+    import threading
+    from rkiv.inventoryindex import InventoryIndex
+    from rkiv.extractscheduler import ExtractJob, ExtractProgress, ExtractScheduler, JobStatus
 
     # TODO walk_sl can be used to filter
     # walk_sl = StreamObject.walk_stream_library(
     #     root_path=CONFIG.video_streams[0]
     # ) + StreamObject.walk_stream_library(root_path=CONFIG.video_streams[1])
-    walk_ark = ArchivedDisc.walk_disc_archive(Path(collection))
-
     # stream_matches = {i.match_name for i in walk_sl}
-    # unextracted = [i for i in walk_ark if i.path.parent.stem not in stream_matches]
 
-    movies = [i for i in walk_ark if i.category == MediaCategory.MOVIE and "_D01" in i.path.stem]
-    for disc in movies:
-        print(f"{disc.title} - {disc.path.parent.stem} - {disc.path}")
-        title = MakeMKV.get_main_title(disc)
-        print(f"  Title: {title.id} Chapters: {title.chapters} Length: {title.length} Aspect: {title.aspect_ratio}")
-        extract_mkv(disc, Path(output), title.id)
+    index = InventoryIndex(full=full)
+    # Discs are scanned and extracted as the walk finds them rather than after the whole collection has been listed
+    discs = (
+        disc
+        for disc in index.iter_disc_archive(Path(collection))
+        if disc.category == MediaCategory.MOVIE and "_D01" in disc.path.stem
+    )
+
+    lock = threading.Lock()
+    extracting: dict[str, ExtractJob] = {}
+    last_shown = [time.monotonic()]
+
+    def _echo_job(job: ExtractJob, progress: ExtractProgress) -> None:
+        with lock:
+            if job.status == JobStatus.EXTRACTING:
+                extracting[job.disc.title] = job
+            else:
+                extracting.pop(job.disc.title, None)
+
+        if job.status == JobStatus.EXTRACTING:
+            assert job.title is not None
+            click.echo(
+                f"{progress} {job.disc.title} - Title: {job.title.id} Chapters: {job.title.chapters} "
+                f"Length: {job.title.length} Aspect: {job.title.aspect_ratio}"
+            )
+        elif job.status in (JobStatus.DONE, JobStatus.FAILED):
+            click.echo(f"{progress} {job.disc.title} - {job.status.value} ({job.seconds:.0f}s)")
+
+    def _echo_progress(job: ExtractJob) -> None:
+        with lock:
+            if time.monotonic() - last_shown[0] < progress_seconds:
+                return None
+            last_shown[0] = time.monotonic()
+            click.echo("  " + "  ".join(f"{j.disc.title} {j.progress:.0%}" for j in extracting.values()))
+
+    scheduler = ExtractScheduler(
+        output=Path(output), workers=workers, per_source=per_source, per_destination=per_destination
+    )
+    jobs = scheduler.run(discs, on_update=_echo_job, on_progress=_echo_progress)
+    index.save()
+
+    failed = [job for job in jobs if job.status == JobStatus.FAILED]
+    click.secho(f"\nExtracted {len(jobs) - len(failed)} of {len(jobs)} discs", bold=True)
+    for job in failed:
+        click.secho(f"{job.disc.title} - {job.disc.path}", fg="red")
+        for problem in job.problems:
+            click.echo(f"  {problem}")
+
+
+@cli.group()
+def replay() -> None:
+    """
+    Stand-in makemkvcon, HandBrakeCLI and eject that replay recorded output
+    """
+
+
+@replay.command(context_settings={"ignore_unknown_options": True})
+@click.option("-r", "--recordings", required=True, help="Directory the recording is saved to")
+@click.argument("args", nargs=-1, type=click.UNPROCESSED, required=True)
+def record(recordings: str, args: tuple[str, ...]) -> None:
+    """
+    Run a real tool and save its output for replay, e.g. rkiv replay record -r recs -- makemkvcon -r info disc:0
+    """
+    from rkiv.replay import record as record_run
+
+    recording = record_run(list(args), Path(recordings))
+    click.echo(
+        f"Recorded {recording.tool} {recording.command}: {len(recording.stdout)} stdout and "
+        f"{len(recording.stderr)} stderr lines over {recording.seconds:.1f}s"
+    )
+
+
+@replay.command()
+@click.option("-d", "--directory", required=True, help="Write the stand-ins here")
+@click.option("-r", "--recordings", default=None, help="Directory of recordings, synthesized output without")
+@click.option("-s", "--speed", default=1.0, help="Replay this many times faster than recorded")
+@click.option("-e", "--error", "errors", multiple=True, type=int, help="MSG code of an error to inject")
+def shims(directory: str, recordings: Optional[str], speed: float, errors: tuple[int, ...]) -> None:
+    """
+    Write the stand-ins, put the directory first on PATH to use them
+    """
+    from rkiv.replay import write_shims
+
+    path = Path(directory).absolute()
+    write_shims(path, recordings=None if recordings is None else Path(recordings), speed=speed, errors=list(errors))
+    click.echo(f'export PATH="{path}:$PATH"')
+
+
+@replay.command()
+@click.option("-n", "--drives", default=4, help="Number of simulated drives")
+@click.option("-r", "--recordings", default=None, help="Directory of recordings, synthesized output without")
+@click.option("-s", "--speed", default=1.0, help="Replay this many times faster than recorded")
+def rip(drives: int, recordings: Optional[str], speed: float) -> None:
+    """
+    Time ARM rips on simulated drives against the stand-ins
+    """
+    import asyncio
+    import tempfile
+    from rkiv.replay import replay_rips, replay_sandbox, simulated_drives, write_shims
+
+    with tempfile.TemporaryDirectory() as tmp, replay_sandbox(Path(tmp)) as bin_dir:
+        write_shims(bin_dir, recordings=None if recordings is None else Path(recordings), speed=speed)
+
+        start = time.perf_counter()
+        seconds = asyncio.run(replay_rips(simulated_drives(drives, Path(tmp))))
+        total = time.perf_counter() - start
+
+    for name, busy in seconds.items():
+        click.echo(f"  {name}  {busy:.2f}s")
+    click.echo(f"{drives} discs in {total:.2f}s ({drives / total * 3600:.0f} discs per hour)")
 
 
 @cli.command()
 @click.option("-c", "--collection", is_flag=False, default=None, help="Directory containing video files")
 @click.option("-o", "--output", is_flag=False, help="Output directory")
-def h265(collection: str, output: str):
+@click.option("-j", "--jobs", default=2, help="Number of files encoded at once")
+@click.option("-k", "--chunks", default=1, help="Encode each file as up to this many chapter ranges at once")
+@click.option(
+    "-t", "--threads", default=None, type=int, help="x265 threads per HandBrakeCLI, cores / (jobs * chunks) by default"
+)
+@click.option("--progress-seconds", default=30.0, help="Seconds between progress lines of the running encodes")
+def h265(collection: str, output: str, jobs: int, chunks: int, threads: int | None, progress_seconds: float):
     """
     Mirrors the collectoion directory with h265 encoded files
     """
+    from rkiv.encode import EncodeJob, EncodeProgress, EncodeScheduler, EncodeStatus
+
+    scheduler = EncodeScheduler(
+        collection=Path(collection), output=Path(output), jobs=jobs, chunks=chunks, threads=threads
+    )
+    click.secho(f"Planning {scheduler.collection} -> {scheduler.output}", bold=True)
+    planned = scheduler.plan()
+    skipped = sum(1 for job in planned if job.status == EncodeStatus.SKIPPED)
+    click.echo(f"  {len(planned)} files, {skipped} already encoded ({scheduler.manifest.path})")
+    click.echo(
+        f"  {scheduler.jobs} encodes at once in up to {scheduler.chunks} chunks with {scheduler.threads} threads each"
+    )
+
+    last_shown = [time.monotonic()]
+
+    def _echo_job(job: EncodeJob, progress: EncodeProgress) -> None:
+        if job.status == EncodeStatus.ENCODING:
+            click.echo(f"{progress} {job.source} -> {job.output}")
+        else:
+            click.echo(
+                f"{progress} {job.name} - {job.status.value} ({job.entry.seconds:.0f}s, {job.entry.fps:.1f} fps)"
+            )
+
+    def _echo_progress(progress: EncodeProgress) -> None:
+        if time.monotonic() - last_shown[0] >= progress_seconds:
+            last_shown[0] = time.monotonic()
+            click.echo(f"  {progress}")
+
+    encoded = scheduler.run(planned, on_update=_echo_job, on_progress=_echo_progress)
+
+    failed = [job for job in encoded if job.status == EncodeStatus.FAILED]
+    click.secho(f"\nEncoded {len(encoded) - len(failed)} of {len(encoded)} files", bold=True)
+    for job in failed:
+        click.secho(f"{job.source}", fg="red")
+        for problem in job.entry.problems:
+            click.echo(f"  {problem}")
+
+
+@cli.group()
+def bench() -> None:
+    """
+    benchmarks
+    """
+    pass
+
+
+@bench.command("encode")
+@click.option("-i", "--input", "clips", multiple=True, help="Sample clip, encoded whole")
+@click.option(
+    "-d", "--disc", "discs", multiple=True, help="Archived disc, a chapter excerpt of its main feature is used"
+)
+@click.option("--excerpt-seconds", default=120.0, help="Minimum length of the disc excerpts")
+@click.option("-p", "--preset", "presets", multiple=True, help="HandBrake preset export, the h265 preset by default")
+@click.option("-e", "--encoder-preset", "encoder_presets", multiple=True, help="x265 speed preset such as medium")
+@click.option("-q", "--quality", "qualities", multiple=True, type=float, help="Constant quality RF")
+@click.option("-x", "--encopts", "encopts", multiple=True, help="Encoder options added to those of the preset")
+@click.option("-t", "--threads", default=None, type=int, help="x265 threads per encode, the preset default when unset")
+@click.option("-o", "--output", default=None, help="Results file, .csv or .parquet")
+@click.option("--keep", is_flag=True, default=False, help="Keep the encoded files in the workspace")
+def bench_encode(
+    clips: tuple[str, ...],
+    discs: tuple[str, ...],
+    excerpt_seconds: float,
+    presets: tuple[str, ...],
+    encoder_presets: tuple[str, ...],
+    qualities: tuple[float, ...],
+    encopts: tuple[str, ...],
+    threads: int | None,
+    output: str | None,
+    keep: bool,
+) -> None:
+    """
+    Encodes every clip with every combination of the settings and reports the fastest, smallest settings
+    """
+    from rkiv.encode import preset_file
+    from rkiv.encodebench import BenchClip, BenchResult, run_bench, setting_matrix, summarize, write_results
+
+    if len(clips) == 0 and len(discs) == 0:
+        raise click.UsageError("Give at least one --input clip or --disc")
+
+    samples = [BenchClip.from_file(Path(c)) for c in clips]
+    samples += [BenchClip.excerpt(Path(d), seconds=excerpt_seconds) for d in discs]
+    settings = setting_matrix(
+        presets=[Path(p) for p in presets] or [preset_file()],
+        encoder_presets=encoder_presets or (None,),
+        qualities=qualities or (None,),
+        encopts=encopts or ("",),
+    )
+    results_path = (
+        Path(output)
+        if output is not None
+        else CONFIG.data_directory().joinpath("bench").joinpath(f"encode-{datetime.now():%Y%m%d-%H%M%S}.parquet")
+    )
 
-    def process_hadbrake_log(log: str, dump_name: str) -> None:
-        false_positives = [
-            "disc.c:333: failed opening UDF image",
-            "disc.c:437: error opening file BDMV/index.bdmv",
-            "disc.c:437: error opening file BDMV/BACKUP/index.bdmv",
-            "libdvdread: DVDOpenFileUDF:UDFFindFile /VIDEO_TS/VIDEO_TS.IFO failed",
-            "libdvdnav: vm: vm: failed to read VIDEO_TS.IFO",
-            "0 decoder errors",
-            "ECMA 167 Volume Recognition failed",
-        ]
-
-        log_lines = [i for i in log.splitlines() if all([fp not in i for fp in false_positives])]
-        error_list = [i for i in log_lines if "fail" in i.lower() or "error" in i.lower()]
-        if len(error_list) > 0:
-            for e in error_list:
-                print(e)
-            with open(dump_name, "w") as f:
-                f.write(log)
-
-    def handbrake_encode(input: Path, output: Path) -> None:
-        handbrake_preset = str(CONFIG.data_directory().joinpath("h265AutoRipMedMkv.json"))
-        _cmd = [
-            "HandBrakeCLI",
-            "--main-feature",
-            "--preset-import-file",
-            handbrake_preset,
-            "-Z",
-            "h265AutoRipMedMkv",
-            "-i",
-            str(input),
-            "-o",
-            str(output),
-        ]
-        proc = subprocess.run(args=_cmd, text=True, stderr=subprocess.PIPE)
-        process_hadbrake_log(proc.stderr, output.with_suffix(".err.log").stem)
-
-    _collection = Path(collection)
-    _output = Path(output)
-
-    video_extensions = {".m4v", ".mkv", ".mp4"}
-
-    # Gather
-    in_files = [
-        Path(p).joinpath(ff) for p, _, f in os.walk(_collection) for ff in f if Path(ff).suffix in video_extensions
-    ]
-
-    total = len(in_files)
-    for idx, file in enumerate(in_files):
-        out_file = Path(str(file).replace(str(_collection), str(_output)))
-        out_file.parent.mkdir(parents=True, exist_ok=True)
-        print(f"({idx + 1}/{total}) {file} -> {out_file}")
-        handbrake_encode(input=file, output=out_file)
+    click.secho(f"{len(settings)} settings over {len(samples)} clips", bold=True)
+    for sample in samples:
+        click.echo(f"  {sample.name} ({sample.seconds:.0f}s)")
+
+    def _echo_result(result: BenchResult) -> None:
+        state = click.style("ok", fg="green") if result.problems == "" else click.style("failed", fg="red")
+        click.echo(
+            f"[{state}] {result.clip} {result.setting}: {result.fps:.1f} fps, {result.bitrate_kbps:.0f} kb/s, "
+            f"{result.seconds:.0f}s, cpu {result.cpu:.0%}"
+        )
+
+    results = run_bench(samples, settings, threads=threads, keep=keep, on_result=_echo_result)
+    write_results(results, results_path)
+    click.echo(f"Results written to {results_path}")
+
+    summary = summarize(results)
+    click.secho("\nMean over the clips", bold=True)
+    for setting, row in summary.iterrows():
+        marker = click.style("*", fg="green") if row["pareto"] else " "
+        click.echo(f"[{marker}] {setting}: {row['fps']:.1f} fps, {row['bitrate_kbps']:.0f} kb/s, cpu {row['cpu']:.0%}")
+    click.echo("* no other setting is both faster and smaller")
 
 
 @cli.command()
@@ -325,10 +325,8 @@ class DiscGroupMap:
         """
 
         _dgmap_info = []
-        group_discs = ArchivedDisc.walk_disc_archive(path)
-        group_discs.sort(key=lambda disc: disc.disc_name)
-
-        for disc in group_discs:
+        # Scans start as soon as the walk finds a disc, the map is put in disc order afterwards
+        for disc in ArchivedDisc.iter_disc_archive(path):
             print(disc.path)
             handbrake_scan = DiscGroupMapInfo.from_handbrake_scan(HandBrakeScan.from_scan(disc.path))
             makemkv_scan = DiscGroupMapInfo.from_makemkv_scan(MakeMKVInfo.scan_disc(disc.path))
@@ -340,6 +338,8 @@ class DiscGroupMap:
                 friendly_name="",
             )
 
+        _dgmap_info.sort(key=lambda info: info.disc_title)
+
         return cls(
             group_name=path.stem,
             dgmap_info=_dgmap_info,
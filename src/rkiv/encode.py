@@ -0,0 +1,717 @@
+"""
+h265 encodes of a video collection with HandBrakeCLI. The collection is mirrored into an output directory, several
+encodes run at once with their x265 thread pools sized to share the cores, and a manifest in the output directory
+records every finished encode so a re-run only encodes what is missing or broken.
+
+A single HandBrakeCLI encode does not keep a many core machine busy. `encode_chunked` splits a long title into
+chapter ranges, encodes them at once and appends the pieces with mkvmerge.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+from enum import Enum
+from itertools import accumulate
+from pathlib import Path
+from typing import Callable, Iterable, Sequence
+
+from rkiv.config import Config
+from rkiv.handbrake import Chapter, HandBrakeScan, HandBrakeTitle
+
+CONFIG = Config()
+
+PRESET_NAME = "h265AutoRipMedMkv"
+
+VIDEO_EXTENSIONS = {".m4v", ".mkv", ".mp4"}
+
+MANIFEST_NAME = ".rkiv-h265.json"
+
+# Seconds an existing output may be shorter or longer than its source and still count as encoded
+DURATION_TOLERANCE = 1.0
+
+# Seconds each join of a chunked encode may add or lose, chunks are cut on frame boundaries
+CHUNK_TOLERANCE = 0.1
+
+# Lines of the HandBrake log that mention an error or a failure without being one
+FALSE_POSITIVES = (
+    "disc.c:333: failed opening UDF image",
+    "disc.c:437: error opening file BDMV/index.bdmv",
+    "disc.c:437: error opening file BDMV/BACKUP/index.bdmv",
+    "libdvdread: DVDOpenFileUDF:UDFFindFile /VIDEO_TS/VIDEO_TS.IFO failed",
+    "libdvdnav: vm: vm: failed to read VIDEO_TS.IFO",
+    "0 decoder errors",
+    "ECMA 167 Volume Recognition failed",
+)
+
+PROGRESS = re.compile(
+    r"Encoding: task (\d+) of (\d+), ([\d.]+) %(?: \(([\d.]+) fps, avg ([\d.]+) fps, ETA (\d+)h(\d+)m(\d+)s\))?"
+)
+
+
+class EncodeStatus(str, Enum):
+    """Stage of an encode"""
+
+    PENDING = "pending"
+    SKIPPED = "skipped"
+    ENCODING = "encoding"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@dataclass(slots=True)
+class HandBrakeProgress:
+    """
+    A progress line of HandBrakeCLI
+
+    Attributes
+    ----------
+    task  : `int` pass being encoded, counted from 1
+    tasks  : `int`
+    fraction  : `float` of the current pass
+    fps  : `float` current rate, 0 until HandBrakeCLI reports one
+    avg_fps  : `float`
+    eta  : `timedelta`
+    """
+
+    task: int
+    tasks: int
+    fraction: float
+    fps: float = 0.0
+    avg_fps: float = 0.0
+    eta: timedelta | None = None
+
+    @classmethod
+    def from_line(cls, line: str) -> HandBrakeProgress | None:
+        match = PROGRESS.search(line)
+        if match is None:
+            return None
+
+        task, tasks, percent, fps, avg_fps, h, m, s = match.groups()
+        return cls(
+            task=int(task),
+            tasks=int(tasks),
+            fraction=float(percent) / 100,
+            fps=float(fps or 0.0),
+            avg_fps=float(avg_fps or 0.0),
+            eta=None if h is None else timedelta(hours=int(h), minutes=int(m), seconds=int(s)),
+        )
+
+    @property
+    def overall(self) -> float:
+        """Fraction of the whole encode, across passes"""
+        return (self.task - 1 + self.fraction) / max(self.tasks, 1)
+
+
+def preset_file() -> Path:
+    """The preset export HandBrakeCLI is pointed at"""
+    return CONFIG.data_directory().joinpath(f"{PRESET_NAME}.json")
+
+
+def _presets(preset: Path) -> list[dict]:
+    """Presets of a HandBrake preset export in file order, folders are left out"""
+
+    try:
+        with open(preset) as f:
+            stack = list(reversed(json.load(f).get("PresetList", [])))
+    except (OSError, ValueError, AttributeError):
+        return []
+
+    presets = []
+    while len(stack) > 0:
+        p = stack.pop()
+        if p.get("Folder", False):
+            stack += reversed(p.get("ChildrenArray", []))
+        else:
+            presets.append(p)
+    return presets
+
+
+def preset_names(preset: Path) -> list[str]:
+    """Names of the presets in a HandBrake preset export"""
+    return [p.get("PresetName", "") for p in _presets(preset)]
+
+
+def preset_encoder_options(preset: Path, name: str = PRESET_NAME) -> str:
+    """VideoOptionExtra of the preset `name` in a HandBrake preset export, empty when it is not found"""
+    return next((p.get("VideoOptionExtra", "") for p in _presets(preset) if p.get("PresetName") == name), "")
+
+
+def thread_hint(jobs: int, cores: int | None = None) -> int:
+    """x265 worker threads per encode so `jobs` encodes share the cores instead of each sizing for all of them"""
+    return max(1, (cores or os.cpu_count() or 1) // max(jobs, 1))
+
+
+def handbrake_command(
+    input: Path,
+    output: Path,
+    threads: int | None = None,
+    preset: Path | None = None,
+    extra: Iterable[str] = (),
+    preset_name: str = PRESET_NAME,
+    encopts: str = "",
+) -> list[str]:
+    """
+    HandBrakeCLI command line of a main feature encode with the h265 preset
+
+    Parameters
+    ----------
+    input : `Path`
+    output : `Path`
+    threads : `int` x265 thread pool size, added to the encoder options of the preset. HandBrake sizes the pool
+        for every core when `None`
+    preset : `Path` preset export, defaults to `preset_file()`
+    extra : `Iterable[str]` more HandBrakeCLI arguments
+    preset_name : `str` preset of the export to encode with
+    encopts : `str` more encoder options, added after those of the preset
+    """
+
+    _preset = preset_file() if preset is None else preset
+    cmd = [
+        "HandBrakeCLI",
+        "--main-feature",
+        "--preset-import-file",
+        str(_preset),
+        "-Z",
+        preset_name,
+        "-i",
+        str(input),
+        "-o",
+        str(output),
+    ]
+    if threads is not None or encopts != "":
+        # --encopts replaces the options of the preset, so they are carried over
+        pools = "" if threads is None else f"pools={threads}"
+        options = [o for o in (preset_encoder_options(_preset, preset_name), encopts, pools) if o != ""]
+        cmd += ["--encopts", ":".join(options)]
+
+    return cmd + list(extra)
+
+
+def handbrake_problems(log: Iterable[str]) -> list[str]:
+    """Lines of a HandBrake log that mention an error or a failure, minus `FALSE_POSITIVES`"""
+    return [
+        line.rstrip("\n")
+        for line in log
+        if ("fail" in line.lower() or "error" in line.lower()) and all(fp not in line for fp in FALSE_POSITIVES)
+    ]
+
+
+def run_handbrake(
+    args: list[str], log: Path, progress_callback: Callable[[HandBrakeProgress], None] | None = None
+) -> list[str]:
+    """
+    Runs HandBrakeCLI with its log written to `log` and its progress lines read as they arrive
+
+    Returns
+    -------
+    `list[str]` problems found in the log, empty when the encode was clean
+    """
+
+    log.parent.mkdir(parents=True, exist_ok=True)
+    # Progress lines end in a carriage return, text mode reads them as lines of their own
+    with open(log, "w") as f, subprocess.Popen(args, stdout=subprocess.PIPE, stderr=f, text=True) as proc:
+        assert proc.stdout is not None
+        for line in proc.stdout:
+            progress = HandBrakeProgress.from_line(line)
+            if progress is not None and progress_callback is not None:
+                progress_callback(progress)
+
+    with open(log) as f:
+        problems = handbrake_problems(f)
+    if proc.returncode != 0:
+        problems.append(f"HandBrakeCLI exited with {proc.returncode}")
+    return problems
+
+
+def main_feature(path: Path) -> HandBrakeTitle | None:
+    """
+    Main feature of a HandBrake scan of `path`, `None` when it has no titles
+
+    Raises
+    ------
+    `ValueError` when HandBrakeCLI does not print a title set
+    """
+
+    scan = HandBrakeScan.from_scan(path)
+    if len(scan.TitleList) == 0:
+        return None
+    return next((t for t in scan.TitleList if t.Index == scan.MainFeature), scan.TitleList[0])
+
+
+def main_feature_seconds(path: Path) -> int:
+    """Duration of the main feature of `path`, 0 when it has no titles. See `main_feature`."""
+    title = main_feature(path)
+    return 0 if title is None else title.seconds
+
+
+def chapter_ranges(chapters: Sequence[Chapter], chunks: int) -> list[tuple[int, int]]:
+    """
+    Splits a title into at most `chunks` runs of whole chapters of about the same duration
+
+    Returns
+    -------
+    `list[tuple[int, int]]` first and last chapter of each run, counted from 1 like HandBrakeCLI --chapters
+    """
+
+    ticks = [c.Duration.Ticks for c in chapters]
+    _chunks = min(chunks, len(ticks))
+    if _chunks <= 1:
+        return [(1, len(ticks))] if len(ticks) > 0 else []
+
+    # Each cut goes after the chapter ending closest to its share of the title, leaving a chapter for every later run
+    ends = list(accumulate(ticks))
+    target = ends[-1] / _chunks
+    cuts: list[int] = []
+    for k in range(1, _chunks):
+        candidates = range(cuts[-1] + 1 if len(cuts) > 0 else 1, len(ticks) - (_chunks - k) + 1)
+        cuts.append(min(candidates, key=lambda c: abs(ends[c - 1] - k * target)))
+
+    return [(first + 1, last) for first, last in zip([0, *cuts], [*cuts, len(ticks)])]
+
+
+def encode_chunked(
+    source: Path,
+    output: Path,
+    log: Path,
+    chunks: int,
+    threads: int | None = None,
+    progress_callback: Callable[[HandBrakeProgress], None] | None = None,
+) -> list[str]:
+    """
+    Encodes the main feature of `source` as chapter ranges, one HandBrakeCLI process per range all at once, then
+    appends the pieces into `output` with mkvmerge. The pieces are checked to add up to the duration of the source
+    before they are joined, and are removed once they are or when an encode fails. Titles with a single chapter are encoded in one piece.
+
+    Parameters
+    ----------
+    source : `Path`
+    output : `Path`
+    log : `Path` HandBrake log, each chunk logs next to it
+    chunks : `int` most pieces to split the title into
+    threads : `int` x265 threads of each piece
+    progress_callback : `Callable[[HandBrakeProgress], None]` progress of the whole title, with the frame rate of
+        all pieces together
+
+    Returns
+    -------
+    `list[str]` problems of the encodes, the duration check and the append
+    """
+
+    title = main_feature(source)
+    ranges = chapter_ranges([] if title is None else title.ChapterList, chunks)
+    if title is None or len(ranges) <= 1:
+        return run_handbrake(handbrake_command(source, output, threads=threads), log, progress_callback)
+
+    # Outputs of two jobs can share a stem, Movie.mkv and Movie.m4v or an episode name in two seasons
+    CONFIG.workspace.joinpath("chunks").mkdir(parents=True, exist_ok=True)
+    workdir = Path(tempfile.mkdtemp(prefix=f"{output.stem}.", dir=CONFIG.workspace.joinpath("chunks")))
+    pieces = [workdir.joinpath(f"{output.stem}.c{first:03d}-{last:03d}.mkv") for first, last in ranges]
+
+    weights = [sum(c.Duration.Ticks for c in title.ChapterList[a - 1 : b]) for a, b in ranges]
+    progress = [HandBrakeProgress(task=1, tasks=1, fraction=0.0) for _ in ranges]
+    lock = threading.Lock()
+
+    def _encode(i: int) -> list[str]:
+        first, last = ranges[i]
+
+        def _progress(p: HandBrakeProgress) -> None:
+            with lock:
+                progress[i] = p
+                overall = sum(p.overall * w for p, w in zip(progress, weights)) / max(sum(weights), 1)
+                combined = HandBrakeProgress(
+                    task=1,
+                    tasks=1,
+                    fraction=overall,
+                    fps=sum(p.fps for p in progress),
+                    avg_fps=sum(p.avg_fps for p in progress),
+                )
+            if progress_callback is not None:
+                progress_callback(combined)
+
+        args = handbrake_command(source, pieces[i], threads=threads, extra=["--chapters", f"{first}-{last}"])
+        return run_handbrake(args, log.with_suffix(f".c{first:03d}-{last:03d}.log"), _progress)
+
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        problems = [p for r in pool.map(_encode, range(len(ranges))) for p in r]
+    if len(problems) > 0:
+        # Pieces of a failed run are partial encodes, there is nothing in them worth keeping
+        shutil.rmtree(workdir, ignore_errors=True)
+        return problems
+
+    encoded = 0.0
+    for piece in pieces:
+        piece_title = main_feature(piece)
+        encoded += 0.0 if piece_title is None else piece_title.exact_seconds
+    tolerance = DURATION_TOLERANCE + CHUNK_TOLERANCE * (len(pieces) - 1)
+    if abs(encoded - title.exact_seconds) > tolerance:
+        return [f"Chunks add up to {encoded:.2f}s of {title.exact_seconds:.2f}s, kept in {workdir}"]
+
+    # mkvmerge appends files given as "a + b + c", exit code 1 only means warnings
+    args = ["mkvmerge", "-q", "-o", str(output), str(pieces[0])]
+    for piece in pieces[1:]:
+        args += ["+", str(piece)]
+    try:
+        proc = subprocess.run(args, capture_output=True, text=True)
+    except FileNotFoundError:
+        return [f"mkvmerge not found, chunks kept in {workdir}"]
+    with open(log, "a") as f:
+        f.write(proc.stdout)
+    if proc.returncode > 1:
+        problems = [line for line in proc.stdout.splitlines() if line != ""]
+        return problems + [f"mkvmerge exited with {proc.returncode}, chunks kept in {workdir}"]
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    return []
+
+
+@dataclass(slots=True)
+class ManifestEntry:
+    """
+    What is known about the encode of a single source
+
+    Attributes
+    ----------
+    source_size  : `int`
+    source_mtime_ns  : `int`
+    duration  : `int` seconds of the main feature of the source
+    status  : `EncodeStatus` `DONE` once the output is known to be good
+    output_size  : `int` size of the output when it was found good
+    seconds  : `float` time the encode took
+    fps  : `float` average frame rate of the encode
+    problems  : `list[str]`
+    """
+
+    source_size: int
+    source_mtime_ns: int
+    duration: int
+    status: EncodeStatus = EncodeStatus.PENDING
+    output_size: int = 0
+    seconds: float = 0.0
+    fps: float = 0.0
+    problems: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, obj: dict) -> ManifestEntry:
+        return cls(**{**obj, "status": EncodeStatus(obj["status"])})
+
+
+class EncodeManifest:
+    """
+    Manifest of a collection encode, kept in the output directory and keyed on the source path relative to the
+    collection. It is rewritten after every finished encode so an interrupted run can be resumed.
+    """
+
+    __slots__ = (
+        "path",
+        "entries",
+    )
+
+    path: Path
+    entries: dict[str, ManifestEntry]
+
+    def __init__(self, path: Path, entries: dict[str, ManifestEntry] | None = None) -> None:
+        self.path = path
+        self.entries = {} if entries is None else entries
+
+    @classmethod
+    def load(cls, output: Path) -> EncodeManifest:
+        """Manifest of `output`, empty when there is none yet or it can not be read"""
+
+        path = output.joinpath(MANIFEST_NAME)
+        try:
+            with open(path) as f:
+                return cls(path=path, entries={k: ManifestEntry.from_dict(v) for k, v in json.load(f).items()})
+        except (OSError, ValueError, TypeError, KeyError):
+            return cls(path=path)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({k: asdict(v) for k, v in self.entries.items()}, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+@dataclass(slots=True)
+class EncodeJob:
+    """
+    Encode of a single source
+
+    Attributes
+    ----------
+    name  : `str` source path relative to the collection
+    source  : `Path`
+    output  : `Path` the source path with the collection swapped for the output directory
+    entry  : `ManifestEntry`
+    status  : `EncodeStatus`
+    progress  : `float` fraction of the encode done
+    fps  : `float` current frame rate
+    """
+
+    name: str
+    source: Path
+    output: Path
+    entry: ManifestEntry
+    status: EncodeStatus = EncodeStatus.PENDING
+    progress: float = 0.0
+    fps: float = 0.0
+
+
+@dataclass(slots=True)
+class EncodeProgress:
+    """
+    Progress of a collection encode
+
+    Attributes
+    ----------
+    counts  : `dict[EncodeStatus, int]`
+    total  : `int` jobs in the run
+    fps  : `float` frames per second of every running encode together
+    eta  : `timedelta` estimated from the source seconds encoded so far, `None` until there is a rate
+    """
+
+    counts: dict[EncodeStatus, int]
+    total: int
+    fps: float
+    eta: timedelta | None
+
+    def __str__(self) -> str:
+        finished = sum(self.counts.get(s, 0) for s in (EncodeStatus.SKIPPED, EncodeStatus.DONE, EncodeStatus.FAILED))
+        eta = "--:--:--" if self.eta is None else str(timedelta(seconds=round(self.eta.total_seconds())))
+        return f"[{finished}/{self.total}] {self.fps:.1f} fps ETA {eta}"
+
+
+class EncodeScheduler:
+    """
+    Encodes a collection with several HandBrakeCLI processes at once
+
+    Attributes
+    ----------
+    collection  : `Path`
+    output  : `Path` mirrors the layout of `collection`
+    jobs  : `int` encodes running at once
+    chunks  : `int` pieces each encode is split into with `encode_chunked`, 1 encodes titles whole
+    threads  : `int` x265 threads of each HandBrakeCLI process, defaults to `thread_hint(jobs * chunks)`
+    scan_workers  : `int` sources and outputs scanned at once while planning
+    """
+
+    __slots__ = (
+        "collection",
+        "output",
+        "jobs",
+        "chunks",
+        "threads",
+        "scan_workers",
+        "manifest",
+        "_lock",
+    )
+
+    collection: Path
+    output: Path
+    jobs: int
+    chunks: int
+    threads: int
+    scan_workers: int
+    manifest: EncodeManifest
+
+    def __init__(
+        self,
+        collection: Path,
+        output: Path,
+        jobs: int = 2,
+        chunks: int = 1,
+        threads: int | None = None,
+        scan_workers: int = 4,
+    ) -> None:
+        self.collection = collection
+        self.output = output
+        self.jobs = jobs
+        self.chunks = chunks
+        self.threads = thread_hint(jobs * chunks) if threads is None else threads
+        self.scan_workers = scan_workers
+        self.manifest = EncodeManifest.load(output)
+        self._lock = threading.Lock()
+
+    def output_path(self, source: Path) -> Path:
+        return self.output.joinpath(source.relative_to(self.collection))
+
+    def log_path(self, job: EncodeJob) -> Path:
+        # The source suffix is kept so Movie.mkv and Movie.m4v do not share a log
+        return CONFIG.workspace.parent.joinpath("logs").joinpath("h265").joinpath(f"{job.name}.log")
+
+    def sources(self) -> list[Path]:
+        """Video files of the collection in walk order"""
+        return sorted(
+            Path(p).joinpath(f)
+            for p, _, files in os.walk(self.collection)
+            for f in files
+            if Path(f).suffix in VIDEO_EXTENSIONS
+        )
+
+    def _plan(self, source: Path) -> EncodeJob:
+        name = str(source.relative_to(self.collection))
+        stat = source.stat()
+        entry = self.manifest.entries.get(name)
+        if entry is None or (entry.source_size, entry.source_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            entry = ManifestEntry(source_size=stat.st_size, source_mtime_ns=stat.st_mtime_ns, duration=0)
+            try:
+                entry.duration = main_feature_seconds(source)
+            except (OSError, ValueError) as e:
+                entry.status = EncodeStatus.FAILED
+                entry.problems = [f"Scan failed: {e}"]
+
+        job = EncodeJob(name=name, source=source, output=self.output_path(source), entry=entry)
+        if entry.status == EncodeStatus.FAILED and len(entry.problems) > 0 and entry.duration == 0:
+            job.status = EncodeStatus.FAILED
+            return job
+
+        try:
+            output_size = job.output.stat().st_size
+        except OSError:
+            entry.status = EncodeStatus.PENDING
+            return job
+
+        # An output the manifest vouches for is only checked by size, a failed encode is always redone and anything
+        # else has to match the source duration
+        if entry.status == EncodeStatus.DONE and entry.output_size == output_size:
+            job.status = EncodeStatus.SKIPPED
+            return job
+        if entry.status == EncodeStatus.FAILED:
+            entry.status = EncodeStatus.PENDING
+            return job
+
+        try:
+            matches = output_size > 0 and abs(main_feature_seconds(job.output) - entry.duration) <= DURATION_TOLERANCE
+        except (OSError, ValueError):
+            matches = False
+
+        if matches:
+            entry.status = EncodeStatus.DONE
+            entry.output_size = output_size
+            job.status = EncodeStatus.SKIPPED
+        else:
+            entry.status = EncodeStatus.PENDING
+
+        return job
+
+    def plan(self, sources: Iterable[Path] | None = None) -> list[EncodeJob]:
+        """
+        A job for every source, scanning only sources that changed since the manifest was written and outputs the
+        manifest does not vouch for. Jobs whose output is already good are `SKIPPED`.
+        """
+
+        _sources = self.sources() if sources is None else sources
+        with ThreadPoolExecutor(max_workers=self.scan_workers) as pool:
+            jobs = list(pool.map(self._plan, _sources))
+
+        self.manifest.entries.update({job.name: job.entry for job in jobs})
+        self.manifest.save()
+        return jobs
+
+    def _encode(self, job: EncodeJob, on_progress: Callable[[EncodeJob], None] | None) -> EncodeJob:
+        def _progress(progress: HandBrakeProgress) -> None:
+            job.progress = progress.overall
+            job.fps = progress.fps
+            if progress.avg_fps > 0:
+                job.entry.fps = progress.avg_fps
+            if on_progress is not None:
+                on_progress(job)
+
+        job.output.parent.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        if self.chunks > 1:
+            job.entry.problems = encode_chunked(
+                job.source,
+                job.output,
+                self.log_path(job),
+                self.chunks,
+                threads=self.threads,
+                progress_callback=_progress,
+            )
+        else:
+            args = handbrake_command(job.source, job.output, threads=self.threads)
+            job.entry.problems = run_handbrake(args, self.log_path(job), _progress)
+        job.entry.seconds = time.perf_counter() - start
+        return job
+
+    def run(
+        self,
+        jobs: list[EncodeJob] | None = None,
+        on_update: Callable[[EncodeJob, EncodeProgress], None] | None = None,
+        on_progress: Callable[[EncodeProgress], None] | None = None,
+    ) -> list[EncodeJob]:
+        """
+        Encodes every pending job, `jobs` defaults to `plan()`
+
+        Parameters
+        ----------
+        jobs : `list[EncodeJob]`
+        on_update : `Callable[[EncodeJob, EncodeProgress], None]` called on every status change
+        on_progress : `Callable[[EncodeProgress], None]` called from the encoding threads as progress lines arrive
+
+        Returns
+        -------
+        `list[EncodeJob]`
+        """
+
+        _jobs = self.plan() if jobs is None else jobs
+        start = time.perf_counter()
+
+        def _progress() -> EncodeProgress:
+            counts: dict[EncodeStatus, int] = {}
+            for j in _jobs:
+                counts[j.status] = counts.get(j.status, 0) + 1
+
+            encoding = [j for j in _jobs if j.status == EncodeStatus.ENCODING]
+            work = [j for j in _jobs if j.status not in (EncodeStatus.SKIPPED, EncodeStatus.FAILED)]
+            done = sum(j.entry.duration * (1.0 if j.status == EncodeStatus.DONE else j.progress) for j in work)
+            remaining = sum(j.entry.duration for j in work) - done
+            rate = done / (time.perf_counter() - start)
+            return EncodeProgress(
+                counts=counts,
+                total=len(_jobs),
+                fps=sum(j.fps for j in encoding),
+                eta=timedelta(seconds=remaining / rate) if rate > 0 else None,
+            )
+
+        def _update(job: EncodeJob, status: EncodeStatus) -> None:
+            with self._lock:
+                job.status = status
+                if status in (EncodeStatus.DONE, EncodeStatus.FAILED):
+                    job.entry.status = status
+                    job.entry.output_size = job.output.stat().st_size if job.output.exists() else 0
+                    job.fps = 0.0
+                    self.manifest.save()
+                progress = _progress()
+            if on_update is not None:
+                on_update(job, progress)
+
+        def _on_progress(job: EncodeJob) -> None:
+            if on_progress is not None:
+                with self._lock:
+                    progress = _progress()
+                on_progress(progress)
+
+        def _work(job: EncodeJob) -> EncodeJob:
+            _update(job, EncodeStatus.ENCODING)
+            try:
+                self._encode(job, _on_progress)
+            except (OSError, ValueError) as e:
+                # A missing tool or a scan without a title set fails the job, not the run
+                job.entry.problems = [f"Encode failed: {e}"]
+            _update(job, EncodeStatus.DONE if len(job.entry.problems) == 0 else EncodeStatus.FAILED)
+            return job
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            list(pool.map(_work, [j for j in _jobs if j.status == EncodeStatus.PENDING]))
+
+        return _jobs
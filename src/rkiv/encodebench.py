@@ -0,0 +1,283 @@
+"""
+Speed and size benchmarks of HandBrake presets. A matrix of presets and encoder settings is run over sample clips,
+or chapter excerpts of archived discs, one encode at a time so the rate and CPU use of each belong to it alone. The
+results are written as a table, and the settings no other setting beats on both frame rate and bitrate are the ones
+worth choosing between.
+"""
+from __future__ import annotations
+
+import os
+import resource
+import shutil
+import time
+from dataclasses import asdict, dataclass
+from itertools import product
+from pathlib import Path
+from typing import Callable, Iterable
+
+import pandas
+
+from rkiv.config import Config
+from rkiv.encode import (
+    PRESET_NAME,
+    HandBrakeProgress,
+    handbrake_command,
+    main_feature,
+    preset_names,
+    run_handbrake,
+)
+from rkiv.handbrake import TICKS_PER_SECOND
+
+CONFIG = Config()
+
+# Length of the chapter excerpts taken from archived discs
+EXCERPT_SECONDS = 120.0
+
+
+@dataclass(slots=True, frozen=True)
+class BenchSetting:
+    """
+    One cell of the benchmark matrix, unset options keep the value of the preset
+
+    Attributes
+    ----------
+    preset  : `Path` preset export
+    preset_name  : `str`
+    encoder_preset  : `str` x265 speed preset such as slow or medium
+    quality  : `float` constant quality RF
+    encopts  : `str` encoder options added to those of the preset
+    """
+
+    preset: Path
+    preset_name: str = PRESET_NAME
+    encoder_preset: str | None = None
+    quality: float | None = None
+    encopts: str = ""
+
+    @property
+    def label(self) -> str:
+        """Unique within a matrix, exports often share a preset name so the file is named as well"""
+        parts = [f"{self.preset.stem}/{self.preset_name}"]
+        if self.encoder_preset is not None:
+            parts.append(self.encoder_preset)
+        if self.quality is not None:
+            parts.append(f"q{self.quality:g}")
+        if self.encopts != "":
+            parts.append(self.encopts)
+        return " ".join(parts)
+
+    def args(self) -> list[str]:
+        """HandBrakeCLI arguments that override the preset"""
+        args = []
+        if self.encoder_preset is not None:
+            args += ["--encoder-preset", self.encoder_preset]
+        if self.quality is not None:
+            args += ["--quality", f"{self.quality:g}"]
+        return args
+
+
+def setting_matrix(
+    presets: Iterable[Path],
+    encoder_presets: Iterable[str | None] = (None,),
+    qualities: Iterable[float | None] = (None,),
+    encopts: Iterable[str] = ("",),
+) -> list[BenchSetting]:
+    """
+    Every combination of the given values. A preset export is run with the h265 preset when it holds one and with
+    its first preset otherwise.
+    """
+
+    settings = []
+    for preset, encoder_preset, quality, options in product(presets, encoder_presets, qualities, encopts):
+        names = preset_names(preset)
+        name = PRESET_NAME if PRESET_NAME in names or len(names) == 0 else names[0]
+        settings.append(BenchSetting(preset, name, encoder_preset, quality, options))
+    return settings
+
+
+@dataclass(slots=True, frozen=True)
+class BenchClip:
+    """
+    Source of the benchmark encodes
+
+    Attributes
+    ----------
+    name  : `str`
+    source  : `Path` clip file, disc directory or ISO image
+    seconds  : `float` duration of what is encoded
+    chapters  : `tuple[int, int]` first and last chapter of the main feature to encode, the whole title when `None`
+    """
+
+    name: str
+    source: Path
+    seconds: float
+    chapters: tuple[int, int] | None = None
+
+    @classmethod
+    def from_file(cls, path: Path) -> BenchClip:
+        """The main feature of a sample clip"""
+        title = main_feature(path)
+        return cls(name=path.stem, source=path, seconds=0.0 if title is None else title.exact_seconds)
+
+    @classmethod
+    def excerpt(cls, path: Path, seconds: float = EXCERPT_SECONDS) -> BenchClip:
+        """
+        Chapters from the middle of the main feature of an archived disc, running at least `seconds` or to the end
+        of the title. Openings and credits encode unlike the rest of a film, so they are avoided.
+        """
+
+        title = main_feature(path)
+        if title is None or len(title.ChapterList) == 0:
+            return cls.from_file(path)
+
+        ticks = [c.Duration.Ticks / TICKS_PER_SECOND for c in title.ChapterList]
+        first = last = len(ticks) // 2
+        while sum(ticks[first : last + 1]) < seconds and (first > 0 or last < len(ticks) - 1):
+            # Grow after then before the middle chapter so the excerpt stays centred
+            if last < len(ticks) - 1 and (last - first) % 2 == 0 or first == 0:
+                last += 1
+            else:
+                first -= 1
+
+        return cls(
+            name=f"{path.stem}.c{first + 1:03d}-{last + 1:03d}",
+            source=path,
+            seconds=sum(ticks[first : last + 1]),
+            chapters=(first + 1, last + 1),
+        )
+
+
+@dataclass(slots=True)
+class BenchResult:
+    """
+    A single benchmark encode
+
+    Attributes
+    ----------
+    clip  : `str`
+    setting  : `str` `BenchSetting.label`
+    seconds  : `float` wall time
+    fps  : `float` average frame rate reported by HandBrakeCLI
+    bitrate_kbps  : `float` of the output over the clip duration
+    size_bytes  : `int`
+    cpu  : `float` CPU time of the encode over the wall time of every core, 1.0 keeps the machine busy
+    problems  : `str` problems in the HandBrake log, empty when clean
+    """
+
+    clip: str
+    setting: str
+    seconds: float
+    fps: float
+    bitrate_kbps: float
+    size_bytes: int
+    cpu: float
+    problems: str = ""
+
+
+def bench_encode(clip: BenchClip, setting: BenchSetting, threads: int | None = None, keep: bool = False) -> BenchResult:
+    """Encodes `clip` with `setting` and measures it, the output is removed unless `keep` is set"""
+
+    workdir = CONFIG.workspace.joinpath("bench").joinpath(clip.name)
+    workdir.mkdir(parents=True, exist_ok=True)
+    output = workdir.joinpath(f"{setting.label.replace(' ', '_').replace('/', '_')}.mkv")
+    log = CONFIG.workspace.parent.joinpath("logs").joinpath("bench").joinpath(clip.name).joinpath(output.stem + ".log")
+
+    extra = setting.args()
+    if clip.chapters is not None:
+        extra += ["--chapters", f"{clip.chapters[0]}-{clip.chapters[1]}"]
+    args = handbrake_command(
+        clip.source,
+        output,
+        threads=threads,
+        preset=setting.preset,
+        extra=extra,
+        preset_name=setting.preset_name,
+        encopts=setting.encopts,
+    )
+
+    fps = [0.0]
+
+    def _progress(progress: HandBrakeProgress) -> None:
+        if progress.avg_fps > 0:
+            fps[0] = progress.avg_fps
+
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    problems = run_handbrake(args, log, _progress)
+    seconds = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_seconds = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+
+    size = output.stat().st_size if output.exists() else 0
+    if not keep:
+        output.unlink(missing_ok=True)
+
+    return BenchResult(
+        clip=clip.name,
+        setting=setting.label,
+        seconds=seconds,
+        fps=fps[0],
+        bitrate_kbps=size * 8 / 1000 / clip.seconds if clip.seconds > 0 else 0.0,
+        size_bytes=size,
+        cpu=cpu_seconds / seconds / (os.cpu_count() or 1) if seconds > 0 else 0.0,
+        problems="\n".join(problems),
+    )
+
+
+def run_bench(
+    clips: list[BenchClip],
+    settings: list[BenchSetting],
+    threads: int | None = None,
+    keep: bool = False,
+    on_result: Callable[[BenchResult], None] | None = None,
+) -> list[BenchResult]:
+    """Every setting over every clip, one encode at a time"""
+
+    results = []
+    for clip, setting in product(clips, settings):
+        result = bench_encode(clip, setting, threads=threads, keep=keep)
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+
+    if not keep:
+        shutil.rmtree(CONFIG.workspace.joinpath("bench"), ignore_errors=True)
+    return results
+
+
+def results_frame(results: list[BenchResult]) -> pandas.DataFrame:
+    return pandas.DataFrame(data=[asdict(r) for r in results], columns=list(BenchResult.__dataclass_fields__))
+
+
+def write_results(results: list[BenchResult], path: Path) -> None:
+    """Writes the results as Parquet, or CSV when `path` ends in .csv"""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df = results_frame(results)
+    if path.suffix.lower() == ".csv":
+        df.to_csv(path, index=False)
+    else:
+        df.to_parquet(path, index=False)
+
+
+def summarize(results: list[BenchResult]) -> pandas.DataFrame:
+    """
+    Mean of every setting across the clips that encoded cleanly, with a `pareto` column marking the settings no
+    other setting matches or beats on both frame rate and bitrate
+
+    Returns
+    -------
+    `pandas.DataFrame` indexed on setting, fastest first
+    """
+
+    df = results_frame([r for r in results if r.problems == ""])
+    summary = df.groupby("setting")[["fps", "bitrate_kbps", "seconds", "cpu"]].mean()
+
+    def _dominated(setting: str) -> bool:
+        row = summary.loc[setting]
+        better = (summary["fps"] >= row["fps"]) & (summary["bitrate_kbps"] <= row["bitrate_kbps"])
+        strictly = (summary["fps"] > row["fps"]) | (summary["bitrate_kbps"] < row["bitrate_kbps"])
+        return bool((better & strictly).any())
+
+    summary["pareto"] = [not _dominated(s) for s in summary.index]
+    return summary.sort_values("fps", ascending=False, kind="stable")
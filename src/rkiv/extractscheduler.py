@@ -0,0 +1,258 @@
+"""
+Batch extraction of archived discs. Discs are scanned for their main title as soon as the archive walk finds them
+and extracted on a pool of workers. Scans and extractions are limited per source filesystem, and extractions per
+destination filesystem, so a single spinning disk is never read or written by more jobs than it can keep up with.
+"""
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Iterable
+
+from rkiv.inventory import ArchivedDisc
+from rkiv.makemkv import MakeMKV, TitelInfoMMKV, extract_mkv
+
+
+class JobStatus(str, Enum):
+    """Stage of an extraction job"""
+
+    SCANNING = "scanning"
+    WAITING = "waiting"
+    EXTRACTING = "extracting"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@dataclass(slots=True)
+class ExtractJob:
+    """
+    Extraction of the main title of a single disc
+
+    Attributes
+    ----------
+    disc  : `ArchivedDisc`
+    status  : `JobStatus`
+    title  : `TitelInfoMMKV` main title once the disc has been scanned
+    problems  : `list[str]` problems reported by the scan or the extraction
+    seconds  : `float` time spent extracting
+    progress  : `float` fraction of the extraction done
+    """
+
+    disc: ArchivedDisc
+    status: JobStatus = JobStatus.SCANNING
+    title: TitelInfoMMKV | None = None
+    problems: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+    progress: float = 0.0
+
+
+@dataclass(slots=True)
+class ExtractProgress:
+    """
+    Job counts by status
+
+    Attributes
+    ----------
+    found  : `int` discs handed to the scheduler so far
+    counts  : `dict[JobStatus, int]`
+    """
+
+    found: int
+    counts: dict[JobStatus, int]
+
+    def __str__(self) -> str:
+        counts = " ".join(f"{status.value}:{self.counts.get(status, 0)}" for status in JobStatus)
+        return f"[{self.counts.get(JobStatus.DONE, 0) + self.counts.get(JobStatus.FAILED, 0)}/{self.found}] {counts}"
+
+
+def filesystem_id(path: Path) -> int:
+    """Device id of the filesystem holding `path`, or its closest existing parent"""
+
+    for parent in (path, *path.parents):
+        try:
+            return os.stat(parent).st_dev
+        except OSError:
+            continue
+    return -1
+
+
+class ExtractScheduler:
+    """
+    Pipelines main title scans and extractions across discs
+
+    Attributes
+    ----------
+    output  : `Path` extracted titles are written to `output/<disc title>`
+    workers  : `int` extractions running at once
+    per_source  : `int` scans and extractions reading from the same filesystem at once
+    per_destination  : `int` extractions writing to the same filesystem at once
+    scan_workers  : `int` discs scanned for their main title at once
+    """
+
+    __slots__ = (
+        "output",
+        "workers",
+        "per_source",
+        "per_destination",
+        "scan_workers",
+        "scan",
+        "extract",
+    )
+
+    output: Path
+    workers: int
+    per_source: int
+    per_destination: int
+    scan_workers: int
+    scan: Callable[[ArchivedDisc], TitelInfoMMKV]
+    extract: Callable[[ArchivedDisc, Path, int, Callable[[float], None]], list[str]]
+
+    def __init__(
+        self,
+        output: Path,
+        workers: int = 4,
+        per_source: int = 1,
+        per_destination: int = 2,
+        scan_workers: int = 4,
+        scan: Callable[[ArchivedDisc], TitelInfoMMKV] = MakeMKV.get_main_title,
+        extract: Callable[[ArchivedDisc, Path, int, Callable[[float], None]], list[str]] = extract_mkv,
+    ) -> None:
+        self.output = output
+        self.workers = workers
+        self.per_source = per_source
+        self.per_destination = per_destination
+        self.scan_workers = scan_workers
+        self.scan = scan
+        self.extract = extract
+
+    def _scan(self, job: ExtractJob) -> ExtractJob:
+        job.title = self.scan(job.disc)
+        return job
+
+    def _extract(self, job: ExtractJob, on_progress: Callable[[ExtractJob], None] | None) -> ExtractJob:
+        assert job.title is not None
+
+        def _progress(progress: float) -> None:
+            job.progress = progress
+            if on_progress is not None:
+                on_progress(job)
+
+        start = time.perf_counter()
+        job.problems += self.extract(job.disc, self.output, job.title.id, _progress)
+        job.seconds = time.perf_counter() - start
+        return job
+
+    def run(
+        self,
+        discs: Iterable[ArchivedDisc],
+        on_update: Callable[[ExtractJob, ExtractProgress], None] | None = None,
+        on_progress: Callable[[ExtractJob], None] | None = None,
+    ) -> list[ExtractJob]:
+        """
+        Extracts the main title of every disc. `discs` is consumed lazily on a thread of its own, so scanning and
+        extracting start while an archive walk is still producing discs and go on while it is slow to find the next.
+
+        Parameters
+        ----------
+        discs : `Iterable[ArchivedDisc]`
+        on_update : `Callable[[ExtractJob, ExtractProgress], None]` called from the calling thread on every status
+            change
+        on_progress : `Callable[[ExtractJob], None]` called from the worker threads whenever the progress of a
+            running extraction changes
+
+        Returns
+        -------
+        `list[ExtractJob]` in the order the discs were found
+        """
+
+        self.output.mkdir(parents=True, exist_ok=True)
+
+        jobs: list[ExtractJob] = []
+        unscanned: list[tuple[ExtractJob, int]] = []
+        ready: list[tuple[ExtractJob, int, int]] = []
+        scanning: dict[Future[ExtractJob], tuple[ExtractJob, int]] = {}
+        extracting: dict[Future[ExtractJob], tuple[ExtractJob, int, int]] = {}
+        reading: dict[int, int] = {}
+        writing: dict[int, int] = {}
+
+        def _update(job: ExtractJob, status: JobStatus) -> None:
+            job.status = status
+            if on_update is not None:
+                counts: dict[JobStatus, int] = {}
+                for j in jobs:
+                    counts[j.status] = counts.get(j.status, 0) + 1
+                on_update(job, ExtractProgress(found=len(jobs), counts=counts))
+
+        def _dispatch(scan_pool: ThreadPoolExecutor, extract_pool: ThreadPoolExecutor) -> None:
+            # Only this thread touches the filesystem counts, so the limits need no locking. Scans read the source
+            # as well, they take their turn after the extractions that are ready
+            for job, source, destination in list(ready):
+                if len(extracting) >= self.workers:
+                    break
+                if reading.get(source, 0) >= self.per_source or writing.get(destination, 0) >= self.per_destination:
+                    continue
+
+                ready.remove((job, source, destination))
+                reading[source] = reading.get(source, 0) + 1
+                writing[destination] = writing.get(destination, 0) + 1
+                extracting[extract_pool.submit(self._extract, job, on_progress)] = (job, source, destination)
+                _update(job, JobStatus.EXTRACTING)
+
+            for job, source in list(unscanned):
+                if len(scanning) >= self.scan_workers:
+                    break
+                if reading.get(source, 0) >= self.per_source:
+                    continue
+
+                unscanned.remove((job, source))
+                reading[source] = reading.get(source, 0) + 1
+                scanning[scan_pool.submit(self._scan, job)] = (job, source)
+
+        def _collect(done: set[Future[ExtractJob]]) -> None:
+            for future in done:
+                if future in scanning:
+                    job, source = scanning.pop(future)
+                    reading[source] -= 1
+                    error = future.exception()
+                    if error is not None:
+                        job.problems.append(f"Scan failed: {error}")
+                        _update(job, JobStatus.FAILED)
+                    else:
+                        ready.append((job, source, filesystem_id(self.output.joinpath(job.disc.title))))
+                        _update(job, JobStatus.WAITING)
+                else:
+                    job, source, destination = extracting.pop(future)
+                    reading[source] -= 1
+                    writing[destination] -= 1
+                    error = future.exception()
+                    if error is not None:
+                        job.problems.append(f"Extraction failed: {error}")
+                    _update(job, JobStatus.DONE if len(job.problems) == 0 else JobStatus.FAILED)
+
+        # The walk is advanced one disc at a time on its own thread, the next disc is waited on with the jobs
+        _discs = iter(discs)
+        with ThreadPoolExecutor(max_workers=1) as walk_pool, ThreadPoolExecutor(
+            max_workers=self.scan_workers
+        ) as scan_pool, ThreadPoolExecutor(max_workers=self.workers) as extract_pool:
+            walking: Future[ArchivedDisc | None] | None = walk_pool.submit(next, _discs, None)
+            while walking is not None or len(unscanned) + len(scanning) + len(extracting) + len(ready) > 0:
+                pending = (*scanning, *extracting) if walking is None else (walking, *scanning, *extracting)
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                if walking in done:
+                    done.remove(walking)
+                    disc = walking.result()
+                    walking = None
+                    if disc is not None:
+                        walking = walk_pool.submit(next, _discs, None)
+                        job = ExtractJob(disc=disc)
+                        jobs.append(job)
+                        unscanned.append((job, filesystem_id(disc.path)))
+                        _update(job, JobStatus.SCANNING)
+                _collect(done)
+                _dispatch(scan_pool, extract_pool)
+
+        return jobs
@@ -0,0 +1,129 @@
+"""
+Cheap disc fingerprints. A fingerprint identifies the content of a disc backup without reading the video data, so
+the same disc gets the same fingerprint no matter where or under which name it is archived.
+
+- DVD: the pydvdid CRC64 of the VIDEO_TS IFO files
+- Blu-ray: the AACS disc id, SHA1 of AACS/Unit_Key_RO.inf, which is also the key libaacs looks discs up by. Discs
+  or backups without it use SHA1 of BDMV/index.bdmv and BDMV/MovieObject.bdmv
+- ISO image: SHA1 of the volume descriptor sectors and the image size
+
+Fingerprints are the shared key of the `ScanCache`, duplicate detection in the archive and the ARM check for discs
+that were already ripped.
+"""
+from __future__ import annotations
+
+import hashlib
+from collections import defaultdict
+from pathlib import Path
+
+from pydvdid import compute  # type: ignore
+from pydvdid.exceptions import PydvdidException  # type: ignore
+
+from rkiv.inventory import ArchivedDisc, ISO_EXTS, OpticalDiscType
+from rkiv.isoimage import SECTOR_SIZE, VOLUME_DESCRIPTOR_SECTOR
+from rkiv.opticaldevices import OpticalDrive
+
+BLU_RAY_FILES = ("index.bdmv", "MovieObject.bdmv")
+AACS_UNIT_KEY = "AACS/Unit_Key_RO.inf"
+
+# Sectors hashed from the start of the volume descriptor set
+ISO_DESCRIPTOR_SECTORS = 16
+
+
+def dvd_fingerprint(path: Path) -> str | None:
+    """pydvdid CRC64 of a DVD backup, `path` is the directory holding VIDEO_TS"""
+    try:
+        return f"dvd:{compute(str(path))}"
+    except (PydvdidException, OSError):
+        return None
+
+
+def blu_ray_fingerprint(path: Path) -> str | None:
+    """
+    AACS disc id of a Blu-ray, or SHA1 of its index and movie object tables when it has no AACS directory. `path`
+    is the directory holding BDMV.
+    """
+
+    try:
+        return f"aacs:{hashlib.sha1(path.joinpath(AACS_UNIT_KEY).read_bytes()).hexdigest()}"
+    except OSError:
+        pass
+
+    sha1 = hashlib.sha1()
+    try:
+        for name in BLU_RAY_FILES:
+            sha1.update(path.joinpath("BDMV", name).read_bytes())
+    except OSError:
+        return None
+
+    return f"bd:{sha1.hexdigest()}"
+
+
+def iso_fingerprint(path: Path) -> str | None:
+    """SHA1 of the volume descriptors of an ISO image along with its size"""
+
+    sha1 = hashlib.sha1()
+    try:
+        with open(path, "rb") as f:
+            f.seek(VOLUME_DESCRIPTOR_SECTOR * SECTOR_SIZE)
+            sha1.update(f.read(ISO_DESCRIPTOR_SECTORS * SECTOR_SIZE))
+            sha1.update(str(path.stat().st_size).encode())
+    except OSError:
+        return None
+
+    return f"iso:{sha1.hexdigest()}"
+
+
+def disc_fingerprint(disc: Path | ArchivedDisc | OpticalDrive, disc_type: OpticalDiscType | None = None) -> str | None:
+    """
+    Fingerprint of a disc, `None` when it is not a DVD, Blu-ray or ISO image or can not be read
+
+    Parameters
+    ----------
+    disc : `Path | ArchivedDisc | OpticalDrive` disc directory or ISO image, archived disc, or a drive with a
+        mounted disc
+    disc_type : `OpticalDiscType` skips categorizing the disc when already known
+    """
+
+    if isinstance(disc, OpticalDrive):
+        mount_location = disc.get_mount_location()
+        if mount_location == "":
+            return None
+        path = Path(mount_location)
+    elif isinstance(disc, ArchivedDisc):
+        path = disc.path
+        disc_type = disc.type if disc_type is None else disc_type
+    else:
+        path = disc
+
+    if path.suffix.lower() in ISO_EXTS:
+        return iso_fingerprint(path)
+
+    _type = OpticalDiscType.categorize(path) if disc_type is None else disc_type
+    if _type == OpticalDiscType.DVD:
+        return dvd_fingerprint(path)
+    if _type == OpticalDiscType.BLU_RAY:
+        return blu_ray_fingerprint(path)
+
+    return None
+
+
+def duplicate_discs(fingerprints: dict[Path, str | None]) -> list[list[Path]]:
+    """
+    Groups of discs that share a fingerprint, discs without one are left out
+
+    Parameters
+    ----------
+    fingerprints : `dict[Path, str | None]` as returned by `InventoryIndex.disc_fingerprints`
+
+    Returns
+    -------
+    `list[list[Path]]` sorted groups of at least two discs
+    """
+
+    groups: dict[str, list[Path]] = defaultdict(list)
+    for path, fingerprint in fingerprints.items():
+        if fingerprint is not None:
+            groups[fingerprint].append(path)
+
+    return sorted(sorted(g) for g in groups.values() if len(g) > 1)
@@ -1,13 +1,31 @@
 """
 Wrappers and Data Structures for HandbrakeCLI
+
+Fresh scans are validated by pydantic. Scans answered by the `ScanCache` were written by HandBrakeCLI and parsed by
+`HandBrakeScan.scan` before, so they are built with `construct` instead and their chapter and subtitle lists only
+become models when read.
 """
 from __future__ import annotations
 
 import subprocess
 import json
+from collections.abc import Sequence
 from pathlib import Path
+from typing import Any, Generic, Iterable, TypeVar, overload
 
 from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST
+
+from rkiv.scancache import ScanCache
+
+JSON_TITLE_SET = "JSON Title Set: "
+
+TICKS_PER_SECOND = 90000
+
+# Title lists that are only turned into models when read, a 200 title disc carries thousands of chapters
+LAZY_LISTS = ("ChapterList", "SubtitleList")
+
+M = TypeVar("M", bound=BaseModel)
 
 
 class AudioTrackAttributes(BaseModel):
@@ -157,6 +175,13 @@ class HandBrakeTitle(BaseModel):
 
         return (hours * 3600) + (minutes * 60) + seconds
 
+    @property
+    def exact_seconds(self) -> float:
+        """
+        The Duration in seconds from its ticks, a 90kHz count
+        """
+        return self.Duration.Ticks / TICKS_PER_SECOND
+
 
 class HandBrakeScan(BaseModel):
     """HandBrakeScan"""
@@ -165,18 +190,180 @@ class HandBrakeScan(BaseModel):
     TitleList: list[HandBrakeTitle]
 
     @staticmethod
-    def scan(path: Path) -> dict:
-        """Scans a file with handbrake returns json"""
+    def scan_cached(path: Path) -> tuple[dict, bool]:
+        """
+        Scans a file with handbrake, scans of known discs are answered from the `ScanCache`
+
+        Returns
+        -------
+        `tuple[dict, bool]` the JSON title set and whether it came from the cache
+        """
         cmd = ["HandBrakeCLI", "--json", "--title", "0", "--scan", "--min-duration", "0", "--input", str(path)]
-        proc = subprocess.run(cmd, capture_output=True, text=True)
-        lines = proc.stdout.splitlines()
-        idx = lines.index("JSON Title Set: {")
-        lines[idx] = "{"
-        return json.loads("\n".join(lines[idx:]))
+
+        def _run() -> tuple[str, dict]:
+            # The log on stderr is not needed, stdout is read as it arrives so only the title set is kept
+            with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True) as proc:
+                assert proc.stdout is not None
+                title_set = read_json_title_set(proc.stdout)
+                for _ in proc.stdout:
+                    pass
+            return title_set
+
+        _, parsed, cached = ScanCache().cached(tool=cmd[0], path=path, args=cmd[1:-1], run=_run)
+        return parsed, cached
+
+    @classmethod
+    def scan(cls, path: Path) -> dict:
+        """Scans a file with handbrake returns json, scans of known discs are answered from the `ScanCache`"""
+        return cls.scan_cached(path)[0]
+
+    @classmethod
+    def from_dict(cls, obj: dict, trusted: bool = False) -> HandBrakeScan:
+        """
+        Parameters
+        ----------
+        obj : `dict` JSON title set
+        trusted : `bool` skip validation and build chapter and subtitle lists lazily. Falls back to validation if
+            `obj` is missing a field.
+        """
+        if trusted:
+            try:
+                return construct(cls, obj)
+            except (KeyError, TypeError):
+                pass
+        return cls(**obj)
 
     @classmethod
     def from_scan(cls, path: Path) -> HandBrakeScan:
         """
-        Factory method from path scan
+        Factory method from path scan, cached scans are trusted
         """
-        return cls(**cls.scan(path))
+        parsed, cached = cls.scan_cached(path)
+        return cls.from_dict(parsed, trusted=cached)
+
+
+def read_json_title_set(stdout: Iterable[str]) -> tuple[str, dict]:
+    """
+    Reads HandBrakeCLI --json output up to the end of the JSON title set, earlier lines are skipped and reading
+    stops at the brace that closes the title set. HandBrakeCLI indents its JSON, so only a line starting with a
+    closing brace can end the title set and only those are tried with the decoder.
+
+    Returns
+    -------
+    `tuple[str, dict]` the title set without its "JSON Title Set: " prefix and its decoded value
+
+    Raises
+    ------
+    `ValueError` when the output ends without a complete title set
+    """
+
+    lines = iter(stdout)
+    for line in lines:
+        if line.startswith(JSON_TITLE_SET):
+            break
+    else:
+        raise ValueError("HandBrakeCLI output has no JSON Title Set")
+
+    decoder = json.JSONDecoder()
+    chunks = [line[len(JSON_TITLE_SET) :]]
+
+    def _decode() -> tuple[str, dict] | None:
+        text = "".join(chunks)
+        try:
+            parsed, end = decoder.raw_decode(text)
+        except json.JSONDecodeError:
+            return None
+        return text[:end], parsed
+
+    # A title set printed on a single line is complete already
+    title_set = None if chunks[0].rstrip() == "{" else _decode()
+    if title_set is not None:
+        return title_set
+
+    for line in lines:
+        chunks.append(line)
+        if line.startswith("}"):
+            title_set = _decode()
+            if title_set is not None:
+                return title_set
+
+    raise ValueError("HandBrakeCLI output ended inside the JSON Title Set")
+
+
+class LazyModelList(Sequence, Generic[M]):
+    """
+    Read only list of JSON objects that become models, without validation, the first time they are read. `len`
+    does not build anything.
+    """
+
+    __slots__ = (
+        "model",
+        "_raw",
+        "_items",
+    )
+
+    model: type[M]
+    _raw: list[dict]
+    _items: list[M | None]
+
+    def __init__(self, model: type[M], raw: list[dict]) -> None:
+        self.model = model
+        self._raw = raw
+        self._items = [None] * len(raw)
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    @overload
+    def __getitem__(self, index: int) -> M:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[M]:
+        ...
+
+    def __getitem__(self, index: int | slice) -> M | list[M]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        item = self._items[index]
+        if item is None:
+            item = self._items[index] = construct(self.model, self._raw[index])
+        return item
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f"LazyModelList({self.model.__name__}, {len(self)} items)"
+
+
+def construct(model: type[M], obj: dict) -> M:
+    """
+    Builds `model` and its sub-models from trusted JSON without validating it. Lists named in `LAZY_LISTS` become
+    a `LazyModelList`.
+
+    Raises
+    ------
+    `KeyError` when `obj` is missing a field of the model
+    """
+
+    if "4By3" in obj:
+        # SubtitleAttributes renames the key in __init__, which construct skips
+        obj = {"FourByThree": obj["4By3"], **obj}
+
+    values: dict[str, Any] = {}
+    for name, f in model.__fields__.items():
+        value = obj[name]
+        if isinstance(f.type_, type) and issubclass(f.type_, BaseModel):
+            if f.shape == SHAPE_LIST and name in LAZY_LISTS:
+                value = LazyModelList(f.type_, value)
+            elif f.shape == SHAPE_LIST:
+                value = [construct(f.type_, v) for v in value]
+            else:
+                value = construct(f.type_, value)
+        values[name] = value
+
+    return model.construct(**values)
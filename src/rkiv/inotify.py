@@ -0,0 +1,126 @@
+"""
+Minimal ctypes binding for the Linux inotify API
+"""
+from __future__ import annotations
+
+import os
+import struct
+import ctypes
+import ctypes.util
+from pathlib import Path
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+_EVENT = struct.Struct("iIII")
+
+
+class InotifyEvent:
+    """
+    A single event read off of an inotify file descriptor
+    """
+
+    __slots__ = (
+        "wd",
+        "mask",
+        "cookie",
+        "name",
+    )
+
+    wd: int
+    mask: int
+    cookie: int
+    name: str
+
+    def __init__(self, wd: int, mask: int, cookie: int, name: str) -> None:
+        self.wd = wd
+        self.mask = mask
+        self.cookie = cookie
+        self.name = name
+
+    @property
+    def is_dir(self) -> bool:
+        return bool(self.mask & IN_ISDIR)
+
+    @classmethod
+    def parse(cls, buffer: bytes) -> list[InotifyEvent]:
+        """
+        Parses the packed `struct inotify_event` records returned by a read on the inotify fd
+        """
+
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(buffer):
+            wd, mask, cookie, length = _EVENT.unpack_from(buffer, offset)
+            offset += _EVENT.size
+            name = buffer[offset : offset + length].rstrip(b"\0").decode(errors="surrogateescape")
+            offset += length
+            events.append(cls(wd=wd, mask=mask, cookie=cookie, name=name))
+
+        return events
+
+
+class Inotify:
+    """
+    Non blocking inotify instance. `fileno` can be handed to an event loop, `read` returns pending events.
+    """
+
+    fd: int
+
+    def __init__(self) -> None:
+        libc_name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not available on this platform")
+
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            self._raise()
+
+    def _raise(self) -> None:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def add_watch(self, path: Path, mask: int) -> int:
+        """Adds (or updates) a watch on `path` and returns its watch descriptor"""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            self._raise()
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        """Removes a watch, watches that are already gone are ignored"""
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self) -> list[InotifyEvent]:
+        """Reads all pending events, returns an empty list when there are none"""
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        return InotifyEvent.parse(buffer)
+
+    def close(self) -> None:
+        os.close(self.fd)
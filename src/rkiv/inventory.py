@@ -1,7 +1,12 @@
 import os
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from enum import Enum
-from typing import List, Dict, Any, Optional
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Callable, Tuple, Iterator, AsyncIterator, Sequence
 from dataclasses import dataclass
 
 
@@ -12,9 +17,24 @@ import click
 
 
 from rkiv.config import Config
+from rkiv.isoimage import iso_root_dirs
+
+if TYPE_CHECKING:
+    from rkiv.inventorytable import InventoryTable
+    from rkiv.matching import NearMiss
 
 CONFIG = Config()
 
+SCAN_WORKERS = 8
+
+# Levels below a category directory that hold stream objects: movies/<Title> and tv/<Show>/Season_N
+STREAM_LAYOUT_DEPTH = {"movie": 1, "movies": 1, "tv": 2}
+
+# Levels searched for a category directory when walking above one
+STREAM_SEARCH_DEPTH = 3
+
+ISO_EXTS = {".iso"}
+
 # context = pyudev.Context()
 # device = pyudev.Devices.from_device_file(context, "/dev/sr0")
 # d = device.items()
@@ -33,6 +53,121 @@ class MediaCategory(str, Enum):
         return pandas.CategoricalDtype(categories=[i.value for i in cls], ordered=False)
 
 
+class OpticalDiscType(str, Enum):
+    """Optical Disc Categories"""
+
+    CD = "cd"
+    DVD = "dvd"
+    BLU_RAY = "blu_ray"
+    FILES = "files"
+    UNDEFINED = "undefined"
+
+    @classmethod
+    def to_categorical(cls) -> pandas.CategoricalDtype:
+        return pandas.CategoricalDtype(categories=[i.value for i in cls], ordered=False)
+
+    @classmethod
+    def from_listing(cls, dirs: List[str], files: List[str]) -> "OpticalDiscType":
+        """Categorize a directory from the names of its sub directories and files"""
+
+        BD_FILES = {"BDMV"}
+        DVD_FILES = {"VIDEO_TS"}
+        CD_EXTS = {"wav"}
+        FILES_EXTS = {".m4v", ".mkv", ".mp4"}
+
+        for d in dirs:
+            if d in BD_FILES:
+                return cls.BLU_RAY
+            if d in DVD_FILES:
+                return cls.DVD
+
+        for file in files:
+            ext = os.path.splitext(file)[1]
+            if ext in CD_EXTS:
+                return cls.CD
+            if ext in FILES_EXTS:
+                return cls.FILES
+
+        return cls.UNDEFINED
+
+    @classmethod
+    def from_iso(cls, path: Path) -> "OpticalDiscType":
+        """Categorize an ISO image from the directories in its root, only the volume headers are read"""
+        return cls.from_listing(dirs=iso_root_dirs(path), files=[])
+
+    @classmethod
+    def categorize(cls, dir: Path) -> "OpticalDiscType":
+        """categorize"""
+        if dir.suffix.lower() in ISO_EXTS:
+            return cls.from_iso(path=dir)
+        return DirectoryListing.scan(dir=dir).type
+
+
+class DirectoryListing:
+    """
+    Result of listing a single directory once: its `OpticalDiscType`, the names of its sub directories and the
+    DVD or Blu-ray ISO images it holds
+    """
+
+    __slots__ = (
+        "type",
+        "dirs",
+        "isos",
+    )
+
+    type: OpticalDiscType
+    dirs: List[str]
+    isos: Dict[str, OpticalDiscType]
+
+    def __init__(
+        self, type: OpticalDiscType, dirs: List[str], isos: Optional[Dict[str, OpticalDiscType]] = None
+    ) -> None:
+        self.type = type
+        self.dirs = dirs
+        self.isos = {} if isos is None else isos
+
+    @classmethod
+    def scan(cls, dir: Path) -> "DirectoryListing":
+        """
+        Lists `dir` with a single `os.scandir` call and classifies it from the same listing. ISO images in
+        directories that are not discs themselves are classified from their headers. Unreadable directories are
+        treated as empty.
+        """
+
+        dirs = []
+        files = []
+        try:
+            with os.scandir(dir) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+
+                    if is_dir:
+                        dirs.append(entry.name)
+                    else:
+                        files.append(entry.name)
+        except OSError:
+            pass
+
+        _type = OpticalDiscType.from_listing(dirs=dirs, files=files)
+
+        isos = {}
+        if _type == OpticalDiscType.UNDEFINED:
+            for file in files:
+                if os.path.splitext(file)[1].lower() not in ISO_EXTS:
+                    continue
+                iso_type = OpticalDiscType.from_iso(path=dir.joinpath(file))
+                if iso_type != OpticalDiscType.UNDEFINED:
+                    isos[file] = iso_type
+
+        return cls(type=_type, dirs=dirs, isos=isos)
+
+
+Lister = Callable[[Path], DirectoryListing]
+
+
 @dataclass
 class StreamObject:
     """Archived Disc Object"""
@@ -68,12 +203,35 @@ class StreamObject:
         self.category = category
         self.match_name = match_name
 
+    def dict(self) -> Dict[str, Any]:
+        """dict"""
+        return {
+            "title": self.title,
+            "path": str(self.path),
+            "category": self.category.value,
+            "match_name": self.match_name,
+        }
+
     @classmethod
-    def from_dir(cls, dir: Path) -> Optional["StreamObject"]:
-        """from_dir"""
+    def from_dict(cls, obj: Dict[str, Any]) -> "StreamObject":
+        """from_dict"""
+        return cls(
+            title=obj["title"],
+            path=Path(obj["path"]),
+            category=MediaCategory(obj["category"]),
+            match_name=obj["match_name"],
+        )
+
+    @classmethod
+    def from_dir(cls, dir: Path, disc_type: Optional[OpticalDiscType] = None) -> Optional["StreamObject"]:
+        """
+        from_dir, `dir` can also be an ISO image. `disc_type` skips categorizing `dir` again when the caller already
+        listed it.
+        """
 
         season_in_stem = "Season_" in dir.stem
-        has_video_files = OpticalDiscType.categorize(dir=dir) == OpticalDiscType.FILES
+        _type = OpticalDiscType.categorize(dir=dir) if disc_type is None else disc_type
+        has_video_files = _type == OpticalDiscType.FILES
         if not (season_in_stem or has_video_files):
             return None
 
@@ -91,61 +249,81 @@ class StreamObject:
 
         return cls(title=_title, path=dir, category=_category, match_name=_match_name)
 
-    @classmethod
-    def walk_stream_library(cls, root_path: Path) -> list["StreamObject"]:
+    @staticmethod
+    def _layout_depth(path: Path) -> int:
         """
-        Walks the stream library
+        Number of levels below `path` that can still hold a stream object. Below a category directory the layout is
+        fixed (`STREAM_LAYOUT_DEPTH`), above one the walk keeps searching for up to `STREAM_SEARCH_DEPTH` levels.
         """
-        _from_dir = cls.from_dir(dir=root_path)
-        if _from_dir is not None:
-            return [_from_dir]
 
-        l = []
-        root, dirs, _ = next(os.walk(root_path))
-        for dir in [Path(root).joinpath(d) for d in dirs if d not in {""}]:
-            l += cls.walk_stream_library(root_path=dir)
+        parts = [i.lower() for i in path.parts]
+        for idx in reversed(range(len(parts))):
+            if parts[idx] in STREAM_LAYOUT_DEPTH:
+                return max(STREAM_LAYOUT_DEPTH[parts[idx]] - (len(parts) - 1 - idx), 0)
 
-        return l
+        return STREAM_SEARCH_DEPTH
 
+    @classmethod
+    def _match(cls, dir: Path, lister: Lister) -> Tuple[Optional["StreamObject"], DirectoryListing]:
+        """
+        Lists `dir` and matches it, season directories match on their name alone and are not listed
+        """
 
-class OpticalDiscType(str, Enum):
-    """Optical Disc Categories"""
+        listing = DirectoryListing(type=OpticalDiscType.UNDEFINED, dirs=[])
+        if "Season_" not in dir.stem:
+            listing = lister(dir)
 
-    CD = "cd"
-    DVD = "dvd"
-    BLU_RAY = "blu_ray"
-    FILES = "files"
-    UNDEFINED = "undefined"
+        return cls.from_dir(dir=dir, disc_type=listing.type), listing
 
     @classmethod
-    def to_categorical(cls) -> pandas.CategoricalDtype:
-        return pandas.CategoricalDtype(categories=[i.value for i in cls], ordered=False)
+    def _walk(cls, root_path: Path, lister: Lister, depth: int) -> list["StreamObject"]:
+        """
+        Walks at most `depth` levels below `root_path`, stopping at the first match on each branch
+        """
 
-    @classmethod
-    def categorize(cls, dir: Path) -> "OpticalDiscType":
-        """categorize"""
+        _from_dir, listing = cls._match(dir=root_path, lister=lister)
+        if _from_dir is not None:
+            return [_from_dir]
 
-        BD_FILES = {"BDMV"}
-        DVD_FILES = {"VIDEO_TS"}
-        CD_EXTS = {"wav"}
-        FILES_EXTS = {".m4v", ".mkv", ".mp4"}
+        if depth == 0:
+            return []
 
-        _, dirs, files = next(os.walk(dir))
+        l = []
+        for d in [d for d in listing.dirs if d not in {""}]:
+            _depth = STREAM_LAYOUT_DEPTH.get(d.lower(), depth - 1)
+            l += cls._walk(root_path=root_path.joinpath(d), lister=lister, depth=_depth)
 
-        for d in dirs:
-            if d in BD_FILES:
-                return cls.BLU_RAY
-            if d in DVD_FILES:
-                return cls.DVD
+        return l
 
-        for file in files:
-            ext = Path(file).suffix
-            if ext in CD_EXTS:
-                return cls.CD
-            if ext in FILES_EXTS:
-                return cls.FILES
+    @classmethod
+    def walk_stream_library(
+        cls, root_path: Path, lister: Lister = DirectoryListing.scan, max_workers: int = SCAN_WORKERS
+    ) -> list["StreamObject"]:
+        """
+        Walks the stream library. The walk follows the stream layout (`movies/<Title>` and `tv/<Show>/Season_N`) and
+        does not descend below the level where stream objects live. The top level sub directories (usually the
+        movies and tv trees) are walked concurrently.
+        """
 
-        return cls.UNDEFINED
+        _from_dir, listing = cls._match(dir=root_path, lister=lister)
+        if _from_dir is not None:
+            return [_from_dir]
+
+        depth = cls._layout_depth(root_path)
+        if depth == 0:
+            return []
+
+        l = []
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(cls._walk, root_path.joinpath(d), lister, STREAM_LAYOUT_DEPTH.get(d.lower(), depth - 1))
+                for d in listing.dirs
+                if d not in {""}
+            ]
+            for future in futures:
+                l += future.result()
+
+        return l
 
 
 @dataclass
@@ -210,6 +388,19 @@ class ArchivedDisc:
             "problem": self.problem,
         }
 
+    @classmethod
+    def from_dict(cls, obj: Dict[str, Any]) -> "ArchivedDisc":
+        """from_dict"""
+        return cls(
+            title=obj["title"],
+            disc_name=obj["disc_name"],
+            path=Path(obj["path"]),
+            category=MediaCategory(obj["category"]),
+            type=OpticalDiscType(obj["type"]),
+            iso=obj["iso"],
+            problem=obj["problem"],
+        )
+
     @classmethod
     def dtypes(cls) -> Dict[str, Any]:
         return {
@@ -217,17 +408,20 @@ class ArchivedDisc:
             "disc_name": str,
             "path": str,
             "category": MediaCategory.to_categorical(),
-            "type": MediaCategory.to_categorical(),
+            "type": OpticalDiscType.to_categorical(),
             "iso": bool,
             "problem": bool,
         }
 
     @classmethod
-    def from_dir(cls, dir: Path) -> "ArchivedDisc":
-        """from_dir"""
+    def from_dir(cls, dir: Path, disc_type: Optional[OpticalDiscType] = None) -> "ArchivedDisc":
+        """
+        from_dir, `dir` can also be an ISO image. `disc_type` skips categorizing `dir` again when the caller already
+        listed it.
+        """
 
         parts = [i.lower() for i in dir.parts]
-        _type = OpticalDiscType.categorize(dir=dir)
+        _type = OpticalDiscType.categorize(dir=dir) if disc_type is None else disc_type
         _disc_name = dir.stem
 
         _category = MediaCategory.MUSIC
@@ -242,32 +436,217 @@ class ArchivedDisc:
             path=dir,
             category=_category,
             type=_type,
-            iso=False,  # TODO Handle iso images
+            iso=dir.suffix.lower() in ISO_EXTS,
             problem=("problems" in parts) or ("problem" in parts),
         )
 
     @classmethod
-    def walk_disc_archive(cls, root_path: Path) -> List["ArchivedDisc"]:
+    def _iter_listing(cls, root_path: Path, listing: DirectoryListing, lister: Lister) -> Iterator["ArchivedDisc"]:
+        """Walks the sub directories of an already listed `root_path`"""
+
+        if listing.type != OpticalDiscType.UNDEFINED:
+            yield cls.from_dir(dir=root_path, disc_type=listing.type)
+            return
+
+        yield from cls._iter_isos(root_path=root_path, listing=listing)
+        for dir in [root_path.joinpath(d) for d in listing.dirs if d not in {"ArchiveShare"}]:
+            yield from cls._iter_walk(root_path=dir, lister=lister)
+
+    @classmethod
+    def _iter_isos(cls, root_path: Path, listing: DirectoryListing) -> Iterator["ArchivedDisc"]:
+        """The ISO images found in an already listed `root_path`"""
+        for name, disc_type in listing.isos.items():
+            yield cls.from_dir(dir=root_path.joinpath(name), disc_type=disc_type)
+
+    @classmethod
+    def _iter_walk(cls, root_path: Path, lister: Lister) -> Iterator["ArchivedDisc"]:
+        """Recursive walk that lists every directory exactly once"""
+        if root_path.stem == "lost+found":
+            return
+
+        yield from cls._iter_listing(root_path=root_path, listing=lister(root_path), lister=lister)
+
+    @classmethod
+    def _timed_walk(cls, root_path: Path, lister: Lister) -> Tuple[List["ArchivedDisc"], float]:
+        """`_iter_walk` that also returns the `time.perf_counter` it finished at"""
+        discs = list(cls._iter_walk(root_path=root_path, lister=lister))
+        return discs, time.perf_counter()
+
+    @classmethod
+    def iter_disc_archive(
+        cls,
+        root_path: Path,
+        max_workers: int = SCAN_WORKERS,
+        lister: Lister = DirectoryListing.scan,
+        max_pending: int = 256,
+    ) -> Iterator["ArchivedDisc"]:
+        """
+        Yields archived discs as soon as they are classified, in no particular order. The top level sub directories
+        are walked on a thread pool that feeds a queue of at most `max_pending` discs, so memory stays bounded no
+        matter how large the archive is. Closing the generator early stops the walk.
+        """
+
+        if root_path.stem == "lost+found":
+            return
+
+        listing = lister(root_path)
+        if listing.type != OpticalDiscType.UNDEFINED:
+            yield from cls._iter_listing(root_path=root_path, listing=listing, lister=lister)
+            return
+
+        yield from cls._iter_isos(root_path=root_path, listing=listing)
+
+        subtrees = [root_path.joinpath(d) for d in listing.dirs if d not in {"ArchiveShare"}]
+        pending: queue.Queue = queue.Queue(maxsize=max_pending)
+        stop = threading.Event()
+        done = object()
+
+        def _put(item: object) -> None:
+            while not stop.is_set():
+                try:
+                    pending.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def _produce(subtree: Path) -> None:
+            try:
+                for disc in cls._iter_walk(root_path=subtree, lister=lister):
+                    _put(disc)
+                    if stop.is_set():
+                        return
+            except Exception as e:
+                _put(e)
+            finally:
+                _put(done)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for subtree in subtrees:
+                pool.submit(_produce, subtree)
+
+            try:
+                remaining = len(subtrees)
+                while remaining > 0:
+                    item = pending.get()
+                    if item is done:
+                        remaining -= 1
+                    elif isinstance(item, Exception):
+                        raise item
+                    else:
+                        yield item
+            finally:
+                stop.set()
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    async def aiter_disc_archive(
+        cls,
+        root_path: Path,
+        max_workers: int = SCAN_WORKERS,
+        lister: Lister = DirectoryListing.scan,
+        max_pending: int = 256,
+    ) -> AsyncIterator["ArchivedDisc"]:
+        """
+        `iter_disc_archive` for asyncio code, the walk runs in the default executor
+        """
+
+        event_loop = asyncio.get_running_loop()
+        discs = cls.iter_disc_archive(
+            root_path=root_path, max_workers=max_workers, lister=lister, max_pending=max_pending
+        )
+
+        try:
+            while True:
+                disc = await event_loop.run_in_executor(None, next, discs, None)
+                if disc is None:
+                    break
+                yield disc
+        finally:
+            # Closing waits for the walk threads to notice the stop, which must not block the event loop
+            await event_loop.run_in_executor(None, discs.close)
+
+    @classmethod
+    def scan_disc_archives(
+        cls,
+        root_paths: List[Path],
+        max_workers: int = SCAN_WORKERS,
+        lister: Lister = DirectoryListing.scan,
+    ) -> List["ArchiveScan"]:
+        """
+        Walks several disc archives at once. Each root is listed up front and its top level sub directories are
+        fanned out on a bounded thread pool shared by all roots.
+
+        Parameters
+        ----------
+        root_paths : `List[Path]`
+        max_workers : `int` maximum number of directories being walked at once
+        lister : `Lister` lists and classifies a single directory
+
+        Returns
+        -------
+        `List[ArchiveScan]` in the same order as `root_paths`
+        """
+
+        pending: List[Tuple[Path, float, List[ArchivedDisc], List[Future]]] = []
+        scans = []
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for root_path in root_paths:
+                start = time.perf_counter()
+                discs: List[ArchivedDisc] = []
+                futures: List[Future] = []
+
+                if root_path.stem != "lost+found":
+                    listing = lister(root_path)
+                    if listing.type != OpticalDiscType.UNDEFINED:
+                        discs = list(cls._iter_listing(root_path=root_path, listing=listing, lister=lister))
+                    else:
+                        discs = list(cls._iter_isos(root_path=root_path, listing=listing))
+                        futures = [
+                            pool.submit(cls._timed_walk, root_path.joinpath(d), lister)
+                            for d in listing.dirs
+                            if d not in {"ArchiveShare"}
+                        ]
+
+                pending.append((root_path, start, discs, futures))
+
+            for root_path, start, discs, futures in pending:
+                end = time.perf_counter() if len(futures) == 0 else start
+                for future in futures:
+                    _discs, _end = future.result()
+                    discs += _discs
+                    end = max(end, _end)
+
+                scans.append(ArchiveScan(root_path=root_path, discs=discs, seconds=end - start))
+
+        return scans
+
+    @classmethod
+    def walk_disc_archive(cls, root_path: Path, max_workers: int = SCAN_WORKERS) -> List["ArchivedDisc"]:
         """
-        walk_disc_archive
+        walk_disc_archive, DVD and Blu-ray ISO images are returned with `iso` set
 
-        TODO Handle iso images. Need a good lib to do this, https://pypi.org/project/pycdio/
-        looks good but has some deps that need to be built and installed separate. Should get
-        a deps.sh script togother and document in readme. Should include other eternals like
+        TODO Should get a deps.sh script togother and document in readme. Should include other eternals like
         MakeMKV, abdcde, etc...
         """
-        if root_path.stem == "lost+found":
-            return []
+        return cls.scan_disc_archives(root_paths=[root_path], max_workers=max_workers)[0].discs
 
-        if OpticalDiscType.categorize(dir=root_path) != OpticalDiscType.UNDEFINED:
-            return [cls.from_dir(dir=root_path)]
 
-        l = []
-        root, dirs, _ = next(os.walk(root_path))
-        for dir in [Path(root).joinpath(d) for d in dirs if d not in {"ArchiveShare"}]:
-            l += cls.walk_disc_archive(root_path=dir)
+@dataclass(slots=True)
+class ArchiveScan:
+    """
+    Result of walking a single disc archive root
 
-        return l
+    Attributes
+    ----------
+    root_path  : `Path`
+    discs  : `list[ArchivedDisc]`
+    seconds  : `float` wall time spent walking the root
+    """
+
+    root_path: Path
+    discs: list[ArchivedDisc]
+    seconds: float
 
 
 @dataclass
@@ -282,44 +661,92 @@ class DiscArchiveDataFrame:
         "df": pandas.DataFrame,
     }
 
+    # String columns that repeat heavily across an archive, stored dictionary encoded in snapshots
+    DICTIONARY_COLUMNS = ("title", "disc_name", "path")
+
     def __init__(self, df: pandas.DataFrame) -> None:
         self.df = df
 
+    @staticmethod
+    def snapshot_path() -> Path:
+        """Default location of the archive snapshot"""
+        return Config.data_directory().joinpath("inventory.parquet")
+
     @classmethod
     def from_archive_list(cls, archived_discs: List[ArchivedDisc]) -> "DiscArchiveDataFrame":
         """from_archive_list"""
-        return cls(df=pandas.DataFrame(data=[i.dict() for i in archived_discs], dtype=ArchivedDisc.dtypes()))
+        df = pandas.DataFrame(data=[i.dict() for i in archived_discs], columns=list(ArchivedDisc.dtypes().keys()))
+        return cls(df=df.astype(ArchivedDisc.dtypes()))
 
     @classmethod
-    def from_parquet(cls, path: Path) -> "DiscArchiveDataFrame":
-        """from_parquet"""
-        return cls(df=pandas.read_parquet(path=path))
+    def from_parquet(cls, path: Path, columns: Optional[List[str]] = None) -> "DiscArchiveDataFrame":
+        """
+        Reads a snapshot written by `to_parquet`. Only `columns` are read from disk when given.
+        """
+        df = pandas.read_parquet(path=path, columns=columns)
+        dtypes = {k: v for k, v in ArchivedDisc.dtypes().items() if k in df.columns}
+        for column in cls.DICTIONARY_COLUMNS:
+            if column in dtypes:
+                dtypes[column] = "category"
+
+        return cls(df=df.astype(dtypes))
+
+    def to_parquet(self, path: Path) -> None:
+        """
+        Writes a snapshot. Category and disc type keep their enum categoricals, the path like string columns are
+        written as dictionary encoded strings.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        dtypes = {i: "category" for i in self.DICTIONARY_COLUMNS if i in self.df.columns}
+        self.df.astype(dtypes).to_parquet(path=path, index=False)
+
+    def disc_counts(self) -> pandas.DataFrame:
+        """Number of archived discs by `MediaCategory` and `OpticalDiscType`"""
+        return self.df.groupby(["category", "type"], observed=False).size().unstack(fill_value=0)
+
+    def title_counts(self) -> pandas.Series:
+        """
+        Number of distinct titles by `MediaCategory`. TV titles are seasons, so the season suffix is dropped to count
+        shows.
+        """
+        titles = self.df["title"].astype(str)
+        is_tv = self.df["category"] == MediaCategory.TV.value
+        titles = titles.where(~is_tv, titles.str.replace(r"_S\d+$", "", regex=True))
+        return titles.groupby(self.df["category"], observed=False).nunique()
+
+    def size_by(self, column: str) -> pandas.Series:
+        """Total `size_bytes` grouped by a categorical column, requires sizes from `InventoryIndex.disc_sizes`"""
+        return self.df.groupby(column, observed=False)["size_bytes"].sum()
 
 
 @dataclass(slots=True)
 class Inventory:
     """
-    Object to hold video streaming inventory
+    Object to hold video streaming inventory. The sequences are lazy views over an `InventoryTable`, objects are
+    only built for the rows that are used.
 
     Attributes
     ----------
-    stream_objects  : `list[StreamObject]`
-    video_archive  : `list[ArchivedDisc]`
-    unreleased_movies  : `list[ArchivedDisc]`
-    unreleased_tv  : `list[ArchivedDisc]`
+    stream_objects  : `Sequence[StreamObject]`
+    video_archive  : `Sequence[ArchivedDisc]`
+    unreleased_movies  : `Sequence[ArchivedDisc]`
+    unreleased_tv  : `Sequence[ArchivedDisc]`
+    table  : `InventoryTable` backing the sequences
     """
 
-    stream_objects: list[StreamObject]
-    video_archive: list[ArchivedDisc]
-    unreleased_movies: list[ArchivedDisc]
-    unreleased_tv: list[ArchivedDisc]
+    stream_objects: Sequence[StreamObject]
+    video_archive: Sequence[ArchivedDisc]
+    unreleased_movies: Sequence[ArchivedDisc]
+    unreleased_tv: Sequence[ArchivedDisc]
+    table: Optional["InventoryTable"] = None
 
     @staticmethod
     def find_unreleased_media(
         stream_objects: list[StreamObject], archived_objects: list[ArchivedDisc]
     ) -> list[ArchivedDisc]:
         """
-        Finds unreleased media by comparing title names in a list of `StreamObject`'s and `ArchivedDisc`'s.
+        Finds unreleased media by comparing normalized title names (`rkiv.matching.normalize_title`) in a list of
+        `StreamObject`'s and `ArchivedDisc`'s.
 
         Parameters
         ----------
@@ -330,37 +757,102 @@ class Inventory:
         -------
         `list[ArchivedDisc]`
         """
-        stream_titles = {t.match_name for t in stream_objects}
-        return [i for i in archived_objects if i.title not in stream_titles]
+        from rkiv.inventorytable import InventoryTable
+
+        return list(
+            InventoryTable.from_media(stream_objects=stream_objects, archived_discs=archived_objects).unreleased()
+        )
 
     @classmethod
-    def take_inventory(cls) -> "Inventory":
+    def from_table(cls, table: "InventoryTable") -> "Inventory":
+        """
+        Builds an inventory of lazy views over `table`
         """
-        Factory method to build a brand new inventory object
 
-        Returns
-        -------
-        `Inventory`
+        return cls(
+            stream_objects=table.stream_objects(),
+            video_archive=table.archived_discs(),
+            unreleased_movies=table.unreleased(category=MediaCategory.MOVIE),
+            unreleased_tv=table.unreleased(category=MediaCategory.TV),
+            table=table,
+        )
+
+    @classmethod
+    def from_media(cls, stream_objects: list[StreamObject], archived_discs: list[ArchivedDisc]) -> "Inventory":
         """
+        Builds an inventory from already walked stream objects and archived discs
+        """
+        from rkiv.inventorytable import InventoryTable
 
-        click.secho("Walking the Archive", bold=True)
-        archived_discs = []
-        for archive in CONFIG.video_archives:
-            _archived_discs = ArchivedDisc.walk_disc_archive(root_path=archive)
-            archived_discs += _archived_discs
-            click.echo(f"  [{len(_archived_discs)}] {archive}")
+        return cls.from_table(InventoryTable.from_media(stream_objects=stream_objects, archived_discs=archived_discs))
 
-        click.secho("Walking the Stream", bold=True)
-        stream_objects = []
-        for stream in CONFIG.video_streams:
-            _stream_objects = StreamObject.walk_stream_library(root_path=stream)
-            stream_objects += _stream_objects
-            click.echo(f"  [{len(_stream_objects)}] {stream}")
+    def near_miss(self, disc: ArchivedDisc) -> Optional["NearMiss"]:
+        """
+        Closest stream title to an unreleased `disc` along with its score, `None` if nothing comes close
+        """
+        if self.table is None:
+            return None
+        return self.table.near_miss(disc)
 
-        unreleased = cls.find_unreleased_media(stream_objects=stream_objects, archived_objects=archived_discs)
-        return cls(
-            stream_objects=stream_objects,
-            video_archive=archived_discs,
-            unreleased_movies=[s for s in unreleased if s.category == MediaCategory.MOVIE],
-            unreleased_tv=[s for s in unreleased if s.category == MediaCategory.TV],
+    def dict(self) -> Dict[str, Any]:
+        """dict"""
+        return {
+            "stream_objects": [i.dict() for i in self.stream_objects],
+            "video_archive": [i.dict() for i in self.video_archive],
+        }
+
+    @classmethod
+    def from_dict(cls, obj: Dict[str, Any]) -> "Inventory":
+        """from_dict, no objects are built until they are accessed"""
+        from rkiv.inventorytable import InventoryTable
+
+        return cls.from_table(
+            InventoryTable.from_dicts(stream_objects=obj["stream_objects"], archived_discs=obj["video_archive"])
         )
+
+    @classmethod
+    def take_inventory(cls, full: bool = False) -> "Inventory":
+        """
+        Factory method to build a brand new inventory object. Directories that have not changed since the last
+        inventory are answered from the `InventoryIndex` unless `full` is set.
+
+        Returns
+        -------
+        `Inventory`
+        """
+        from rkiv.inventoryindex import InventoryIndex
+        from rkiv.inventorywatch import InventoryClient
+
+        if not full:
+            inventory = InventoryClient().fetch()
+            if inventory is not None:
+                click.secho("Inventory served by the watch daemon", bold=True)
+                return inventory
+
+        index = InventoryIndex(full=full)
+
+        def _walk_streams() -> list[tuple[Path, list[StreamObject]]]:
+            return [(stream, index.walk_stream_library(root_path=stream)) for stream in CONFIG.video_streams]
+
+        # The stream is walked in the background while discs stream in from the archive
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            streams = pool.submit(_walk_streams)
+
+            # Every archive root is walked at once on the shared pool of `scan_disc_archives`
+            click.secho("Walking the Archive", bold=True)
+            archived_discs = []
+            for scan in index.walk_disc_archives(root_paths=CONFIG.video_archives):
+                archived_discs += scan.discs
+                click.echo(f"  [{len(scan.discs)}] {scan.root_path} ({scan.seconds:.2f}s)")
+
+            click.secho("Walking the Stream", bold=True)
+            stream_objects = []
+            for stream, _stream_objects in streams.result():
+                stream_objects += _stream_objects
+                click.echo(f"  [{len(_stream_objects)}] {stream}")
+
+        index.save()
+        click.echo(f"  Listed {index.listed} of {index.visited} directories")
+
+        archived_discs.sort(key=lambda d: str(d.path))
+        return cls.from_media(stream_objects=stream_objects, archived_discs=archived_discs)
@@ -0,0 +1,501 @@
+"""
+Persistent inventory index. Stores a listing of every directory walked in the video archive and stream along with
+the directory's mtime and inode, so later walks only re-list directories that changed since the last run. The
+`ArchivedDisc` and `StreamObject` results of each walk are stored next to the listings, as are per disc byte totals
+and fingerprints.
+"""
+from __future__ import annotations
+
+import os
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+from rkiv.config import Config
+from rkiv.fingerprint import disc_fingerprint
+from rkiv.inventory import (
+    ArchivedDisc,
+    ArchiveScan,
+    DirectoryListing,
+    ISO_EXTS,
+    MediaCategory,
+    OpticalDiscType,
+    StreamObject,
+    SCAN_WORKERS,
+)
+
+
+# Bumped whenever SCHEMA changes, older indexes are dropped and rebuilt by the next walk
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    dirs TEXT NOT NULL,
+    isos TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS archived_discs (
+    path TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    disc_name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    type TEXT NOT NULL,
+    iso INTEGER NOT NULL,
+    problem INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stream_objects (
+    path TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    category TEXT NOT NULL,
+    match_name TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS disc_sizes (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size_bytes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS disc_fingerprints (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS disc_fingerprints_fingerprint ON disc_fingerprints (fingerprint);
+"""
+
+
+def directory_size(path: Path) -> int:
+    """
+    Total size in bytes of the files under `path`, using the stat data `os.scandir` already has. Symlinks are not
+    followed. ISO images are sized from a single stat.
+    """
+
+    if path.suffix.lower() in ISO_EXTS:
+        try:
+            return os.stat(path).st_size
+        except OSError:
+            return 0
+
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(Path(entry.path))
+                        elif entry.is_file(follow_symlinks=False):
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+
+    return total
+
+
+def size_key(path: Path) -> int:
+    """
+    Newest mtime of `path` and its direct sub directories (VIDEO_TS, BDMV, ...). Archived discs are write once, so
+    this is enough to tell when a cached size is stale without walking the whole disc.
+    """
+
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+        if path.suffix.lower() in ISO_EXTS:
+            return mtime_ns
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    mtime_ns = max(mtime_ns, entry.stat(follow_symlinks=False).st_mtime_ns)
+    except OSError:
+        return -1
+
+    return mtime_ns
+
+
+class IndexedDirectory:
+    """
+    A `DirectoryListing` along with the stat info it was listed under
+    """
+
+    __slots__ = (
+        "mtime_ns",
+        "inode",
+        "listing",
+    )
+
+    mtime_ns: int
+    inode: int
+    listing: DirectoryListing
+
+    def __init__(self, mtime_ns: int, inode: int, listing: DirectoryListing) -> None:
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.listing = listing
+
+    def matches(self, stat: os.stat_result) -> bool:
+        """True if the directory has not changed since it was listed"""
+        return self.mtime_ns == stat.st_mtime_ns and self.inode == stat.st_ino
+
+
+class InventoryIndex:
+    """
+    Incremental directory index backed by SQLite.
+
+    The whole index is read into memory when it is created. `list_dir` is a drop in `Lister` for the inventory
+    walkers, it stats a directory and only lists it again when its mtime or inode changed (or `full` is set). Call
+    `save` to write the walked roots back to disk.
+    """
+
+    path: Path
+    full: bool
+    visited: int
+    listed: int
+    sized: int
+    fingerprinted: int
+
+    def __init__(self, path: Path | None = None, full: bool = False) -> None:
+        self.path = self.default_path() if path is None else path
+        self.full = full
+        self.visited = 0
+        self.listed = 0
+        self.sized = 0
+        self.fingerprinted = 0
+        self._lock = threading.Lock()
+        self._cache: dict[str, IndexedDirectory] = {}
+        self._walked: dict[str, IndexedDirectory] = {}
+        self._roots: list[Path] = []
+        self._archived_discs: dict[str, tuple[ArchivedDisc, IndexedDirectory]] = {}
+        self._stream_objects: dict[str, tuple[StreamObject, IndexedDirectory]] = {}
+
+        if self.path.exists():
+            self._load()
+
+    @staticmethod
+    def default_path() -> Path:
+        """Location of the index in the rkiv data directory"""
+        return Config.data_directory().joinpath("inventory.db")
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(self.path)
+        if con.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            for table in ("directories", "archived_discs", "stream_objects", "disc_sizes", "disc_fingerprints"):
+                con.execute(f"DROP TABLE IF EXISTS {table}")
+            con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        con.executescript(SCHEMA)
+        return con
+
+    def _load(self) -> None:
+        con = self._connect()
+        try:
+            for path, mtime_ns, inode, _type, dirs, isos in con.execute("SELECT * FROM directories"):
+                listing = DirectoryListing(
+                    type=OpticalDiscType(_type),
+                    dirs=json.loads(dirs),
+                    isos={k: OpticalDiscType(v) for k, v in json.loads(isos).items()},
+                )
+                self._cache[path] = IndexedDirectory(mtime_ns=mtime_ns, inode=inode, listing=listing)
+        finally:
+            con.close()
+
+    def list_dir(self, dir: Path) -> DirectoryListing:
+        """
+        `Lister` that answers from the index when `dir` is unchanged
+        """
+
+        key = str(dir)
+        try:
+            stat = os.stat(dir)
+        except OSError:
+            return DirectoryListing(type=OpticalDiscType.UNDEFINED, dirs=[])
+
+        cached = self._cache.get(key)
+        listed = self.full or cached is None or not cached.matches(stat)
+        if listed:
+            cached = IndexedDirectory(
+                mtime_ns=stat.st_mtime_ns, inode=stat.st_ino, listing=DirectoryListing.scan(dir=dir)
+            )
+            self._cache[key] = cached
+
+        with self._lock:
+            self._walked[key] = cached
+            self.visited += 1
+            self.listed += int(listed)
+
+        return cached.listing
+
+    def _indexed(self, path: Path) -> IndexedDirectory:
+        """
+        The walked entry for `path`, paths that were found without being listed (ISO images, seasons) are stat'ed.
+        A path removed since the walk found it gets a stale entry that no stat matches, so it is listed again.
+        """
+
+        walked = self._walked.get(str(path))
+        if walked is not None:
+            return walked
+
+        listing = DirectoryListing(type=OpticalDiscType.UNDEFINED, dirs=[])
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return IndexedDirectory(mtime_ns=-1, inode=-1, listing=listing)
+        return IndexedDirectory(mtime_ns=stat.st_mtime_ns, inode=stat.st_ino, listing=listing)
+
+    def walked_directories(self) -> list[Path]:
+        """Every directory visited by a walk through this index"""
+        return [Path(i) for i in self._walked.keys()]
+
+    def walk_disc_archives(self, root_paths: list[Path]) -> list[ArchiveScan]:
+        """
+        `ArchivedDisc.scan_disc_archives` using the index
+        """
+
+        scans = ArchivedDisc.scan_disc_archives(root_paths=root_paths, lister=self.list_dir)
+        for scan in scans:
+            self._roots.append(scan.root_path)
+            for disc in scan.discs:
+                self._archived_discs[str(disc.path)] = (disc, self._indexed(disc.path))
+
+        return scans
+
+    def iter_disc_archive(self, root_path: Path) -> Iterator[ArchivedDisc]:
+        """
+        `ArchivedDisc.iter_disc_archive` using the index. The root is only recorded for `save` once the walk has
+        been consumed to the end.
+        """
+
+        for disc in ArchivedDisc.iter_disc_archive(root_path=root_path, lister=self.list_dir):
+            self._archived_discs[str(disc.path)] = (disc, self._indexed(disc.path))
+            yield disc
+
+        self._roots.append(root_path)
+
+    def walk_stream_library(self, root_path: Path) -> list[StreamObject]:
+        """
+        `StreamObject.walk_stream_library` using the index
+        """
+
+        stream_objects = StreamObject.walk_stream_library(root_path=root_path, lister=self.list_dir)
+        self._roots.append(root_path)
+        for stream_object in stream_objects:
+            self._stream_objects[str(stream_object.path)] = (stream_object, self._indexed(stream_object.path))
+
+        return stream_objects
+
+    def archived_discs(self) -> list[ArchivedDisc]:
+        """
+        Reads every `ArchivedDisc` stored in the index without touching the archive
+        """
+
+        con = self._connect()
+        try:
+            rows = con.execute(
+                "SELECT path, title, disc_name, category, type, iso, problem FROM archived_discs ORDER BY path"
+            ).fetchall()
+        finally:
+            con.close()
+
+        return [
+            ArchivedDisc(
+                title=title,
+                disc_name=disc_name,
+                path=Path(path),
+                category=MediaCategory(category),
+                type=OpticalDiscType(_type),
+                iso=bool(iso),
+                problem=bool(problem),
+            )
+            for path, title, disc_name, category, _type, iso, problem in rows
+        ]
+
+    def stream_objects(self) -> list[StreamObject]:
+        """
+        Reads every `StreamObject` stored in the index without touching the stream
+        """
+
+        con = self._connect()
+        try:
+            rows = con.execute("SELECT path, title, category, match_name FROM stream_objects ORDER BY path").fetchall()
+        finally:
+            con.close()
+
+        return [
+            StreamObject(title=title, path=Path(path), category=MediaCategory(category), match_name=match_name)
+            for path, title, category, match_name in rows
+        ]
+
+    def disc_sizes(self, discs: list[ArchivedDisc], max_workers: int = SCAN_WORKERS) -> dict[Path, int]:
+        """
+        Size in bytes of every disc. Sizes are summed on a thread pool and cached keyed on `size_key`, so discs that
+        have not changed since the last call are not walked again.
+
+        Returns
+        -------
+        `dict[Path, int]` keyed on `ArchivedDisc.path`
+        """
+
+        con = self._connect()
+        try:
+            cached = {path: (mtime_ns, size) for path, mtime_ns, size in con.execute("SELECT * FROM disc_sizes")}
+        finally:
+            con.close()
+
+        def _size(disc: ArchivedDisc) -> tuple[Path, int, int, bool]:
+            key = size_key(disc.path)
+            hit = cached.get(str(disc.path))
+            if hit is not None and hit[0] == key:
+                return disc.path, key, hit[1], False
+            return disc.path, key, directory_size(disc.path), True
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_size, discs))
+
+        self.sized = sum(int(walked) for _, _, _, walked in results)
+
+        con = self._connect()
+        try:
+            with con:
+                con.executemany(
+                    "INSERT OR REPLACE INTO disc_sizes VALUES (?, ?, ?)",
+                    [(str(path), key, size) for path, key, size, walked in results if walked],
+                )
+        finally:
+            con.close()
+
+        return {path: size for path, _, size, _ in results}
+
+    def disc_fingerprints(self, discs: list[ArchivedDisc], max_workers: int = SCAN_WORKERS) -> dict[Path, str | None]:
+        """
+        Fingerprint of every disc, see `rkiv.fingerprint`. Cached keyed on `size_key` the same way as `disc_sizes`.
+
+        Returns
+        -------
+        `dict[Path, str | None]` keyed on `ArchivedDisc.path`, `None` for discs that could not be fingerprinted
+        """
+
+        con = self._connect()
+        try:
+            cached = {path: (mtime_ns, fp) for path, mtime_ns, fp in con.execute("SELECT * FROM disc_fingerprints")}
+        finally:
+            con.close()
+
+        def _fingerprint(disc: ArchivedDisc) -> tuple[Path, int, str | None, bool]:
+            key = size_key(disc.path)
+            hit = cached.get(str(disc.path))
+            if hit is not None and hit[0] == key:
+                return disc.path, key, hit[1], False
+            return disc.path, key, disc_fingerprint(disc), True
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_fingerprint, discs))
+
+        self.fingerprinted = sum(int(read) for _, _, _, read in results)
+
+        con = self._connect()
+        try:
+            with con:
+                con.executemany(
+                    "INSERT OR REPLACE INTO disc_fingerprints VALUES (?, ?, ?)",
+                    [(str(path), key, fp) for path, key, fp, read in results if read],
+                )
+        finally:
+            con.close()
+
+        return {path: fp for path, _, fp, _ in results}
+
+    def add_fingerprint(self, path: Path, fingerprint: str) -> None:
+        """Records the fingerprint of a disc written outside of a walk, such as a fresh rip"""
+
+        con = self._connect()
+        try:
+            with con:
+                con.execute(
+                    "INSERT OR REPLACE INTO disc_fingerprints VALUES (?, ?, ?)",
+                    (str(path), size_key(path), fingerprint),
+                )
+        finally:
+            con.close()
+
+    def find_fingerprint(self, fingerprint: str) -> list[Path]:
+        """Discs with `fingerprint` that still exist on disk"""
+
+        con = self._connect()
+        try:
+            rows = con.execute(
+                "SELECT path FROM disc_fingerprints WHERE fingerprint = ? ORDER BY path", (fingerprint,)
+            ).fetchall()
+        finally:
+            con.close()
+
+        return [Path(path) for path, in rows if Path(path).exists()]
+
+    def save(self) -> None:
+        """
+        Replaces everything stored under the walked roots with the results of this walk
+        """
+
+        con = self._connect()
+        try:
+            with con:
+                for root in self._roots:
+                    prefix = os.path.join(str(root), "")
+                    for table in ("directories", "archived_discs", "stream_objects"):
+                        con.execute(
+                            f"DELETE FROM {table} WHERE path = ? OR substr(path, 1, ?) = ?",
+                            (str(root), len(prefix), prefix),
+                        )
+
+                con.executemany(
+                    "INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            k,
+                            v.mtime_ns,
+                            v.inode,
+                            v.listing.type.value,
+                            json.dumps(v.listing.dirs),
+                            json.dumps({n: t.value for n, t in v.listing.isos.items()}),
+                        )
+                        for k, v in self._walked.items()
+                    ],
+                )
+                con.executemany(
+                    "INSERT OR REPLACE INTO archived_discs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            k,
+                            d.title,
+                            d.disc_name,
+                            d.category.value,
+                            d.type.value,
+                            int(d.iso),
+                            int(d.problem),
+                            i.mtime_ns,
+                            i.inode,
+                        )
+                        for k, (d, i) in self._archived_discs.items()
+                    ],
+                )
+                con.executemany(
+                    "INSERT OR REPLACE INTO stream_objects VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (k, s.title, s.category.value, s.match_name, i.mtime_ns, i.inode)
+                        for k, (s, i) in self._stream_objects.items()
+                    ],
+                )
+        finally:
+            con.close()
+
+        self._roots = []
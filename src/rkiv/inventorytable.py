@@ -0,0 +1,319 @@
+"""
+Columnar inventory for very large archives. Archived discs and stream objects are stored as a struct of arrays:
+interned string codes for titles and paths, int8 category and type codes and a flags bitfield. Filters and the
+unreleased media check run vectorized over the codes, `ArchivedDisc` and `StreamObject` objects are only built for
+the rows a caller actually looks at.
+"""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Sequence, overload
+
+import numpy
+
+from rkiv.inventory import ArchivedDisc, MediaCategory, OpticalDiscType, StreamObject
+from rkiv.matching import NearMiss, TitleMatcher, normalize_title, title_year
+
+CATEGORIES = list(MediaCategory)
+DISC_TYPES = list(OpticalDiscType)
+
+FLAG_ISO = 0x01
+FLAG_PROBLEM = 0x02
+
+
+class StringPool:
+    """
+    Interns strings to dense `int32` codes, equal strings always get the same code
+    """
+
+    __slots__ = (
+        "values",
+        "_codes",
+    )
+
+    values: list[str]
+
+    def __init__(self) -> None:
+        self.values = []
+        self._codes: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, code: int) -> str:
+        return self.values[code]
+
+    def code(self, value: str) -> int:
+        """Code for `value`, adding it to the pool if it is new"""
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+    def codes(self, values: Iterable[str]) -> numpy.ndarray:
+        """`code` for each of `values`"""
+        return numpy.fromiter((self.code(v) for v in values), dtype=numpy.int32)
+
+    def lookup(self, value: str) -> int:
+        """Code for `value` without adding it, -1 when it is not in the pool"""
+        return self._codes.get(value, -1)
+
+
+class LazyRows(Sequence):
+    """
+    Read only sequence over selected rows of a table, each row is built by `get` the first time it is accessed
+    """
+
+    __slots__ = (
+        "_indices",
+        "_get",
+    )
+
+    def __init__(self, indices: numpy.ndarray, get: Callable[[int], Any]) -> None:
+        self._indices = indices
+        self._get = get
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+    @overload
+    def __getitem__(self, i: int) -> Any:
+        ...
+
+    @overload
+    def __getitem__(self, i: slice) -> LazyRows:
+        ...
+
+    def __getitem__(self, i: int | slice) -> Any:
+        if isinstance(i, slice):
+            return LazyRows(indices=self._indices[i], get=self._get)
+        return self._get(int(self._indices[i]))
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in self._indices:
+            yield self._get(int(i))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self) -> str:
+        return f"LazyRows({len(self)} rows)"
+
+    @property
+    def indices(self) -> numpy.ndarray:
+        """Row numbers in the underlying table"""
+        return self._indices
+
+
+class InventoryTable:
+    """
+    Struct of arrays holding every archived disc and stream object.
+
+    Paths are split into an interned parent directory and name, so the thousands of discs under a title or show
+    directory share the parent string. Objects handed in through `from_media` are kept and returned as is, rows
+    loaded from dicts are materialized on first access and then cached.
+    """
+
+    strings: StringPool
+    disc_title: numpy.ndarray
+    disc_key: numpy.ndarray
+    disc_year: numpy.ndarray
+    disc_name: numpy.ndarray
+    disc_parent: numpy.ndarray
+    disc_file: numpy.ndarray
+    disc_category: numpy.ndarray
+    disc_type: numpy.ndarray
+    disc_flags: numpy.ndarray
+    stream_title: numpy.ndarray
+    stream_match_name: numpy.ndarray
+    stream_key: numpy.ndarray
+    stream_year: numpy.ndarray
+    stream_parent: numpy.ndarray
+    stream_file: numpy.ndarray
+    stream_category: numpy.ndarray
+
+    def __init__(self) -> None:
+        self.strings = StringPool()
+        self._discs: list[ArchivedDisc | None] = []
+        self._streams: list[StreamObject | None] = []
+        self._matcher: TitleMatcher | None = None
+
+    def __len__(self) -> int:
+        return len(self.disc_title) + len(self.stream_title)
+
+    def _keys(self, codes: numpy.ndarray) -> numpy.ndarray:
+        """Codes of the normalized matching keys, each distinct string is only normalized once"""
+        unique, inverse = numpy.unique(codes, return_inverse=True)
+        keys = self.strings.codes(normalize_title(self.strings[c]) for c in unique)
+        return keys[inverse.reshape(-1)] if len(unique) > 0 else numpy.zeros(0, dtype=numpy.int32)
+
+    def _years(self, codes: numpy.ndarray) -> numpy.ndarray:
+        """Trailing parenthesized years of the titles, 0 for undated titles"""
+        unique, inverse = numpy.unique(codes, return_inverse=True)
+        years = numpy.fromiter((title_year(self.strings[c]) or 0 for c in unique), dtype=numpy.int16)
+        return years[inverse.reshape(-1)] if len(unique) > 0 else numpy.zeros(0, dtype=numpy.int16)
+
+    def _split(self, paths: list[str]) -> tuple[numpy.ndarray, numpy.ndarray]:
+        parents, names = zip(*(os.path.split(p) for p in paths)) if len(paths) > 0 else ((), ())
+        return self.strings.codes(parents), self.strings.codes(names)
+
+    def _set_discs(self, rows: list[dict[str, Any]], discs: list[ArchivedDisc | None]) -> None:
+        category_codes = {c.value: i for i, c in enumerate(CATEGORIES)}
+        type_codes = {t.value: i for i, t in enumerate(DISC_TYPES)}
+
+        self.disc_title = self.strings.codes(r["title"] for r in rows)
+        self.disc_key = self._keys(self.disc_title)
+        self.disc_year = self._years(self.disc_title)
+        self.disc_name = self.strings.codes(r["disc_name"] for r in rows)
+        self.disc_parent, self.disc_file = self._split([r["path"] for r in rows])
+        self.disc_category = numpy.fromiter((category_codes[r["category"]] for r in rows), dtype=numpy.int8)
+        self.disc_type = numpy.fromiter((type_codes[r["type"]] for r in rows), dtype=numpy.int8)
+        self.disc_flags = numpy.fromiter(
+            (FLAG_ISO * bool(r["iso"]) | FLAG_PROBLEM * bool(r["problem"]) for r in rows), dtype=numpy.uint8
+        )
+        self._discs = discs
+
+    def _set_streams(self, rows: list[dict[str, Any]], streams: list[StreamObject | None]) -> None:
+        category_codes = {c.value: i for i, c in enumerate(CATEGORIES)}
+
+        self.stream_title = self.strings.codes(r["title"] for r in rows)
+        self.stream_match_name = self.strings.codes(r["match_name"] for r in rows)
+        self.stream_key = self._keys(self.stream_match_name)
+        self.stream_year = self._years(self.stream_match_name)
+        self.stream_parent, self.stream_file = self._split([r["path"] for r in rows])
+        self.stream_category = numpy.fromiter((category_codes[r["category"]] for r in rows), dtype=numpy.int8)
+        self._streams = streams
+
+    @classmethod
+    def from_media(cls, stream_objects: list[StreamObject], archived_discs: list[ArchivedDisc]) -> InventoryTable:
+        """
+        Builds a table from walked objects, the objects themselves are kept for materialization
+        """
+
+        table = cls()
+        table._set_discs([d.dict() for d in archived_discs], list(archived_discs))
+        table._set_streams([s.dict() for s in stream_objects], list(stream_objects))
+        return table
+
+    @classmethod
+    def from_dicts(cls, stream_objects: list[dict[str, Any]], archived_discs: list[dict[str, Any]]) -> InventoryTable:
+        """
+        Builds a table straight from `ArchivedDisc.dict` and `StreamObject.dict` rows without creating any objects
+        """
+
+        table = cls()
+        table._set_discs(archived_discs, [None] * len(archived_discs))
+        table._set_streams(stream_objects, [None] * len(stream_objects))
+        return table
+
+    def disc_mask(
+        self,
+        category: MediaCategory | None = None,
+        disc_type: OpticalDiscType | None = None,
+        iso: bool | None = None,
+        problem: bool | None = None,
+    ) -> numpy.ndarray:
+        """
+        Boolean mask over the archived discs matching every filter that is not `None`
+        """
+
+        mask = numpy.ones(len(self.disc_title), dtype=bool)
+        if category is not None:
+            mask &= self.disc_category == CATEGORIES.index(category)
+        if disc_type is not None:
+            mask &= self.disc_type == DISC_TYPES.index(disc_type)
+        if iso is not None:
+            mask &= ((self.disc_flags & FLAG_ISO) != 0) == iso
+        if problem is not None:
+            mask &= ((self.disc_flags & FLAG_PROBLEM) != 0) == problem
+        return mask
+
+    def unreleased_mask(self) -> numpy.ndarray:
+        """
+        Boolean mask over the archived discs whose normalized title does not match any stream object. Years are
+        only compared when both titles are dated, see `rkiv.matching.years_match`.
+        """
+
+        def dated(key: numpy.ndarray, year: numpy.ndarray) -> numpy.ndarray:
+            return key.astype(numpy.int64) * 10000 + year
+
+        released = numpy.isin(self.disc_key, self.stream_key) & (self.disc_year == 0)
+        released |= numpy.isin(self.disc_key, self.stream_key[self.stream_year == 0])
+        released |= numpy.isin(dated(self.disc_key, self.disc_year), dated(self.stream_key, self.stream_year))
+        return ~released
+
+    def unreleased(self, category: MediaCategory | None = None) -> LazyRows:
+        """
+        Archived discs whose title is not in the stream, optionally limited to a `category`
+        """
+        return self.archived_discs(self.unreleased_mask() & self.disc_mask(category=category))
+
+    def matcher(self) -> TitleMatcher:
+        """`TitleMatcher` over the stream match names, built on first use"""
+        if self._matcher is None:
+            self._matcher = TitleMatcher([self.strings[c] for c in numpy.unique(self.stream_match_name)])
+        return self._matcher
+
+    def near_miss(self, disc: ArchivedDisc) -> NearMiss | None:
+        """
+        Closest stream title to an unreleased disc's title
+        """
+        return self.matcher().near_miss(disc.title)
+
+    def _path(self, parent: int, file: int) -> Path:
+        return Path(os.path.join(self.strings[parent], self.strings[file]))
+
+    def archived_disc(self, i: int) -> ArchivedDisc:
+        """
+        The `ArchivedDisc` in row `i`, built on first access
+        """
+
+        disc = self._discs[i]
+        if disc is None:
+            flags = int(self.disc_flags[i])
+            disc = ArchivedDisc(
+                title=self.strings[self.disc_title[i]],
+                disc_name=self.strings[self.disc_name[i]],
+                path=self._path(self.disc_parent[i], self.disc_file[i]),
+                category=CATEGORIES[self.disc_category[i]],
+                type=DISC_TYPES[self.disc_type[i]],
+                iso=bool(flags & FLAG_ISO),
+                problem=bool(flags & FLAG_PROBLEM),
+            )
+            self._discs[i] = disc
+        return disc
+
+    def stream_object(self, i: int) -> StreamObject:
+        """
+        The `StreamObject` in row `i`, built on first access
+        """
+
+        stream_object = self._streams[i]
+        if stream_object is None:
+            stream_object = StreamObject(
+                title=self.strings[self.stream_title[i]],
+                path=self._path(self.stream_parent[i], self.stream_file[i]),
+                category=CATEGORIES[self.stream_category[i]],
+                match_name=self.strings[self.stream_match_name[i]],
+            )
+            self._streams[i] = stream_object
+        return stream_object
+
+    def archived_discs(self, mask: numpy.ndarray | None = None) -> LazyRows:
+        """
+        Lazy sequence of the archived discs selected by a boolean `mask`, all of them when it is `None`
+        """
+        indices = numpy.arange(len(self.disc_title)) if mask is None else numpy.flatnonzero(mask)
+        return LazyRows(indices=indices, get=self.archived_disc)
+
+    def stream_objects(self, mask: numpy.ndarray | None = None) -> LazyRows:
+        """
+        Lazy sequence of the stream objects selected by a boolean `mask`, all of them when it is `None`
+        """
+        indices = numpy.arange(len(self.stream_title)) if mask is None else numpy.flatnonzero(mask)
+        return LazyRows(indices=indices, get=self.stream_object)
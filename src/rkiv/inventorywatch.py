@@ -0,0 +1,324 @@
+"""
+Live inventory daemon. Watches the video archive and stream roots with inotify, keeps an in-memory `Inventory` up to
+date as directories are created, renamed or removed, and serves it to other rkiv commands over a Unix socket.
+"""
+from __future__ import annotations
+
+import json
+import socket
+import asyncio
+from pathlib import Path
+
+import click
+
+from rkiv import inotify
+from rkiv.config import Config
+from rkiv.inventory import ArchivedDisc, DirectoryListing, Inventory, StreamObject
+from rkiv.inventoryindex import InventoryIndex
+
+CONFIG = Config()
+
+WATCH_MASK = (
+    inotify.IN_CREATE
+    | inotify.IN_DELETE
+    | inotify.IN_MOVED_FROM
+    | inotify.IN_MOVED_TO
+    | inotify.IN_DELETE_SELF
+    | inotify.IN_MOVE_SELF
+    | inotify.IN_ONLYDIR
+)
+
+SKIPPED_DIRS = {"ArchiveShare", "lost+found"}
+
+
+def socket_path() -> Path:
+    """Location of the inventory daemon socket"""
+    return Config.data_directory().joinpath("inventory.sock")
+
+
+def _is_relative_to(path: Path, root: Path) -> bool:
+    return path == root or root in path.parents
+
+
+class LiveInventory:
+    """
+    In-memory inventory keyed on path that can re-walk a single subtree after it changes. Walks build new dicts and
+    swap them in so readers on another thread always see a complete state.
+    """
+
+    archive_roots: list[Path]
+    stream_roots: list[Path]
+    archived_discs: dict[Path, ArchivedDisc]
+    stream_objects: dict[Path, StreamObject]
+
+    def __init__(self, archive_roots: list[Path], stream_roots: list[Path], index: InventoryIndex) -> None:
+        self.archive_roots = archive_roots
+        self.stream_roots = stream_roots
+        self.archived_discs = {}
+        self.stream_objects = {}
+        self._index = index
+        self._visited: list[Path] = []
+        self._inventory: Inventory | None = None
+
+    def _lister(self, dir: Path) -> DirectoryListing:
+        self._visited.append(dir)
+        return self._index.list_dir(dir)
+
+    def take(self) -> list[Path]:
+        """
+        Walks every root and returns the directories that were visited
+        """
+
+        for scan in self._index.walk_disc_archives(root_paths=self.archive_roots):
+            self.archived_discs.update({d.path: d for d in scan.discs})
+
+        for root in self.stream_roots:
+            self.stream_objects.update({s.path: s for s in self._index.walk_stream_library(root_path=root)})
+
+        self._index.save()
+        self._inventory = None
+        return self._index.walked_directories()
+
+    @staticmethod
+    def _target(dir: Path, root: Path, entries: dict) -> Path | None:
+        """
+        The directory that has to be re-walked when `dir` changes: the entry that contains `dir` if there is one,
+        otherwise `dir` itself. Returns `None` for directories the walkers skip.
+        """
+
+        if any(p in SKIPPED_DIRS for p in dir.relative_to(root).parts):
+            return None
+
+        for parent in [dir, *dir.parents]:
+            if parent in entries:
+                return parent
+            if parent == root:
+                break
+
+        return dir
+
+    def refresh(self, dir: Path) -> list[Path]:
+        """
+        Re-walks the subtree affected by a change in `dir`, returns the directories that were visited
+        """
+
+        self._visited = []
+
+        for root in self.archive_roots:
+            if not _is_relative_to(dir, root):
+                continue
+            target = self._target(dir, root, self.archived_discs)
+            if target is None:
+                continue
+
+            discs = ArchivedDisc.scan_disc_archives(root_paths=[target], lister=self._lister)[0].discs
+            archived_discs = {k: v for k, v in self.archived_discs.items() if not _is_relative_to(k, target)}
+            archived_discs.update({d.path: d for d in discs})
+            self.archived_discs = archived_discs
+
+        for root in self.stream_roots:
+            if not _is_relative_to(dir, root):
+                continue
+            target = self._target(dir, root, self.stream_objects)
+            if target is None:
+                continue
+
+            walked = StreamObject.walk_stream_library(root_path=target, lister=self._lister)
+            stream_objects = {k: v for k, v in self.stream_objects.items() if not _is_relative_to(k, target)}
+            stream_objects.update({s.path: s for s in walked})
+            self.stream_objects = stream_objects
+
+        self._inventory = None
+        return self._visited
+
+    def inventory(self) -> Inventory:
+        """
+        The current state as an `Inventory`
+        """
+
+        if self._inventory is None:
+            self._inventory = Inventory.from_media(
+                stream_objects=sorted(self.stream_objects.values(), key=lambda s: str(s.path)),
+                archived_discs=sorted(self.archived_discs.values(), key=lambda d: str(d.path)),
+            )
+
+        return self._inventory
+
+
+class InventoryWatcher:
+    """
+    Runs the inotify watches and the Unix socket server on a single asyncio event loop
+    """
+
+    live: LiveInventory
+    settle_seconds: float
+
+    def __init__(self, live: LiveInventory, settle_seconds: float = 2.0) -> None:
+        self.live = live
+        self.settle_seconds = settle_seconds
+        self._inotify = inotify.Inotify()
+        self._watches: dict[int, Path] = {}
+        self._dirty: set[Path] = set()
+        self._changed = asyncio.Event()
+
+    def watch(self, dirs: list[Path]) -> None:
+        """Adds watches, directories that disappeared in the meantime are skipped"""
+        for dir in dirs:
+            try:
+                self._watches[self._inotify.add_watch(dir, WATCH_MASK)] = dir
+            except OSError:
+                pass
+
+    def _unwatch(self, dir: Path) -> None:
+        for wd, path in list(self._watches.items()):
+            if _is_relative_to(path, dir):
+                self._inotify.rm_watch(wd)
+                self._watches.pop(wd)
+
+    def _on_readable(self) -> None:
+        for event in self._inotify.read():
+            if event.mask & inotify.IN_Q_OVERFLOW:
+                self._dirty.update(self.live.archive_roots + self.live.stream_roots)
+                continue
+
+            dir = self._watches.get(event.wd)
+            if dir is None:
+                continue
+
+            if event.mask & inotify.IN_IGNORED:
+                self._watches.pop(event.wd)
+                continue
+
+            if event.mask & (inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF):
+                continue
+
+            if event.is_dir and event.mask & inotify.IN_MOVED_FROM:
+                self._unwatch(dir.joinpath(event.name))
+
+            self._dirty.add(dir)
+
+        self._changed.set()
+
+    async def _apply_changes(self) -> None:
+        event_loop = asyncio.get_event_loop()
+
+        while True:
+            await self._changed.wait()
+
+            # Let bursts of events (rips, releases) settle before walking
+            while self._changed.is_set():
+                self._changed.clear()
+                await asyncio.sleep(self.settle_seconds)
+
+            dirty = sorted(self._dirty, key=lambda p: len(p.parts))
+            self._dirty = set()
+            refreshed: list[Path] = []
+            for dir in dirty:
+                if any(_is_relative_to(dir, r) for r in refreshed):
+                    continue
+
+                visited = await event_loop.run_in_executor(None, self.live.refresh, dir)
+                self.watch(visited)
+                refreshed.append(dir)
+                click.echo(f"  refreshed {dir} ({len(visited)} directories)")
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        request = (await reader.readline()).decode().strip()
+        if request == "inventory":
+            writer.write(json.dumps(self.live.inventory().dict()).encode())
+        elif request == "ping":
+            writer.write(b"pong")
+
+        await writer.drain()
+        writer.close()
+
+    async def run(self, path: Path) -> None:
+        """
+        Serve the inventory on the socket at `path` until cancelled
+        """
+
+        path.unlink(missing_ok=True)
+        event_loop = asyncio.get_event_loop()
+        event_loop.add_reader(self._inotify.fileno(), self._on_readable)
+        server = await asyncio.start_unix_server(self._serve_client, path=str(path))
+        apply_changes = asyncio.create_task(self._apply_changes())
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            apply_changes.cancel()
+            event_loop.remove_reader(self._inotify.fileno())
+            self._inotify.close()
+            path.unlink(missing_ok=True)
+
+
+class InventoryClient:
+    """
+    Fetches the inventory from a running watch daemon
+    """
+
+    path: Path
+    timeout: float
+
+    def __init__(self, path: Path | None = None, timeout: float = 5.0) -> None:
+        self.path = socket_path() if path is None else path
+        self.timeout = timeout
+
+    def _request(self, request: str) -> bytes | None:
+        if not self.path.exists():
+            return None
+
+        chunks = []
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(str(self.path))
+                sock.sendall(f"{request}\n".encode())
+                while True:
+                    chunk = sock.recv(64 * 1024)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+        except OSError:
+            return None
+
+        return b"".join(chunks)
+
+    def fetch(self) -> Inventory | None:
+        """
+        The daemon's current inventory or `None` when no daemon is running
+        """
+
+        response = self._request("inventory")
+        if not response:
+            return None
+
+        return Inventory.from_dict(json.loads(response))
+
+
+def watch_inventory(settle_seconds: float = 2.0) -> None:
+    """
+    Walk the configured roots then keep the inventory live until interrupted
+    """
+
+    live = LiveInventory(
+        archive_roots=CONFIG.video_archives,
+        stream_roots=CONFIG.video_streams,
+        index=InventoryIndex(),
+    )
+
+    click.secho("Walking the Archive and Stream", bold=True)
+    walked = live.take()
+    click.echo(f"  {len(live.archived_discs)} archived discs, {len(live.stream_objects)} stream objects")
+
+    async def _run() -> None:
+        watcher = InventoryWatcher(live=live, settle_seconds=settle_seconds)
+        watcher.watch(walked)
+        click.secho(f"Watching {len(walked)} directories, serving on {socket_path()}", bold=True)
+        await watcher.run(socket_path())
+
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        click.echo("\nStopped watching the inventory")
@@ -0,0 +1,309 @@
+"""
+Header only reader for ISO disc images. Lists the root directory of an image from its ISO9660 or UDF volume
+descriptors through `mmap`, so only the few sectors that hold the descriptors and the root directory are read and
+nothing has to be mounted.
+"""
+from __future__ import annotations
+
+import mmap
+import struct
+from pathlib import Path
+
+SECTOR_SIZE = 2048
+
+# Volume descriptors start after the 32KiB system area
+VOLUME_DESCRIPTOR_SECTOR = 16
+
+# Anchor volume descriptor pointer, UDF 2.2.3
+UDF_ANCHOR_SECTOR = 256
+
+# Upper bound on volume descriptors looked at, real images have a handful
+MAX_DESCRIPTORS = 64
+
+UDF_NSR_IDS = {b"NSR02", b"NSR03"}
+
+TAG_PARTITION = 5
+TAG_LOGICAL_VOLUME = 6
+TAG_TERMINATING = 8
+TAG_FILE_SET = 256
+TAG_FILE_IDENTIFIER = 257
+TAG_FILE_ENTRY = 261
+TAG_EXTENDED_FILE_ENTRY = 266
+
+
+class ImageFormatError(Exception):
+    """Raised when an image has no volume descriptors this module can read"""
+
+
+class ISOImage:
+    """
+    Read only view of a disc image. Use as a context manager, the image is mapped on enter and unmapped on exit.
+    """
+
+    path: Path
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._map: mmap.mmap | None = None
+
+    def __enter__(self) -> ISOImage:
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self
+
+    def __exit__(self, *args) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _read(self, offset: int, length: int) -> bytes:
+        if self._map is None:
+            raise ValueError("image is not open")
+        if offset < 0 or offset + length > len(self._map):
+            raise ImageFormatError(f"read past the end of {self.path}")
+        return self._map[offset : offset + length]
+
+    def _sector(self, sector: int, count: int = 1) -> bytes:
+        return self._read(sector * SECTOR_SIZE, count * SECTOR_SIZE)
+
+    def _volume_descriptors(self) -> list[bytes]:
+        """Sectors of the volume descriptor set / UDF volume recognition sequence"""
+
+        descriptors = []
+        for sector in range(VOLUME_DESCRIPTOR_SECTOR, VOLUME_DESCRIPTOR_SECTOR + MAX_DESCRIPTORS):
+            try:
+                descriptor = self._sector(sector)
+            except ImageFormatError:
+                break
+            if descriptor[1:6] not in {b"CD001", b"BEA01", b"TEA01", *UDF_NSR_IDS}:
+                break
+            descriptors.append(descriptor)
+            if descriptor[1:6] == b"TEA01":
+                break
+
+        return descriptors
+
+    def root_dirs(self) -> list[str]:
+        """
+        Names of the directories in the root of the image. UDF is preferred when present since Blu-ray images often
+        only carry a placeholder ISO9660 tree.
+
+        Raises
+        ------
+        `ImageFormatError` if neither file system can be read
+        """
+
+        descriptors = self._volume_descriptors()
+        if any(d[1:6] in UDF_NSR_IDS for d in descriptors):
+            try:
+                return self._udf_root_dirs()
+            except (ImageFormatError, struct.error, KeyError, IndexError):
+                pass
+
+        for descriptor in descriptors:
+            # Primary volume descriptor
+            if descriptor[0] == 1 and descriptor[1:6] == b"CD001":
+                return self._iso9660_root_dirs(descriptor)
+
+        raise ImageFormatError(f"no readable volume descriptors in {self.path}")
+
+    def _iso9660_root_dirs(self, pvd: bytes) -> list[str]:
+        # Root directory record at offset 156 of the primary volume descriptor, ECMA-119 8.4.18
+        extent, size = struct.unpack_from("<I4xI", pvd, 156 + 2)
+        data = self._read(extent * SECTOR_SIZE, size)
+
+        dirs = []
+        offset = 0
+        while offset < len(data):
+            length = data[offset]
+            if length == 0:
+                # Records do not cross sectors, the rest of this one is padding
+                offset = (offset // SECTOR_SIZE + 1) * SECTOR_SIZE
+                continue
+
+            # A truncated image or directory extent can end a record early, records never cross a sector
+            sector_end = min(len(data), (offset // SECTOR_SIZE + 1) * SECTOR_SIZE)
+            if offset + 33 > sector_end or offset + 33 + data[offset + 32] > min(sector_end, offset + length):
+                raise ImageFormatError(f"directory record past the end of its sector in {self.path}")
+
+            flags = data[offset + 25]
+            name_length = data[offset + 32]
+            name = data[offset + 33 : offset + 33 + name_length]
+            offset += length
+
+            # Skip the "." and ".." records
+            if name in {b"\x00", b"\x01"} or not flags & 0x02:
+                continue
+            dirs.append(name.decode("ascii", errors="replace").split(";")[0])
+
+        return dirs
+
+    def _udf_root_dirs(self) -> list[str]:
+        anchor = self._sector(UDF_ANCHOR_SECTOR)
+        if _tag_id(anchor) != 2:
+            raise ImageFormatError(f"no UDF anchor in {self.path}")
+
+        vds_length, vds_location = struct.unpack_from("<II", anchor, 16)
+        partitions: dict[int, int] = {}
+        logical_volume = None
+        for sector in range(vds_location, vds_location + max(1, vds_length // SECTOR_SIZE)):
+            descriptor = self._sector(sector)
+            tag = _tag_id(descriptor)
+            if tag == TAG_PARTITION:
+                number = struct.unpack_from("<H", descriptor, 22)[0]
+                partitions[number] = struct.unpack_from("<I", descriptor, 188)[0]
+            elif tag == TAG_LOGICAL_VOLUME:
+                logical_volume = descriptor
+            elif tag == TAG_TERMINATING:
+                break
+
+        if logical_volume is None or len(partitions) == 0:
+            raise ImageFormatError(f"incomplete UDF volume descriptor sequence in {self.path}")
+
+        partition_maps = self._partition_maps(logical_volume, partitions)
+
+        # File set descriptor, logical volume contents use is a long_ad
+        _, fsd_block, fsd_partition = struct.unpack_from("<IIH", logical_volume, 248)
+        fsd = self._block(partition_maps, fsd_partition, fsd_block)
+        if _tag_id(fsd) != TAG_FILE_SET:
+            raise ImageFormatError(f"no UDF file set descriptor in {self.path}")
+
+        _, root_block, root_partition = struct.unpack_from("<IIH", fsd, 400)
+        root = self._file_data(partition_maps, root_partition, self._block(partition_maps, root_partition, root_block))
+
+        dirs = []
+        offset = 0
+        while offset + 38 <= len(root):
+            if _tag_id(root[offset:]) != TAG_FILE_IDENTIFIER:
+                break
+            characteristics = root[offset + 18]
+            name_length = root[offset + 19]
+            implementation_length = struct.unpack_from("<H", root, offset + 36)[0]
+            name_offset = offset + 38 + implementation_length
+            name = root[name_offset : name_offset + name_length]
+            offset += (38 + implementation_length + name_length + 3) & ~3
+
+            # Directory, not the parent entry
+            if characteristics & 0x02 and not characteristics & 0x08:
+                dirs.append(_dstring(name))
+
+        return dirs
+
+    def _partition_maps(self, logical_volume: bytes, partitions: dict[int, int]) -> list[tuple[int, list]]:
+        """
+        Resolves each partition reference number to the sector its blocks are counted from. UDF 2.50 metadata
+        partitions (Blu-ray) are resolved to the extents of their metadata file.
+        """
+
+        count = struct.unpack_from("<I", logical_volume, 268)[0]
+        maps: list[tuple[int, list]] = []
+        offset = 440
+        for _ in range(count):
+            if offset + 6 > len(logical_volume):
+                raise ImageFormatError(f"partition maps past the end of the logical volume descriptor in {self.path}")
+            map_type, map_length = logical_volume[offset], logical_volume[offset + 1]
+            if map_type == 1:
+                number = struct.unpack_from("<H", logical_volume, offset + 4)[0]
+                maps.append((partitions[number], []))
+            elif map_type == 2 and b"*UDF Metadata Partition" in logical_volume[offset + 5 : offset + 28]:
+                number, metadata_file = struct.unpack_from("<HI", logical_volume, offset + 38)
+                start = partitions[number]
+                entry = self._sector(start + metadata_file)
+                extents = [(start + location, length) for location, length in self._allocation(entry)]
+                maps.append((start, extents))
+            else:
+                # Virtual and sparable partitions are not used by pressed video discs
+                raise ImageFormatError(f"unsupported UDF partition map in {self.path}")
+            offset += max(map_length, 6)
+
+        return maps
+
+    def _block(self, partition_maps: list[tuple[int, list]], partition: int, block: int) -> bytes:
+        if not 0 <= partition < len(partition_maps):
+            raise ImageFormatError(f"no UDF partition {partition} in {self.path}")
+        start, extents = partition_maps[partition]
+        if len(extents) == 0:
+            return self._sector(start + block)
+
+        for location, length in extents:
+            blocks = (length + SECTOR_SIZE - 1) // SECTOR_SIZE
+            if block < blocks:
+                return self._sector(location + block)
+            block -= blocks
+
+        raise ImageFormatError(f"block outside of the metadata partition in {self.path}")
+
+    def _entry_layout(self, entry: bytes) -> tuple[int, int, int]:
+        """Allocation descriptor type, offset and total length of a (extended) file entry, ECMA-167 4/14.9"""
+
+        tag = _tag_id(entry)
+        if tag == TAG_FILE_ENTRY:
+            ea_length, ad_length = struct.unpack_from("<II", entry, 168)
+            ad_offset = 176 + ea_length
+        elif tag == TAG_EXTENDED_FILE_ENTRY:
+            ea_length, ad_length = struct.unpack_from("<II", entry, 208)
+            ad_offset = 216 + ea_length
+        else:
+            raise ImageFormatError(f"expected a file entry in {self.path}")
+
+        # Flags field of the ICB tag
+        ad_type = struct.unpack_from("<H", entry, 16 + 18)[0] & 0x07
+        return ad_type, ad_offset, ad_length
+
+    def _allocation(self, entry: bytes) -> list[tuple[int, int]]:
+        """(block, length) pairs of a file entry's short or long allocation descriptors"""
+
+        ad_type, ad_offset, ad_length = self._entry_layout(entry)
+        if ad_type not in {0, 1}:
+            raise ImageFormatError(f"unsupported allocation descriptors in {self.path}")
+
+        ad_size = 8 if ad_type == 0 else 16
+        allocation = []
+        for offset in range(ad_offset, ad_offset + ad_length, ad_size):
+            length, location = struct.unpack_from("<II", entry, offset)
+            if length & 0x3FFFFFFF == 0:
+                break
+            allocation.append((location, length & 0x3FFFFFFF))
+
+        return allocation
+
+    def _file_data(self, partition_maps: list[tuple[int, list]], partition: int, entry: bytes) -> bytes:
+        """Contents of a small file (a directory) described by `entry`"""
+
+        ad_type, ad_offset, ad_length = self._entry_layout(entry)
+        if ad_type == 3:
+            # Embedded in the entry itself
+            return entry[ad_offset : ad_offset + ad_length]
+
+        data = b""
+        for location, length in self._allocation(entry):
+            blocks = (length + SECTOR_SIZE - 1) // SECTOR_SIZE
+            data += b"".join(self._block(partition_maps, partition, location + i) for i in range(blocks))[:length]
+
+        return data
+
+
+def _tag_id(descriptor: bytes) -> int:
+    return struct.unpack_from("<H", descriptor, 0)[0]
+
+
+def _dstring(name: bytes) -> str:
+    """OSTA compressed unicode, UDF 2.1.1"""
+
+    if len(name) == 0:
+        return ""
+    if name[0] == 16:
+        return name[1:].decode("utf-16-be", errors="replace")
+    return name[1:].decode("latin-1")
+
+
+def iso_root_dirs(path: Path) -> list[str]:
+    """
+    Directory names in the root of the image at `path`, empty if it can not be read
+    """
+
+    try:
+        with ISOImage(path) as image:
+            return image.root_dirs()
+    except (OSError, ValueError, ImageFormatError, struct.error, KeyError, IndexError):
+        return []
@@ -3,24 +3,42 @@ from __future__ import annotations
 import requests
 import subprocess
 import os
+import shutil
 import tempfile
 from enum import Enum
-from typing import List, Callable
+from typing import List, Callable, Iterable, TextIO, TYPE_CHECKING
+from collections import deque
 from html.parser import HTMLParser
 from datetime import timedelta
 from pathlib import Path
 from csv import reader
 from asyncio.streams import StreamReader
 import asyncio
+import time
 
 from rkiv.arm import UserInput
 from rkiv.opticaldevices import OpticalDrive
-from rkiv.inventory import ArchivedDisc
+from rkiv.inventory import ArchivedDisc, ISO_EXTS
 from rkiv.config import Config
+from rkiv.scancache import ScanCache
+from rkiv.titlesignature import TitleSignature, find_title, group_titles, unique_titles
+
+if TYPE_CHECKING:
+    from rkiv.titleselect import TitleSelection
 
 
 CONFIG = Config()
 
+# MSG lines kept by a running MakeMKVRipper
+RIPPER_MESSAGES = 100
+
+# Titles remuxed at once from a decrypted backup
+REMUX_WORKERS = 4
+
+# makemkvcon numbers titles after dropping those shorter than --minlength, so the scan that selects title ids and
+# every rip of those ids have to run with the same value
+MIN_LENGTH_ARG = "--minlength=0"
+
 
 class MakeMKVBetaKeyParser(HTMLParser):
     key: str = ""
@@ -41,39 +59,414 @@ class MakeMKVBetaKeyParser(HTMLParser):
         return proc.returncode
 
 
-def extract_mkv(disc: ArchivedDisc, location: Path, title: int) -> None:
+def disc_source(path: Path) -> str:
+    """
+    makemkvcon source for an archived disc, ISO images are opened directly with `iso:`
+    """
+    if path.suffix.lower() in ISO_EXTS:
+        return f"iso:{path}"
+    return f"file:{path}"
+
+
+def extract_mkv(
+    disc: ArchivedDisc, location: Path, title: int, progress_callback: Callable[[float], None] | None = None
+) -> list[str]:
     """
-    Extracts mkv of the title to the location provided
+    Extracts mkv of the title to the location provided. makemkvcon output is written to the log and checked for
+    problems line by line as it arrives.
+
+    Parameters
+    ----------
+    disc : `ArchivedDisc`
+    location : `Path` the title is written to `location/<disc title>`
+    title : `int` makemkv title id
+    progress_callback : `Callable[[float], None]` called with the fraction done on every PRGV update
+
+    Returns
+    -------
+    `list[str]` issues found in the MakeMKV output by `classify_line` and problems with the output, empty when
+    the extraction was clean
     """
     _output = location.joinpath(disc.title)
     if _output.exists():
-        print(f"ERROR: Output path exists skipping title - {disc.title} - {title}")
-        return None
+        return [f"Output path exists skipping title - {disc.title} - {title}"]
     _output.mkdir(parents=True)
     log_file = CONFIG.workspace.parent.joinpath("logs").joinpath("extract_mkv").joinpath(disc.title).with_suffix(".log")
     log_file.parent.mkdir(parents=True, exist_ok=True)
 
-    _args = ["makemkvcon", "-r", "mkv", f"file:{disc.path}", str(title), str(_output)]
-    out = subprocess.run(args=_args, capture_output=True)
-    stdout = out.stdout.decode().splitlines()
-    stderr = out.stderr.decode().splitlines()
-
-    err = [i for i in stdout if "error" in i.lower() or "fail" in i.lower()]
-    err += [i for i in stderr if "error" in i.lower() or "fail" in i.lower()]
-    with open(log_file, "w") as f:
-        f.writelines(stdout + stderr)
-
-    if len(err) != 0:
-        print(f"ERROR: Problems detected in MakeMKV log - {disc.title} - {title}")
-        for e in err:
-            print(f"  {e}")
+    _args = ["makemkvcon", "-r", "--progress=-stderr", "mkv", disc_source(disc.path), str(title), str(_output)]
+    parser = RobotParser()
+    problems: list[str] = []
+    # stderr only carries the progress records, merging it keeps a single pipe to drain
+    with open(log_file, "w", buffering=1) as log, subprocess.Popen(
+        args=_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+    ) as proc:
+        assert proc.stdout is not None
+        for line in proc.stdout:
+            if line.startswith("PRG"):
+                if line.startswith("PRGV:") and progress_callback is not None:
+                    parser.feed(line)
+                    _, total, maximum = parser.progress
+                    if maximum > 0:
+                        progress_callback(total / maximum)
+                continue
+
+            log.write(line)
+            issue = classify_line(line)
+            if issue is not None:
+                problems.append(issue.line)
 
     contents = list(_output.iterdir())
     if len(contents) != 1:
-        print(f"ERROR: Output directory has {len(contents)} files - {disc.title} - {title}")
+        problems.append(f"Output directory has {len(contents)} files - {disc.title} - {title}")
+    if len(contents) == 0:
+        return problems
 
     file_name = _output.joinpath(disc.title).with_suffix(contents[0].suffix)
     contents[0].rename(file_name)
+    return problems
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+class RobotStream:
+    """
+    SINFO attributes of a single stream keyed on attribute id
+    """
+
+    __slots__ = (
+        "title_id",
+        "id",
+        "attributes",
+    )
+
+    title_id: int
+    id: int
+    attributes: dict[int, str]
+
+    def __init__(self, title_id: int, id: int) -> None:
+        self.title_id = title_id
+        self.id = id
+        self.attributes = {}
+
+    @property
+    def type(self) -> str:
+        """Video, Audio or Subtitles"""
+        return self.attributes.get(1, "")
+
+
+class RobotTitle:
+    """
+    TINFO attributes of a single title keyed on attribute id, along with its streams in output order
+    """
+
+    __slots__ = (
+        "id",
+        "attributes",
+        "streams",
+    )
+
+    id: int
+    attributes: dict[int, str]
+    streams: dict[int, RobotStream]
+
+    def __init__(self, id: int) -> None:
+        self.id = id
+        self.attributes = {}
+        self.streams = {}
+
+
+class RobotMessage:
+    """
+    A MSG line: message code, flags and the formatted message
+    """
+
+    __slots__ = (
+        "code",
+        "flags",
+        "message",
+    )
+
+    code: int
+    flags: int
+    message: str
+
+    def __init__(self, code: int, flags: int, message: str) -> None:
+        self.code = code
+        self.flags = flags
+        self.message = message
+
+    @classmethod
+    def from_line(cls, line: str) -> RobotMessage | None:
+        """The message of a MSG line, `None` for any other line"""
+
+        if line[:4] != "MSG:":
+            return None
+        try:
+            code, flags, _, rest = line[4:].rstrip("\r\n").split(",", 3)
+            message = next(reader([rest]))[0] if rest.startswith('"') else rest
+            return cls(code=int(code), flags=int(flags), message=message)
+        except (ValueError, StopIteration):
+            return None
+
+
+class MessageSeverity(str, Enum):
+    """How much a MakeMKV message matters, only errors are told apart from benign messages so far"""
+
+    ERROR = "error"
+
+
+# Severity of MakeMKV message codes that are known, None marks messages that look like problems but are not
+MESSAGE_CODES: dict[int, MessageSeverity | None] = {
+    2003: MessageSeverity.ERROR,  # Error '%1' occurred while reading '%2' at offset '%3'
+    2016: None,  # Failed to get full access to drive, only LibreDrive features are missing
+    5003: MessageSeverity.ERROR,  # Failed to save title %1 to file %2
+    5004: MessageSeverity.ERROR,  # %1 titles saved, %2 failed
+    5010: MessageSeverity.ERROR,  # Failed to open disc
+}
+
+# Text of benign messages for output that is not a MSG record, e.g. a plain text makemkvcon or dvdbackup log
+BENIGN_TEXT = ("Failed to get full access to drive",)
+
+
+class MakeMKVIssue:
+    """
+    A line of output that reports a problem
+
+    Attributes
+    ----------
+    severity  : `MessageSeverity`
+    line  : `str` the line as it was output
+    code  : `int | None` MSG code, `None` for lines that are not MSG records
+    message  : `str` formatted message of a MSG record, the line otherwise
+    """
+
+    __slots__ = (
+        "severity",
+        "line",
+        "code",
+        "message",
+    )
+
+    severity: MessageSeverity
+    line: str
+    code: int | None
+    message: str
+
+    def __init__(self, severity: MessageSeverity, line: str, code: int | None, message: str) -> None:
+        self.severity = severity
+        self.line = line
+        self.code = code
+        self.message = message
+
+    def __str__(self) -> str:
+        return self.line
+
+
+def classify_line(line: str, msg: RobotMessage | None = None) -> MakeMKVIssue | None:
+    """
+    Classify a single line of output. MSG records are looked up by code in `MESSAGE_CODES` and otherwise by their
+    message text, other lines fall back to looking for "error" and "fail" so plain text logs are covered too.
+
+    Parameters
+    ----------
+    line : `str`
+    msg : `RobotMessage` the line already parsed, saves parsing it again
+
+    Returns
+    -------
+    `MakeMKVIssue | None` `None` for lines that are fine
+    """
+
+    text = line.rstrip("\r\n")
+    _msg = RobotMessage.from_line(text) if msg is None else msg
+    if _msg is not None and _msg.code in MESSAGE_CODES:
+        severity = MESSAGE_CODES[_msg.code]
+        return None if severity is None else MakeMKVIssue(severity, text, _msg.code, _msg.message)
+
+    message = text if _msg is None else _msg.message
+    if any(benign in message for benign in BENIGN_TEXT):
+        return None
+
+    lower = message.lower()
+    if "error" in lower or "fail" in lower:
+        return MakeMKVIssue(MessageSeverity.ERROR, text, None if _msg is None else _msg.code, message)
+    return None
+
+
+def classify_output(lines: Iterable[str]) -> list[MakeMKVIssue]:
+    """Issues in complete output, `lines` can be any iterable including a file or a process' stdout"""
+    return [i for i in map(classify_line, lines) if i is not None]
+
+
+class RobotParser:
+    """
+    Incremental tokenizer for makemkvcon robot (`-r`) output. Lines are fed one at a time as they are read from the
+    process and every line is split once, straight into `RobotTitle` and `RobotStream` records. The numeric fields
+    are split off with a bounded `str.split` so commas inside the quoted value are kept.
+    """
+
+    __slots__ = (
+        "disc",
+        "title_count",
+        "titles",
+        "messages",
+        "progress",
+        "_stream_key",
+        "_stream",
+    )
+
+    disc: dict[int, str]
+    title_count: int
+    titles: dict[int, RobotTitle]
+    messages: list[RobotMessage]
+    progress: tuple[int, int, int]
+
+    def __init__(self) -> None:
+        self.disc = {}
+        self.title_count = 0
+        self.titles = {}
+        self.messages = []
+        self.progress = (0, 0, 0)
+        self._stream_key: tuple[str, str] | None = None
+        self._stream: RobotStream | None = None
+
+    def _title(self, id: int) -> RobotTitle:
+        title = self.titles.get(id)
+        if title is None:
+            title = self.titles[id] = RobotTitle(id=id)
+        return title
+
+    def feed(self, line: str) -> None:
+        """
+        Consume a single line of output, unknown and malformed lines are ignored
+        """
+
+        if line[-1:] == "\n":
+            line = line.rstrip("\r\n")
+
+        head = line[:6]
+        try:
+            if head == "SINFO:":
+                tid, sid, aid, _, value = line[6:].split(",", 4)
+                # Attributes of a stream arrive back to back, only look the stream up when it changes
+                stream = self._stream
+                if stream is None or self._stream_key != (tid, sid):
+                    title = self._title(int(tid))
+                    stream = title.streams.get(int(sid))
+                    if stream is None:
+                        stream = title.streams[int(sid)] = RobotStream(title_id=int(tid), id=int(sid))
+                    self._stream_key = (tid, sid)
+                    self._stream = stream
+                stream.attributes[int(aid)] = value[1:-1] if value[:1] == '"' else value
+
+            elif head == "TINFO:":
+                tid, aid, _, value = line[6:].split(",", 3)
+                self._title(int(tid)).attributes[int(aid)] = value[1:-1] if value[:1] == '"' else value
+
+            elif head == "CINFO:":
+                aid, _, value = line[6:].split(",", 2)
+                self.disc[int(aid)] = _unquote(value)
+
+            elif line[:5] == "PRGV:":
+                current, total, maximum = line[5:].split(",")
+                self.progress = (int(current), int(total), int(maximum))
+
+            elif line[:4] == "MSG:":
+                msg = RobotMessage.from_line(line)
+                if msg is not None:
+                    self.messages.append(msg)
+
+            elif line[:7] == "TCOUNT:":
+                self.title_count = int(line[7:])
+
+        except ValueError:
+            pass
+
+    @classmethod
+    def parse(cls, lines: Iterable[str]) -> RobotParser:
+        """
+        Parse complete output, `lines` can be any iterable including a process' stdout
+        """
+
+        parser = cls()
+        for line in lines:
+            parser.feed(line)
+        return parser
+
+    def dict(self) -> dict:
+        """dict"""
+        return {
+            "disc": self.disc,
+            "title_count": self.title_count,
+            "titles": [
+                {
+                    "id": t.id,
+                    "attributes": t.attributes,
+                    "streams": [{"id": s.id, "attributes": s.attributes} for s in t.streams.values()],
+                }
+                for t in self.titles.values()
+            ],
+            "messages": [{"code": m.code, "flags": m.flags, "message": m.message} for m in self.messages],
+        }
+
+    @classmethod
+    def from_dict(cls, obj: dict) -> RobotParser:
+        """from_dict, attribute ids that JSON turned into strings are restored"""
+
+        parser = cls()
+        parser.disc = {int(k): v for k, v in obj["disc"].items()}
+        parser.title_count = obj["title_count"]
+        for t in obj["titles"]:
+            title = parser._title(t["id"])
+            title.attributes = {int(k): v for k, v in t["attributes"].items()}
+            for s in t["streams"]:
+                stream = title.streams[s["id"]] = RobotStream(title_id=title.id, id=s["id"])
+                stream.attributes = {int(k): v for k, v in s["attributes"].items()}
+        parser.messages = [RobotMessage(**m) for m in obj["messages"]]
+        return parser
+
+
+def _robot_output(args: list[str], path: Path | None = None) -> RobotParser:
+    """
+    Runs makemkvcon in robot mode and parses stdout line by line as it is written. When the disc `path` is given
+    the scan is answered from the `ScanCache` if this disc was already scanned with the same arguments.
+    """
+
+    parser = RobotParser()
+    lines: list[str] = []
+
+    def _run() -> tuple[str, dict]:
+        with subprocess.Popen(args=args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True) as proc:
+            assert proc.stdout is not None
+            for line in proc.stdout:
+                parser.feed(line)
+                lines.append(line)
+
+        return "".join(lines), parser.dict()
+
+    if path is None:
+        _run()
+        return parser
+
+    # The disc source is left out of the key, the fingerprint already identifies the disc
+    _, parsed, hit = ScanCache().cached(tool=args[0], path=path, args=args[1:-1], run=_run)
+    return RobotParser.from_dict(parsed) if hit else parser
+
+
+def _parse_stream(sinfo: list[str]) -> RobotStream:
+    """The first stream in a list of SINFO lines with the SINFO: prefix stripped"""
+    title = next(iter(RobotParser.parse(f"SINFO:{i}" for i in sinfo).titles.values()))
+    return next(iter(title.streams.values()))
+
+
+def _duration(value: str) -> timedelta:
+    h, m, s = value.split(":")
+    return timedelta(hours=float(h), minutes=float(m), seconds=float(s))
 
 
 class AspectRatio(str, Enum):
@@ -93,6 +486,7 @@ class TitelInfoMMKV:
     streams: int
     aspect_ratio: AspectRatio
     length: timedelta
+    signature: TitleSignature
 
     def __init__(
         self,
@@ -103,6 +497,7 @@ class TitelInfoMMKV:
         streams: int,
         aspect_ratio: AspectRatio,
         length: timedelta,
+        signature: TitleSignature | None = None,
     ) -> None:
         self.id = id
         self.size_bytes = size_bytes
@@ -111,6 +506,9 @@ class TitelInfoMMKV:
         self.streams = streams
         self.aspect_ratio = aspect_ratio
         self.length = length
+        self.signature = (
+            TitleSignature(seconds=round(length.total_seconds()), chapters=chapters) if signature is None else signature
+        )
 
     def __eq__(self, other: object) -> bool:
         """__eq__"""
@@ -160,50 +558,32 @@ class TitelInfoMMKV:
         return None
 
     @classmethod
-    def from_mkvinfo(cls, info: list[str]) -> TitelInfoMMKV:
-        splits = [i.split(",") for i in info]
-        tinfo = {i[1]: i[3].replace('"', "") for i in splits if "TINFO" in i[0]}
-        sinfo = {f"{i[1]}{i[2]}": i[4].replace('"', "") for i in splits if "SINFO" in i[0]}
-
-        _id = int(info[0].split(":")[1].split(",")[0])
-        _size_bytes = int(tinfo["11"])
+    def from_record(cls, title: RobotTitle) -> TitelInfoMMKV:
+        """View of a parsed title"""
+        _size_bytes = int(title.attributes[11])
         _aspect = AspectRatio.FULL
-        if f"{0}20" in sinfo.keys():
-            _aspect = AspectRatio(sinfo[f"{0}20"])
-        h, m, s = tinfo["9"].split(":")
-        _length = timedelta(
-            hours=float(h),
-            minutes=float(m),
-            seconds=float(s),
-        )
-        _chapters = 0
-        if "8" in tinfo.keys():
-            _chapters = int(tinfo["8"])
+        stream = title.streams.get(0)
+        if stream is not None and 20 in stream.attributes:
+            _aspect = AspectRatio(stream.attributes[20])
 
         return cls(
-            id=_id,
+            id=title.id,
             size_bytes=_size_bytes,
             size_GB=_size_bytes / (1024**3),
-            chapters=_chapters,
-            streams=len({i.split(",")[1] for i in info if "SINFO" in i}),
+            chapters=int(title.attributes.get(8, 0)),
+            streams=len(title.streams),
             aspect_ratio=_aspect,
-            length=_length,
+            length=_duration(title.attributes[9]),
+            signature=TitleSignature.from_record(title),
         )
 
     @classmethod
-    def parse_info(cls, info: list[str]) -> list[TitelInfoMMKV]:
-        filtered_list = [i for i in info if "TINFO" in i or "SINFO" in i]
-        by_id: dict[str, list[str]] = {}
-
-        for i in filtered_list:
-            _id = i.split(":")[1].split(",")[0]
-
-            if not _id in by_id.keys():
-                by_id[_id] = []
-
-            by_id[_id].append(i)
+    def from_mkvinfo(cls, info: list[str]) -> TitelInfoMMKV:
+        return cls.from_record(next(iter(RobotParser.parse(info).titles.values())))
 
-        return [cls.from_mkvinfo(v) for _, v in by_id.items()]
+    @classmethod
+    def parse_info(cls, info: Iterable[str]) -> list[TitelInfoMMKV]:
+        return [cls.from_record(i) for i in RobotParser.parse(info).titles.values()]
 
 
 class MakeMKV:
@@ -232,16 +612,15 @@ class MakeMKV:
             "--noscan",
             # "--minlength=1",  # Keep at 120 until we do full rips
             "info",
-            f"file:{disc.path}",
+            disc_source(disc.path),
         ]
-        out = subprocess.run(args=_args, capture_output=True)
-
-        tInfo = out.stdout.decode().splitlines()
-
-        title_list = TitelInfoMMKV.parse_info(tInfo)
+        title_list = [TitelInfoMMKV.from_record(i) for i in _robot_output(_args, path=disc.path).titles.values()]
         t0 = title_list[0]
-        if len(title_list) > 20:
-            print(f"WARNING: {disc.title} has high title count: {len(title_list)}")
+        # Obfuscation playlists are copies of the real titles, only the first of each group is a candidate
+        groups = group_titles(title_list)
+        if len(groups) > 20:
+            print(f"WARNING: {disc.title} has high title count: {len(groups)} unique of {len(title_list)}")
+        title_list = [g.representative for g in groups]
 
         title_list = [i for i in title_list if i.chapters > 0]
         if len(title_list) == 0:
@@ -302,58 +681,29 @@ class VideoStreamInfo:
         self.frame_rate = frame_rate
         self.stream_name = stream_name
 
+    @classmethod
+    def from_record(cls, stream: RobotStream) -> VideoStreamInfo:
+        """View of a parsed video stream"""
+        attributes = stream.attributes
+        return cls(
+            id=stream.id,
+            title_id=stream.title_id,
+            codec=attributes.get(6, ""),
+            codec_friendly=attributes.get(7, ""),
+            resolution=attributes.get(19, ""),
+            aspect_ratio=attributes.get(20, ""),
+            bitrate=attributes.get(13, ""),
+            frame_rate=attributes.get(21, ""),
+            stream_name=attributes.get(30, ""),
+        )
+
     @classmethod
     def from_csv_list(cls, sinfo: list[str]) -> VideoStreamInfo:
         """
-        Returns a TitleInfo class by parsing a list of TINFO lines:
-        "id,code,value,strin_value" <- TINFO: has been stripped
+        Returns a VideoStreamInfo class by parsing a list of SINFO lines:
+        "title_id,id,code,value,strin_value" <- SINFO: has been stripped
         """
-        _id = int(sinfo[0].split(",")[1])
-        _title_id = int(sinfo[0].split(",")[0])
-        _codec = ""
-        _codec_friendly = ""
-        _resolution = ""
-        _aspect_ratio = ""
-        _bitrate = ""
-        _frame_rate = ""
-        _stream_name = ""
-
-        for line in reader(sinfo):
-            tid, sid, code, vcode, value = line
-            value = value.strip('"')
-
-            if code == "6":
-                _codec = value
-
-            if code == "7":
-                _codec_friendly = value
-
-            if code == "13":
-                _bitrate = value
-
-            if code == "19":
-                _resolution = value
-
-            if code == "20":
-                _aspect_ratio = value
-
-            if code == "21":
-                _frame_rate = value
-
-            if code == "30":
-                _stream_name = value
-
-        return cls(
-            id=_id,
-            title_id=_title_id,
-            codec=_codec,
-            codec_friendly=_codec_friendly,
-            resolution=_resolution,
-            aspect_ratio=_aspect_ratio,
-            bitrate=_bitrate,
-            frame_rate=_frame_rate,
-            stream_name=_stream_name,
-        )
+        return cls.from_record(_parse_stream(sinfo))
 
 
 class AudioStreamInfo:
@@ -398,74 +748,32 @@ class AudioStreamInfo:
         self.bit_depth = bit_depth
         self.stream_name = stream_name
 
+    @classmethod
+    def from_record(cls, stream: RobotStream) -> AudioStreamInfo:
+        """View of a parsed audio stream"""
+        attributes = stream.attributes
+        return cls(
+            id=stream.id,
+            title_id=stream.title_id,
+            channels_friendly=attributes.get(2, ""),
+            language_code=attributes.get(3, ""),
+            language_name=attributes.get(4, ""),
+            codec=attributes.get(6, ""),
+            codec_friendly=attributes.get(7, ""),
+            bitrate=attributes.get(13, ""),
+            channels=attributes.get(14, ""),
+            sample_rate=attributes.get(17, ""),
+            bit_depth=attributes.get(18, ""),
+            stream_name=attributes.get(30, ""),
+        )
+
     @classmethod
     def from_csv_list(cls, sinfo: list[str]) -> AudioStreamInfo:
         """
-        Returns a TitleInfo class by parsing a list of TINFO lines:
-        "id,code,value,strin_value" <- TINFO: has been stripped
+        Returns an AudioStreamInfo class by parsing a list of SINFO lines:
+        "title_id,id,code,value,strin_value" <- SINFO: has been stripped
         """
-
-        _id = int(sinfo[0].split(",")[1])
-        _title_id = int(sinfo[0].split(",")[0])
-        _channels_friendly = ""
-        _language_code = ""
-        _language_name = ""
-        _codec = ""
-        _codec_friendly = ""
-        _bitrate = ""
-        _channels = ""
-        _sample_rate = ""
-        _bit_depth = ""
-        _stream_name = ""
-
-        for line in reader(sinfo):
-            tid, sid, code, vcode, value = line
-            value = value.strip('"')
-
-            if code == "2":
-                _channels_friendly = value
-
-            if code == "3":
-                _language_code = value
-
-            if code == "4":
-                _language_name = value
-
-            if code == "6":
-                _codec = value
-
-            if code == "7":
-                _codec_friendly = value
-
-            if code == "13":
-                _bitrate = value
-
-            if code == "14":
-                _channels = value
-
-            if code == "17":
-                _sample_rate = value
-
-            if code == "18":
-                _bit_depth = value
-
-            if code == "30":
-                _stream_name = value
-
-        return cls(
-            id=_id,
-            title_id=_title_id,
-            channels_friendly=_channels_friendly,
-            language_code=_language_code,
-            language_name=_language_name,
-            codec=_codec,
-            codec_friendly=_codec_friendly,
-            bitrate=_bitrate,
-            channels=_channels,
-            sample_rate=_sample_rate,
-            bit_depth=_bit_depth,
-            stream_name=_stream_name,
-        )
+        return cls.from_record(_parse_stream(sinfo))
 
 
 class SubtitleStreamInfo:
@@ -495,49 +803,27 @@ class SubtitleStreamInfo:
         self.codec_friendly = codec_friendly
         self.stream_name = stream_name
 
+    @classmethod
+    def from_record(cls, stream: RobotStream) -> SubtitleStreamInfo:
+        """View of a parsed subtitle stream"""
+        attributes = stream.attributes
+        return cls(
+            id=stream.id,
+            title_id=stream.title_id,
+            language_code=attributes.get(3, ""),
+            language_name=attributes.get(4, ""),
+            codec=attributes.get(6, ""),
+            codec_friendly=attributes.get(7, ""),
+            stream_name=attributes.get(30, ""),
+        )
+
     @classmethod
     def from_csv_list(cls, sinfo: list[str]) -> SubtitleStreamInfo:
         """
-        Returns a TitleInfo class by parsing a list of TINFO lines:
-        "id,code,value,strin_value" <- TINFO: has been stripped
+        Returns a SubtitleStreamInfo class by parsing a list of SINFO lines:
+        "title_id,id,code,value,strin_value" <- SINFO: has been stripped
         """
-
-        _id = int(sinfo[0].split(",")[1])
-        _title_id = int(sinfo[0].split(",")[0])
-        _language_code = ""
-        _language_name = ""
-        _codec = ""
-        _codec_friendly = ""
-        _stream_name = ""
-
-        for line in reader(sinfo):
-            tid, sid, code, vcode, value = line
-            value = value.strip('"')
-
-            if code == "3":
-                _language_code = value
-
-            if code == "4":
-                _language_name = value
-
-            if code == "6":
-                _codec = value
-
-            if code == "7":
-                _codec_friendly = value
-
-            if code == "30":
-                _stream_name = value
-
-        return cls(
-            id=_id,
-            title_id=_title_id,
-            language_code=_language_code,
-            language_name=_language_name,
-            codec=_codec,
-            codec_friendly=_codec_friendly,
-            stream_name=_stream_name,
-        )
+        return cls.from_record(_parse_stream(sinfo))
 
 
 class MakeMKVTitleInfo:
@@ -550,6 +836,8 @@ class MakeMKVTitleInfo:
     export_name: str
     size_bits: int
     length: timedelta
+    segments_map: str
+    signature: TitleSignature
 
     def __init__(
         self,
@@ -562,6 +850,8 @@ class MakeMKVTitleInfo:
         export_name: str,
         size_bits: int,
         length: timedelta,
+        segments_map: str = "",
+        signature: TitleSignature | None = None,
     ) -> None:
         self.id = id
         self.video_streams = video_streams
@@ -572,6 +862,29 @@ class MakeMKVTitleInfo:
         self.export_name = export_name
         self.size_bits = size_bits
         self.length = length
+        self.segments_map = segments_map
+        self.signature = (
+            TitleSignature(seconds=round(length.total_seconds()), chapters=chapters) if signature is None else signature
+        )
+
+    @classmethod
+    def from_record(cls, title: RobotTitle) -> MakeMKVTitleInfo:
+        """View of a parsed title and its streams"""
+        streams = title.streams.values()
+        attributes = title.attributes
+        return cls(
+            id=title.id,
+            video_streams=tuple(VideoStreamInfo.from_record(i) for i in streams if i.type == "Video"),
+            audio_streams=tuple(AudioStreamInfo.from_record(i) for i in streams if i.type == "Audio"),
+            subtitle_streams=tuple(SubtitleStreamInfo.from_record(i) for i in streams if i.type == "Subtitles"),
+            chapters=int(attributes.get(8, 0)),
+            source_file=attributes.get(16, ""),
+            export_name=attributes.get(27, ""),
+            size_bits=int(attributes.get(11, 0)),
+            length=_duration(attributes[9]) if 9 in attributes else timedelta(seconds=0),
+            segments_map=attributes.get(26, ""),
+            signature=TitleSignature.from_record(title),
+        )
 
     @classmethod
     def from_csv_lists(cls, tinfo: list[str], sinfo: list[str]) -> MakeMKVTitleInfo:
@@ -579,71 +892,8 @@ class MakeMKVTitleInfo:
         Returns a TitleInfo class by parsing a list of TINFO and SINFO lines:
         "id,code,value,strin_value" <- TINFO: has been stripped
         """
-
-        _id = int(tinfo[0].split(",")[0])
-        streams: dict[str, list[list[str]]] = {"Video": [], "Audio": [], "Subtitles": []}
-        temp_sinfo: list[str] = []
-        stype = None
-
-        for line in reader(sinfo):
-            tid, sid, code, vcode, value = line
-            value = value.strip('"')
-
-            if code == "1" and stype is None:
-                stype = value
-
-            if code == "1" and len(temp_sinfo) > 0 and stype is not None:
-                streams[stype].append(temp_sinfo)
-                temp_sinfo = []
-                stype = value
-
-            temp_sinfo.append(",".join(line))
-
-        _video_streams = tuple(VideoStreamInfo.from_csv_list(i) for i in streams["Video"])
-        _audio_streams = tuple(AudioStreamInfo.from_csv_list(i) for i in streams["Audio"])
-        _subtitle_streams = tuple(SubtitleStreamInfo.from_csv_list(i) for i in streams["Subtitles"])
-
-        _chapters = 0
-        _source_file = ""
-        _export_name = ""
-        _size_bits = 0
-        _length = timedelta(seconds=0)
-
-        for csv in reader(tinfo):
-            id, code, _, value = csv
-            value = value.strip('"')
-
-            if code == "8":
-                _chapters = int(value)
-
-            if code == "16":
-                _source_file = value
-
-            if code == "27":
-                _export_name = value
-
-            if code == "11":
-                _size_bits = int(value)
-
-            if code == "9":
-                h, m, s = value.split(":")
-                _length = timedelta(
-                    hours=float(h),
-                    minutes=float(m),
-                    seconds=float(s),
-                )
-
-        return cls(
-            id=_id,
-            video_streams=_video_streams,
-            audio_streams=_audio_streams,
-            subtitle_streams=_subtitle_streams,
-            chapters=_chapters,
-            source_file=_source_file,
-            export_name=_export_name,
-            size_bits=_size_bits,
-            length=_length,
-        )
+        lines = [f"TINFO:{i}" for i in tinfo] + [f"SINFO:{i}" for i in sinfo]
+        return cls.from_record(next(iter(RobotParser.parse(lines).titles.values())))
 
 
 class MakeMKVInfo:
@@ -675,74 +925,43 @@ class MakeMKVInfo:
         self.gigabytes_titles = gigabytes_titles
 
     @classmethod
-    def from_info(cls, info: str) -> MakeMKVInfo:
-        """
-        Returns a TitleInfo class by parsing a list of TINFO lines:
-        "id,code,value,strin_value" <- TINFO: has been stripped
-        """
-        _titles = []
-        build_title = False
-
-        info_lines = info.splitlines()
-        tinfo: list[str] = []
-        sinfo: list[str] = []
-
-        _name = ""
-        _title_count = 0
-        _disc_type = ""
-
-        for line in info_lines:
-            key, _, csv = line.partition(":")
-            if key == "TCOUNT":
-                _title_count = int(csv)
-
-            if key == "CINFO":
-                id, code, value = csv.split(",")
-                if id == "1":
-                    _disc_type = value
-
-                if id == "2":
-                    _name = value.strip('"')
-
-            if key == "TINFO" and build_title:
-                _titles.append(MakeMKVTitleInfo.from_csv_lists(tinfo, sinfo))
-                tinfo = []
-                sinfo = []
-                build_title = False
-
-            if key == "TINFO":
-                tinfo.append(csv)
-
-            if key == "SINFO":
-                build_title = True
-                sinfo.append(csv)
-
-        _titles.append(MakeMKVTitleInfo.from_csv_lists(tinfo, sinfo))
+    def from_record(cls, parser: RobotParser) -> MakeMKVInfo:
+        """View of parsed robot output"""
+        _titles = [MakeMKVTitleInfo.from_record(i) for i in parser.titles.values()]
 
         return cls(
-            name=_name,
-            title_count=_title_count,
-            disc_type=_disc_type,
+            name=parser.disc.get(2, ""),
+            title_count=parser.title_count,
+            disc_type=parser.disc.get(1, ""),
             titles=tuple(_titles),
             length_titles=sum([i.length for i in _titles], timedelta()),
             gigabytes_titles=sum(i.size_bits for i in _titles) / (1024**3),
         )
 
+    @classmethod
+    def from_info(cls, info: str) -> MakeMKVInfo:
+        """
+        Returns a MakeMKVInfo class by parsing the robot output of makemkvcon info
+        """
+        return cls.from_record(RobotParser.parse(info.splitlines()))
+
     @classmethod
     def scan_disc(cls, disc: Path | ArchivedDisc | OpticalDrive) -> MakeMKVInfo:
-        _args = ["makemkvcon", "--noscan", "--minlength=0", "-r", "info"]
+        _args = ["makemkvcon", "--noscan", MIN_LENGTH_ARG, "-r", "info"]
 
+        path = None
         if isinstance(disc, Path):
-            _args.append(f"file:{disc}")
+            path = disc
+            _args.append(disc_source(disc))
 
         if isinstance(disc, ArchivedDisc):
-            _args.append(f"file:{disc.path}")
+            path = disc.path
+            _args.append(disc_source(disc.path))
 
         if isinstance(disc, OpticalDrive):
             _args.append(f"dev:{disc.device_path}")
 
-        proc = subprocess.run(args=_args, capture_output=True, text=True)
-        return cls.from_info(proc.stdout)
+        return cls.from_record(_robot_output(_args, path=path))
 
 
 class MakeMKVRipper:
@@ -754,6 +973,8 @@ class MakeMKVRipper:
     progress: float
     drive: OpticalDrive
     progress_callback: Callable[[OpticalDrive, float], None]
+    messages: deque[RobotMessage]
+    _parts: dict[str, float]
 
     def __init__(
         self, stage: str, progress: float, drive: OpticalDrive, progress_callback: Callable[[OpticalDrive, float], None]
@@ -762,25 +983,60 @@ class MakeMKVRipper:
         self.progress = progress
         self.drive = drive
         self.progress_callback = progress_callback
+        self.messages = deque(maxlen=RIPPER_MESSAGES)
+        self._parts = {}
 
-    async def update_progress(self, stderr: StreamReader) -> None:
+    async def update_progress(self, stderr: StreamReader, part: str = "all", weight: float = 1.0) -> None:
         """
-        Update the progress of the running process
+        Update the progress of the running process. When a rip is split over several makemkvcon runs each run is a
+        `part` worth `weight` of the whole, so runs can follow one another or overlap.
         """
 
+        parser = RobotParser()
         while True:
             buffer = await stderr.readline()
             if not buffer:
                 break
 
             line = buffer.rstrip(b"\n").decode()
-            code, _, csv = line.partition(":")
-            if code == "PRGV":
-                _, total, max = csv.split(",")
-                self.progress = float(total) / float(max)
-                self.progress_callback(self.drive, self.progress)
+            if line.startswith("PRGV:"):
+                parser.feed(line)
+                _, total, maximum = parser.progress
+                if maximum > 0:
+                    self._parts[part] = weight * total / maximum
+                    self.progress = sum(self._parts.values())
+                    self.progress_callback(self.drive, self.progress)
+
+    async def drain_output(self, stdout: StreamReader, log: TextIO) -> list[str]:
+        """
+        Write stdout to the log as it arrives and keep the latest MSG lines in `messages`
+
+        Returns
+        -------
+        `list[str]` lines classified as an issue by `classify_line`
+        """
+
+        problems: list[str] = []
+        while True:
+            buffer = await stdout.readline()
+            if not buffer:
+                break
+
+            line = buffer.decode()
+            log.write(line)
+            msg = RobotMessage.from_line(line)
+            if msg is not None:
+                self.messages.append(msg)
+            issue = classify_line(line, msg)
+            if issue is not None:
+                problems.append(issue.line)
+
+        return problems
+
+    @staticmethod
+    def rip_paths(input: UserInput) -> tuple[str, Path, Path]:
+        """Disc title, output directory and log of a rip"""
 
-    async def extract(self, input: UserInput, drive: OpticalDrive) -> str:
         title = input.name
         _output = CONFIG.video_rip_dir.joinpath("makemkv").joinpath(title)
 
@@ -796,28 +1052,171 @@ class MakeMKVRipper:
         if not _output.exists():
             _output.mkdir(parents=True)
 
-        device = f"dev:{drive.device_path}"
-        # _args = ("mkv", "-r", "--noscan", "--messages=msg.log", "--progress=-stderr", "dev:/dev/sr1", "all", "/home/ryan/Videos/makemkv/")
-        # _args = ("mkv", "-r", "--noscan", "--progress=-stderr", device, "all", str(_output))
-        _args = ("mkv", "-r", "--noscan", "--progress=-stderr", device, "all", str(_output))
+        log = CONFIG.workspace.parent.joinpath("logs").joinpath("makemkv").joinpath(title).joinpath(f"{disc_title}.log")
+        if not log.parent.exists():
+            log.parent.mkdir(parents=True)
+
+        return disc_title, _output, log
+
+    async def _run(self, args: tuple[str, ...], log: TextIO, part: str = "all", weight: float = 1.0) -> list[str]:
+        """Runs makemkvcon draining stdout to `log` and stderr for progress, returns the problems"""
+
         aproc = await asyncio.create_subprocess_exec(
-            "makemkvcon", *_args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            "makemkvcon", *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        assert aproc.stdout is not None and aproc.stderr is not None
+        problems, _ = await asyncio.gather(
+            self.drain_output(aproc.stdout, log), self.update_progress(aproc.stderr, part, weight)
         )
-        await asyncio.gather(self.update_progress(aproc.stderr))
+        _ = await aproc.wait()
+        return problems
+
+    async def extract(self, input: UserInput, drive: OpticalDrive, selection: TitleSelection | None = None) -> str:
+        """
+        Rip the titles of the disc in `drive`. stdout goes straight to the log while stderr is read for progress,
+        both are drained at the same time so a chatty rip never fills a pipe and stalls makemkvcon.
+
+        Parameters
+        ----------
+        input : `UserInput`
+        drive : `OpticalDrive`
+        selection : `TitleSelection` titles to rip one makemkvcon run at a time, every title when `None` or when
+            nothing was selected, so a failed scan or a disc of short titles is still ripped. The skipped titles and
+            an estimate of the rip time saved are written to the log.
+
+        Returns
+        -------
+        `str` the output lines that mention an error or a failure
+        """
 
-        out_code = await aproc.wait()
-        results = await aproc.stdout.read()
-        results = results.decode()
+        _, _output, log = self.rip_paths(input)
 
-        log = CONFIG.workspace.parent.joinpath("logs").joinpath("makemkv").joinpath(title).joinpath(f"{disc_title}.log")
-        if not log.parent.exists():
-            log.parent.mkdir(parents=True)
+        device = f"dev:{drive.device_path}"
+        # makemkvcon mkv takes a single title id or all, so a selection is ripped one title per run
+        runs: list[tuple[str, float]] = [("all", 1.0)]
+        if selection is not None and len(selection.selected) > 0:
+            total = max(selection.selected_bytes, 1)
+            runs = [(str(t.id), t.size_bits / total) for t in selection.selected]
+
+        problems: list[str] = []
+        self._parts = {}
+        with open(log, "a") as f:
+            if selection is not None:
+                f.writelines(f"{i}\n" for i in selection.log_lines())
+                if len(selection.selected) == 0:
+                    f.write("rkiv: no titles were selected, ripping every title\n")
+
+            start = time.perf_counter()
+            for title_id, weight in runs:
+                # _args = ("mkv", "-r", "--noscan", "--messages=msg.log", "--progress=-stderr", "dev:/dev/sr1", "all", "/home/ryan/Videos/makemkv/")
+                _args = ("mkv", "-r", "--noscan", MIN_LENGTH_ARG, "--progress=-stderr", device, title_id, str(_output))
+                problems += await self._run(_args, f, title_id, weight)
+
+            if selection is not None and len(selection.selected) > 0:
+                seconds = time.perf_counter() - start
+                f.write(
+                    f"rkiv: ripped {len(selection.selected)} titles in {seconds:.0f}s, skipped {len(selection.skipped)} "
+                    f"titles saving about {selection.seconds_saved(seconds):.0f}s\n"
+                )
+
+        _ = subprocess.run(["eject", str(drive.device_path)])
+        return "\n".join(problems)
+
+    async def backup(self, input: UserInput, drive: OpticalDrive) -> tuple[Path, str]:
+        """
+        First phase of a two phase rip: decrypt the whole disc in `drive` to the workspace at full drive speed and
+        eject it. Titles are remuxed from the backup afterwards with `remux`, the drive is free in the meantime.
 
+        Returns
+        -------
+        `tuple[Path, str]` backup directory and the output lines that mention an error or a failure
+        """
+
+        disc_title, _, log = self.rip_paths(input)
+        backup = CONFIG.workspace.joinpath("backup").joinpath(disc_title)
+        backup.mkdir(parents=True, exist_ok=True)
+
+        device = f"dev:{drive.device_path}"
+        _args = ("backup", "--decrypt", "-r", "--noscan", "--progress=-stderr", device, str(backup))
+        self._parts = {}
         with open(log, "a") as f:
-            f.write(results)
+            problems = await self._run(_args, f)
 
         _ = subprocess.run(["eject", str(drive.device_path)])
-        return results
+        return backup, "\n".join(problems)
+
+    async def remux(
+        self, input: UserInput, backup: Path, selection: TitleSelection | None = None, workers: int = REMUX_WORKERS
+    ) -> str:
+        """
+        Second phase of a two phase rip: remux titles from a `backup` with up to `workers` makemkvcon runs at once.
+        Titles of the selection are found in the backup by their `TitleSignature` since a backup is not guaranteed
+        to number its titles the same as the disc, a title missing from the backup is reported instead of remuxed.
+        Without a selection every unique title of the backup is remuxed. Each title is logged to its own file next to
+        the rip log and the backup is only removed when every title was found, remuxed cleanly and written to the
+        output directory.
+
+        Returns
+        -------
+        `str` the output lines that mention an error or a failure
+        """
+
+        _, _output, log = self.rip_paths(input)
+        event_loop = asyncio.get_event_loop()
+        info = await event_loop.run_in_executor(None, MakeMKVInfo.scan_disc, backup)
+
+        titles = unique_titles(info.titles)
+        problems = []
+        if selection is not None:
+            titles = []
+            for selected in selection.selected:
+                title = find_title(selected.signature, info.titles)
+                if title is None:
+                    problems.append(f"rkiv: remux failed, title {selected.id} was not found in the backup {backup}")
+                else:
+                    titles.append(title)
+        if len(titles) == 0:
+            problems.append(f"rkiv: remux failed, no titles to remux from the backup {backup}")
+
+        total = sum(t.size_bits for t in titles)
+        limit = asyncio.Semaphore(workers)
+        self._parts = {}
+
+        async def _remux(title: MakeMKVTitleInfo) -> list[str]:
+            weight = title.size_bits / total if total > 0 else 1 / len(titles)
+            async with limit:
+                _args = (
+                    "mkv",
+                    "-r",
+                    "--noscan",
+                    MIN_LENGTH_ARG,
+                    "--progress=-stderr",
+                    disc_source(backup),
+                    str(title.id),
+                    str(_output),
+                )
+                with open(log.with_suffix(f".t{title.id:02d}.log"), "a") as f:
+                    return await self._run(_args, f, str(title.id), weight)
+
+        def _outputs() -> dict[Path, tuple[int, int]]:
+            return {p: (p.stat().st_size, p.stat().st_mtime_ns) for p in _output.glob("*.mkv")}
+
+        before = _outputs()
+        start = time.perf_counter()
+        results = await asyncio.gather(*(_remux(t) for t in titles))
+        problems += [p for r in results for p in r]
+
+        # makemkvcon can exit without an error line and without writing a title, the backup is the only copy left
+        written = [p for p, (size, mtime) in _outputs().items() if size > 0 and before.get(p) != (size, mtime)]
+        if len(written) < len(titles):
+            problems.append(f"rkiv: remux failed, {len(written)} of {len(titles)} titles were written to {_output}")
+
+        with open(log, "a") as f:
+            f.write(f"rkiv: remuxed {len(titles)} titles from {backup} in {time.perf_counter() - start:.0f}s\n")
+        if len(problems) == 0:
+            shutil.rmtree(backup, ignore_errors=True)
+
+        return "\n".join(problems)
 
     # def rippper(input: UserInput, drive: OpticalDrive) -> None:
 
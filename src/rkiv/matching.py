@@ -0,0 +1,155 @@
+"""
+Title matching between the archive and the stream. Titles are compared on a normalized key so naming differences
+(underscores, a leading "The", zero padded seasons) don't show up as unreleased media, and a trigram inverted index
+finds the closest stream title for anything that still doesn't match without comparing every pair. A trailing
+parenthesized year is kept apart from the key and only compared when both titles carry one, so a remake doesn't
+match the original while an undated title still matches either.
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+
+from thefuzz import fuzz
+
+# Candidates scored with thefuzz for each lookup
+MAX_CANDIDATES = 16
+
+# Trigrams shared by more than this fraction of titles ("the", " s1") say nothing about a match and are skipped
+STOP_GRAM_FRACTION = 0.05
+
+_SEPARATORS = re.compile(r"[_.\-]+")
+_YEAR = re.compile(r"\(((?:19|20)\d{2})\)\s*$")
+_SEASON = re.compile(r"\bs0*(\d+)\b")
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_title(title: str) -> str:
+    """
+    Matching key for a title: lowercase, no accents, separators as spaces, no leading "the", no trailing
+    parenthesized year and seasons without zero padding. "The_Thing_(1982)" and "Thing" share the key "thing",
+    "Cheers_S01" and "Cheers_S1" share "cheers s1". Years inside a title are part of it, "Blade_Runner_2049" keys
+    as "blade runner 2049". See `title_year` for the year that was left out.
+    """
+
+    key = unicodedata.normalize("NFKD", title)
+    key = "".join(c for c in key if not unicodedata.combining(c)).lower()
+    key = _SEPARATORS.sub(" ", key)
+    key = _YEAR.sub(" ", key)
+    key = _PUNCTUATION.sub(" ", key)
+    key = _SEASON.sub(lambda m: f"s{m.group(1)}", key)
+    key = _WHITESPACE.sub(" ", key).strip()
+    if key.startswith("the "):
+        key = key[4:]
+
+    # A title that is only a year or only "The" keeps its full key
+    return key if key else _WHITESPACE.sub(" ", title.lower()).strip()
+
+
+def title_year(title: str) -> int | None:
+    """The trailing parenthesized year of a title, "Halloween_(2018)" is 2018, `None` without one"""
+    match = _YEAR.search(_SEPARATORS.sub(" ", title))
+    return None if match is None else int(match.group(1))
+
+
+def years_match(year: int | None, other: int | None) -> bool:
+    """True unless both titles are dated and the years differ"""
+    return year is None or other is None or year == other
+
+
+def trigrams(key: str) -> set[str]:
+    """Character trigrams of a padded key"""
+    padded = f"  {key} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(slots=True)
+class NearMiss:
+    """
+    Closest stream title to a title that did not match
+
+    Attributes
+    ----------
+    title  : `str` title that was looked up
+    match_name  : `str` closest stream match name
+    score  : `int` 0 - 100 similarity of the normalized keys
+    """
+
+    title: str
+    match_name: str
+    score: int
+
+
+class TitleMatcher:
+    """
+    Index of stream match names. `matches` is an exact lookup on the normalized key, `near_miss` generates
+    candidates from a trigram inverted index and only scores those.
+    """
+
+    __slots__ = (
+        "match_names",
+        "_keys",
+        "_names",
+        "_by_key",
+        "_years",
+        "_postings",
+        "_stop_grams",
+    )
+
+    match_names: list[str]
+
+    def __init__(self, match_names: list[str]) -> None:
+        self.match_names = match_names
+        self._keys: list[str] = []
+        self._names: list[str] = []
+        self._by_key: dict[str, int] = {}
+        self._years: dict[str, set[int | None]] = {}
+        self._postings: dict[str, list[int]] = {}
+
+        for name in match_names:
+            key = normalize_title(name)
+            self._years.setdefault(key, set()).add(title_year(name))
+            if key in self._by_key:
+                continue
+            self._by_key[key] = len(self._keys)
+            for gram in trigrams(key):
+                self._postings.setdefault(gram, []).append(len(self._keys))
+            self._keys.append(key)
+            self._names.append(name)
+
+        limit = max(50, int(len(self._keys) * STOP_GRAM_FRACTION))
+        self._stop_grams = {g for g, p in self._postings.items() if len(p) > limit}
+
+    def matches(self, title: str) -> bool:
+        """True if `title` has the same normalized key as a stream title and their years don't differ"""
+        year = title_year(title)
+        return any(years_match(year, y) for y in self._years.get(normalize_title(title), ()))
+
+    def candidates(self, key: str, limit: int = MAX_CANDIDATES) -> list[int]:
+        """Indexes of the keys sharing the most trigrams with `key`"""
+
+        counts: Counter = Counter()
+        for gram in trigrams(key) - self._stop_grams:
+            counts.update(self._postings.get(gram, ()))
+
+        return [i for i, _ in counts.most_common(limit)]
+
+    def near_miss(self, title: str) -> NearMiss | None:
+        """
+        Best scoring stream title for `title`, `None` when no title shares a trigram with it
+        """
+
+        key = normalize_title(title)
+        best = None
+        for i in self.candidates(key):
+            score = fuzz.ratio(key, self._keys[i])
+            if best is None or score > best[1]:
+                best = (i, score)
+
+        if best is None:
+            return None
+
+        return NearMiss(title=title, match_name=self._names[best[0]], score=best[1])
@@ -0,0 +1,390 @@
+"""
+Stand-ins for makemkvcon, HandBrakeCLI and eject that replay recorded output. With the shims written by
+`write_shims` first on PATH the ripping, extraction and scanning code runs end to end without discs or drives:
+output is replayed with its recorded timing, makemkvcon reports PRGV progress and writes its output files, and
+errors can be injected by MSG code.
+
+Recordings are JSON files named `<tool>.<command>.json`, made with `record` from a real run. makemkvcon commands
+without a recording replay a synthesized three title disc, HandBrakeCLI commands need a recording.
+
+    python -m rkiv.replay <tool> <args>...
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+import subprocess
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Iterator
+
+import rkiv
+from rkiv.opticaldevices import OpticalDrive
+
+REPLAY_TOOLS = ("makemkvcon", "HandBrakeCLI", "eject")
+MAKEMKV_COMMANDS = ("info", "mkv", "backup")
+
+ENV_RECORDINGS = "RKIV_REPLAY_RECORDINGS"
+ENV_SPEED = "RKIV_REPLAY_SPEED"
+ENV_ERRORS = "RKIV_REPLAY_ERRORS"
+ENV_BYTES = "RKIV_REPLAY_BYTES"
+
+# Duration and output size of commands replayed without a recording
+DEFAULT_SECONDS = 5.0
+DEFAULT_BYTES = 1024**2
+
+# PRGV updates per replayed command when the recording has none of its own
+PROGRESS_TICKS = 20
+PRGV_MAX = 65536
+
+
+@dataclass(slots=True)
+class Recording:
+    """
+    Captured output of a single tool run
+
+    Attributes
+    ----------
+    tool  : `str`
+    command  : `str` see `command_of`
+    stdout  : `list[tuple[float, str]]` seconds since the start and the line
+    stderr  : `list[tuple[float, str]]`
+    seconds  : `float` run time
+    returncode  : `int`
+    """
+
+    tool: str
+    command: str
+    stdout: list[tuple[float, str]] = field(default_factory=list)
+    stderr: list[tuple[float, str]] = field(default_factory=list)
+    seconds: float = DEFAULT_SECONDS
+    returncode: int = 0
+
+    def to_json(self) -> dict:
+        return {
+            "tool": self.tool,
+            "command": self.command,
+            "stdout": self.stdout,
+            "stderr": self.stderr,
+            "seconds": self.seconds,
+            "returncode": self.returncode,
+        }
+
+    @classmethod
+    def from_json(cls, json: dict) -> Recording:
+        return cls(
+            tool=json["tool"],
+            command=json["command"],
+            stdout=[(t, line) for t, line in json["stdout"]],
+            stderr=[(t, line) for t, line in json["stderr"]],
+            seconds=json["seconds"],
+            returncode=json["returncode"],
+        )
+
+    @staticmethod
+    def path(directory: Path, tool: str, command: str) -> Path:
+        return directory.joinpath(f"{tool}.{command}.json")
+
+    def save(self, directory: Path) -> Path:
+        directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(directory, self.tool, self.command)
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f)
+        return path
+
+    @classmethod
+    def load(cls, directory: Path, tool: str, command: str) -> Recording | None:
+        path = cls.path(directory, tool, command)
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return cls.from_json(json.load(f))
+
+
+def command_of(tool: str, args: list[str]) -> str:
+    """The part of a tool invocation that selects its recording"""
+
+    if tool == "makemkvcon":
+        return next((a for a in args if a in MAKEMKV_COMMANDS), "unknown")
+    if tool == "HandBrakeCLI":
+        return "scan" if "--scan" in args else "encode"
+    return tool
+
+
+def record(args: list[str], directory: Path) -> Recording:
+    """
+    Run a real tool and save its output with the time each line arrived
+
+    Parameters
+    ----------
+    args : `list[str]` the command line, `args[0]` is the tool
+    directory : `Path` recordings directory
+    """
+
+    tool = Path(args[0]).name
+    recording = Recording(tool=tool, command=command_of(tool, args[1:]))
+    start = time.perf_counter()
+
+    def _read(stream: IO[str], lines: list[tuple[float, str]]) -> None:
+        for line in stream:
+            lines.append((time.perf_counter() - start, line.rstrip("\n")))
+
+    with subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as proc:
+        assert proc.stdout is not None and proc.stderr is not None
+        stderr = threading.Thread(target=_read, args=(proc.stderr, recording.stderr))
+        stderr.start()
+        _read(proc.stdout, recording.stdout)
+        stderr.join()
+
+    recording.seconds = time.perf_counter() - start
+    recording.returncode = proc.returncode
+    recording.save(directory)
+    return recording
+
+
+def _makemkv_info(seconds: float) -> Recording:
+    """A disc with a main feature, a duplicate playlist and a short extra"""
+
+    lines = [
+        'MSG:1005,0,1,"MakeMKV v1.17.4 linux(x64-release) started","%1 started","MakeMKV v1.17.4 linux(x64-release)"',
+        'CINFO:1,6209,"Blu-ray disc"',
+        'CINFO:2,0,"Replay"',
+        "TCOUNT:3",
+    ]
+    titles = [("2:01:00", 24, "1,2,3"), ("2:01:00", 24, "1,2,3"), ("0:01:30", 1, "9")]
+    for t, (length, chapters, segments) in enumerate(titles):
+        lines += [
+            f'TINFO:{t},8,0,"{chapters}"',
+            f'TINFO:{t},9,0,"{length}"',
+            f'TINFO:{t},11,0,"{DEFAULT_BYTES}"',
+            f'TINFO:{t},16,0,"0000{t}.mpls"',
+            f'TINFO:{t},26,0,"{segments}"',
+            f'TINFO:{t},27,0,"Replay_t{t:02d}.mkv"',
+            f'SINFO:{t},0,1,6201,"Video"',
+            f'SINFO:{t},0,6,0,"V_MPEG4/ISO/AVC"',
+            f'SINFO:{t},0,19,0,"1920x1080"',
+            f'SINFO:{t},0,20,0,"16:9"',
+            f'SINFO:{t},1,1,6202,"Audio"',
+            f'SINFO:{t},1,3,0,"eng"',
+        ]
+
+    step = seconds / len(lines)
+    return Recording(
+        tool="makemkvcon", command="info", stdout=[(i * step, line) for i, line in enumerate(lines)], seconds=seconds
+    )
+
+
+def _default_recording(tool: str, command: str) -> Recording | None:
+    if tool == "makemkvcon" and command == "info":
+        return _makemkv_info(DEFAULT_SECONDS / 5)
+    if tool == "makemkvcon" and command in ("mkv", "backup"):
+        return Recording(
+            tool=tool,
+            command=command,
+            stdout=[(0.0, 'MSG:1005,0,1,"MakeMKV v1.17.4 linux(x64-release) started","%1 started","MakeMKV"')],
+            seconds=DEFAULT_SECONDS,
+        )
+    if tool == "eject":
+        return Recording(tool=tool, command=command, seconds=0.0)
+    return None
+
+
+def _write_outputs(tool: str, command: str, args: list[str], size: int) -> list[tuple[IO[bytes], int]]:
+    """Files the command writes, opened for writing along with the number of bytes that go into each"""
+
+    paths: list[Path] = []
+    if tool == "makemkvcon" and command == "mkv" and len(args) >= 2:
+        title = "00" if args[-2] == "all" else args[-2].zfill(2)
+        paths = [Path(args[-1]).joinpath(f"title_t{title}.mkv")]
+    elif tool == "makemkvcon" and command == "backup" and len(args) >= 1:
+        bdmv = Path(args[-1]).joinpath("BDMV")
+        paths = [bdmv.joinpath("index.bdmv"), bdmv.joinpath("MovieObject.bdmv"), bdmv.joinpath("STREAM/00000.m2ts")]
+    elif tool == "HandBrakeCLI" and command == "encode":
+        for flag in ("-o", "--output"):
+            if flag in args[:-1]:
+                paths = [Path(args[args.index(flag) + 1])]
+
+    outputs = []
+    for path in paths:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        outputs.append((open(path, "wb"), size if path.suffix in (".mkv", ".m2ts") else 64))
+    return outputs
+
+
+def replay(
+    tool: str, args: list[str], directory: Path | None, speed: float = 1.0, errors: list[int] | None = None
+) -> int:
+    """
+    Replay a recorded run of `tool` for the command line `args`
+
+    Parameters
+    ----------
+    tool : `str`
+    args : `list[str]` arguments the stand-in was called with
+    directory : `Path` recordings directory, only synthesized output is replayed when `None`
+    speed : `float` replay this many times faster than recorded
+    errors : `list[int]` MSG codes of errors injected half way through, the run then exits with 1
+
+    Returns
+    -------
+    `int` exit code
+    """
+
+    command = command_of(tool, args)
+    recording = None if directory is None else Recording.load(directory, tool, command)
+    recording = _default_recording(tool, command) if recording is None else recording
+    if recording is None:
+        print(f"rkiv replay: no recording of {tool} {command}", file=sys.stderr)
+        return 2
+
+    progress = next((a.split("=", 1)[1] for a in args if a.startswith("--progress=")), None)
+    events: list[tuple[float, IO[str], str]] = [(t, sys.stdout, line) for t, line in recording.stdout]
+    events += [(t, sys.stderr, line) for t, line in recording.stderr]
+    if progress is not None and not any(line.startswith("PRGV:") for _, _, line in events):
+        stream = sys.stderr if progress == "-stderr" else sys.stdout
+        for i in range(PROGRESS_TICKS + 1):
+            value = PRGV_MAX * i // PROGRESS_TICKS
+            events.append((recording.seconds * i / PROGRESS_TICKS, stream, f"PRGV:{value},{value},{PRGV_MAX}"))
+
+    _errors = [] if errors is None else errors
+    for code in _errors:
+        line = f'MSG:{code},0,1,"Injected error {code}","Injected error %1","{code}"'
+        events.append((recording.seconds / 2, sys.stdout, line))
+    events.sort(key=lambda e: e[0])
+
+    outputs = _write_outputs(tool, command, args, int(os.environ.get(ENV_BYTES, DEFAULT_BYTES)))
+    chunks = max(len(events), 1)
+    start = time.perf_counter()
+    for i, (t, stream, line) in enumerate(events):
+        delay = t / speed - (time.perf_counter() - start)
+        if delay > 0:
+            time.sleep(delay)
+        stream.write(line + "\n")
+        stream.flush()
+        # Output files grow as the run goes
+        for f, size in outputs:
+            f.write(bytes(size * (i + 1) // chunks - size * i // chunks))
+
+    for f, size in outputs:
+        f.write(bytes(size - f.tell()))
+        f.close()
+
+    remaining = recording.seconds / speed - (time.perf_counter() - start)
+    if remaining > 0:
+        time.sleep(remaining)
+    return 1 if len(_errors) > 0 else recording.returncode
+
+
+def write_shims(
+    directory: Path, recordings: Path | None = None, speed: float = 1.0, errors: list[int] | None = None
+) -> list[Path]:
+    """
+    Write stand-in executables for `REPLAY_TOOLS` to `directory`, put it first on PATH to use them
+
+    Returns
+    -------
+    `list[Path]` the shims
+    """
+
+    directory.mkdir(parents=True, exist_ok=True)
+    env = {
+        ENV_SPEED: str(speed),
+        ENV_ERRORS: "" if errors is None else ",".join(str(i) for i in errors),
+        "PYTHONPATH": f"{Path(rkiv.__file__).parent.parent}{os.pathsep}${{PYTHONPATH}}",
+    }
+    if recordings is not None:
+        env[ENV_RECORDINGS] = str(recordings.absolute())
+
+    exports = "".join(f'export {k}="{v}"\n' for k, v in env.items())
+    shims = []
+    for tool in REPLAY_TOOLS:
+        shim = directory.joinpath(tool)
+        shim.write_text(f'#!/bin/sh\n{exports}exec "{sys.executable}" -m rkiv.replay {tool} "$@"\n')
+        shim.chmod(0o755)
+        shims.append(shim)
+    return shims
+
+
+def simulated_drives(count: int, root: Path) -> list[OpticalDrive]:
+    """Drives for the stand-ins, the device paths are only passed through to makemkvcon and eject"""
+    return [
+        OpticalDrive(
+            device_name=f"sr{i}",
+            device_path=root.joinpath("dev", f"sr{i}"),
+            mount_path=root.joinpath("media", f"sr{i}"),
+        )
+        for i in range(count)
+    ]
+
+
+@contextmanager
+def replay_sandbox(root: Path) -> Iterator[Path]:
+    """
+    Stand-ins in `root/bin` first on PATH and rips, logs and the workspace under `root` for the duration of the
+    block, so a timing run leaves neither its PATH nor its synthetic rips behind
+
+    Returns
+    -------
+    `Path` the directory of the stand-ins, see `write_shims`
+    """
+
+    from rkiv import makemkv
+
+    bin_dir = root.joinpath("bin")
+    path = os.environ.get("PATH")
+    video_rip_dir, workspace = makemkv.CONFIG.video_rip_dir, makemkv.CONFIG.workspace
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{path or ''}"
+    makemkv.CONFIG.video_rip_dir = root.joinpath("rips")
+    makemkv.CONFIG.workspace = root.joinpath("workspace")
+    try:
+        yield bin_dir
+    finally:
+        makemkv.CONFIG.video_rip_dir, makemkv.CONFIG.workspace = video_rip_dir, workspace
+        if path is None:
+            os.environ.pop("PATH", None)
+        else:
+            os.environ["PATH"] = path
+
+
+async def replay_rips(drives: list[OpticalDrive]) -> dict[str, float]:
+    """
+    Rip a disc in every drive at once with `MakeMKVRipper`, the stand-ins have to be on PATH
+
+    Returns
+    -------
+    `dict[str, float]` seconds each drive was busy keyed on device name
+    """
+
+    from rkiv.arm import UserInput
+    from rkiv.makemkv import MakeMKVInfo, MakeMKVRipper
+    from rkiv.titleselect import select_titles
+
+    event_loop = asyncio.get_event_loop()
+
+    async def _rip(drive: OpticalDrive) -> tuple[str, float]:
+        start = time.perf_counter()
+        info = await event_loop.run_in_executor(None, MakeMKVInfo.scan_disc, drive)
+        ripper = MakeMKVRipper(stage="", progress=0.0, drive=drive, progress_callback=lambda *_: None)
+        user_input = UserInput(name=f"Replay_{drive.device_name}", season=None, disc=1)
+        _ = await ripper.extract(input=user_input, drive=drive, selection=select_titles(info))
+        return drive.device_name, time.perf_counter() - start
+
+    return dict(await asyncio.gather(*(_rip(d) for d in drives)))
+
+
+if __name__ == "__main__":
+    _recordings = os.environ.get(ENV_RECORDINGS)
+    sys.exit(
+        replay(
+            tool=sys.argv[1],
+            args=sys.argv[2:],
+            directory=None if _recordings is None else Path(_recordings),
+            speed=float(os.environ.get(ENV_SPEED, "1.0")),
+            errors=[int(i) for i in os.environ.get(ENV_ERRORS, "").split(",") if i != ""],
+        )
+    )
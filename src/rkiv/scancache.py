@@ -0,0 +1,276 @@
+"""
+Persistent cache of makemkvcon and HandBrakeCLI disc scans. Scans are keyed on the disc fingerprint
+(`rkiv.fingerprint`), the tool and its arguments, and are only reused while the tool binary is unchanged. Both the
+raw output and the parsed result are stored, along with hit and miss counts per tool.
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from rkiv.config import Config
+from rkiv.fingerprint import disc_fingerprint
+
+# Bumped whenever SCHEMA or the fingerprints scans are keyed on change, stored scans are dropped
+# 1: Blu-rays are fingerprinted on the AACS unit key
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    fingerprint TEXT NOT NULL,
+    tool TEXT NOT NULL,
+    args TEXT NOT NULL,
+    tool_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    raw TEXT NOT NULL,
+    parsed TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (fingerprint, tool, args)
+);
+CREATE TABLE IF NOT EXISTS stats (
+    tool TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL,
+    misses INTEGER NOT NULL,
+    seconds_saved REAL NOT NULL
+);
+"""
+
+
+def tool_identity(tool: str) -> str | None:
+    """
+    Path, mtime and size of the `tool` binary on PATH. Changes whenever the tool is upgraded without having to run
+    it for its version.
+    """
+
+    binary = shutil.which(tool)
+    if binary is None:
+        return None
+
+    stat = os.stat(binary)
+    return f"{os.path.realpath(binary)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+@dataclass(slots=True)
+class CachedScan:
+    """
+    A stored scan
+
+    Attributes
+    ----------
+    raw  : `str` output of the tool
+    parsed  : `Any` JSON compatible parsed result
+    seconds  : `float` time the scan took when it was run
+    """
+
+    raw: str
+    parsed: Any
+    seconds: float
+
+
+@dataclass(slots=True)
+class ScanStats:
+    """
+    Cache use for a single tool
+
+    Attributes
+    ----------
+    tool  : `str`
+    entries  : `int` scans stored
+    hits  : `int`
+    misses  : `int`
+    seconds_saved  : `float` scan time that was answered from the cache
+    """
+
+    tool: str
+    entries: int
+    hits: int
+    misses: int
+    seconds_saved: float
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return 0.0 if lookups == 0 else self.hits / lookups
+
+
+class ScanCache:
+    """
+    SQLite backed scan cache, by default in the rkiv data directory
+    """
+
+    path: Path
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = self.default_path() if path is None else path
+
+    @staticmethod
+    def default_path() -> Path:
+        """Location of the cache in the rkiv data directory"""
+        return Config.data_directory().joinpath("scancache.db")
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(self.path, timeout=30)
+        if con.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            con.execute("DROP TABLE IF EXISTS scans")
+            con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        con.executescript(SCHEMA)
+        return con
+
+    def _count(self, con: sqlite3.Connection, tool: str, hit: bool, seconds: float = 0.0) -> None:
+        con.execute("INSERT OR IGNORE INTO stats VALUES (?, 0, 0, 0)", (tool,))
+        if hit:
+            con.execute(
+                "UPDATE stats SET hits = hits + 1, seconds_saved = seconds_saved + ? WHERE tool = ?", (seconds, tool)
+            )
+        else:
+            con.execute("UPDATE stats SET misses = misses + 1 WHERE tool = ?", (tool,))
+
+    def get(self, tool: str, fingerprint: str, args: list[str]) -> CachedScan | None:
+        """
+        The stored scan or `None` when there is none for the installed version of `tool`. Counts a hit or a miss.
+        """
+
+        con = self._connect()
+        try:
+            with con:
+                row = con.execute(
+                    "SELECT tool_id, raw, parsed, seconds FROM scans WHERE fingerprint = ? AND tool = ? AND args = ?",
+                    (fingerprint, tool, json.dumps(args)),
+                ).fetchone()
+
+                scan = None
+                if row is not None and row[0] == (tool_identity(tool) or ""):
+                    scan = CachedScan(raw=row[1], parsed=json.loads(row[2]), seconds=row[3])
+
+                self._count(con, tool, hit=scan is not None, seconds=0.0 if scan is None else scan.seconds)
+        finally:
+            con.close()
+
+        return scan
+
+    def put(self, tool: str, fingerprint: str, args: list[str], path: Path, scan: CachedScan) -> None:
+        """
+        Stores a scan of the disc at `path`, replacing any older one. A scan of another disc at the same path, or of
+        the same disc under a fingerprint that has since changed, is removed.
+        """
+
+        con = self._connect()
+        try:
+            with con:
+                con.execute(
+                    "DELETE FROM scans WHERE path = ? AND tool = ? AND args = ? AND fingerprint != ?",
+                    (str(path), tool, json.dumps(args), fingerprint),
+                )
+                con.execute(
+                    "INSERT OR REPLACE INTO scans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        fingerprint,
+                        tool,
+                        json.dumps(args),
+                        tool_identity(tool) or "",
+                        str(path),
+                        scan.raw,
+                        json.dumps(scan.parsed),
+                        scan.seconds,
+                        time.time(),
+                    ),
+                )
+        finally:
+            con.close()
+
+    def cached(
+        self, tool: str, path: Path, args: list[str], run: Callable[[], tuple[str, Any]]
+    ) -> tuple[str, Any, bool]:
+        """
+        Answers a scan of the disc at `path` from the cache, or calls `run` and stores what it returns. Discs
+        that can not be fingerprinted are always scanned.
+
+        Parameters
+        ----------
+        tool : `str` binary name
+        path : `Path` disc directory or ISO image
+        args : `list[str]` tool arguments without the disc source
+        run : `Callable[[], tuple[str, Any]]` runs the scan and returns the raw output and parsed result
+
+        Returns
+        -------
+        `tuple[str, Any, bool]` raw output, parsed result and whether it came from the cache
+        """
+
+        fingerprint = disc_fingerprint(path)
+        if fingerprint is not None:
+            scan = self.get(tool=tool, fingerprint=fingerprint, args=args)
+            if scan is not None:
+                return scan.raw, scan.parsed, True
+
+        start = time.perf_counter()
+        raw, parsed = run()
+        if fingerprint is not None:
+            scan = CachedScan(raw=raw, parsed=parsed, seconds=time.perf_counter() - start)
+            self.put(tool=tool, fingerprint=fingerprint, args=args, path=path, scan=scan)
+
+        return raw, parsed, False
+
+    def invalidate(self, tool: str | None = None, path: Path | None = None) -> int:
+        """
+        Removes stored scans, all of them or only those of `tool` and/or for discs under `path`. Returns the number
+        of scans removed.
+        """
+
+        query = "DELETE FROM scans WHERE 1 = 1"
+        params: list[Any] = []
+        if tool is not None:
+            query += " AND tool = ?"
+            params.append(tool)
+        if path is not None:
+            prefix = os.path.join(str(path), "")
+            query += " AND (path = ? OR substr(path, 1, ?) = ?)"
+            params += [str(path), len(prefix), prefix]
+
+        con = self._connect()
+        try:
+            with con:
+                removed = con.execute(query, params).rowcount
+        finally:
+            con.close()
+
+        return removed
+
+    def stats(self) -> list[ScanStats]:
+        """Entries, hits and misses per tool"""
+
+        con = self._connect()
+        try:
+            entries = dict(con.execute("SELECT tool, count(*) FROM scans GROUP BY tool").fetchall())
+            counts = {t: (h, m, s) for t, h, m, s in con.execute("SELECT * FROM stats")}
+        finally:
+            con.close()
+
+        return [
+            ScanStats(
+                tool=tool,
+                entries=entries.get(tool, 0),
+                hits=counts.get(tool, (0, 0, 0.0))[0],
+                misses=counts.get(tool, (0, 0, 0.0))[1],
+                seconds_saved=counts.get(tool, (0, 0, 0.0))[2],
+            )
+            for tool in sorted(set(entries) | set(counts))
+        ]
+
+    def reset_stats(self) -> None:
+        """Zeroes the hit and miss counts"""
+
+        con = self._connect()
+        try:
+            with con:
+                con.execute("DELETE FROM stats")
+        finally:
+            con.close()
@@ -0,0 +1,176 @@
+"""
+Choose which titles of a scanned disc are worth ripping. Discs carry dozens of short extras and the same feature
+under several playlists; ripping only the main feature, episodes and anything not explained by another title saves
+most of the rip time.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from rkiv.makemkv import MakeMKVInfo, MakeMKVTitleInfo
+from rkiv.titlesignature import TitleSignature
+
+
+@dataclass(slots=True)
+class TitleRules:
+    """
+    Rules applied by `select_titles`
+
+    Attributes
+    ----------
+    min_length  : `timedelta` shorter titles are skipped
+    main_feature  : `bool` rip the longest title
+    episodes  : `bool` rip clusters of titles of about the same length
+    extras  : `bool` rip titles that are neither the main feature nor an episode
+    dedupe  : `bool` skip titles with the same `TitleSignature` as an earlier title
+    min_episodes  : `int` titles needed to make an episode cluster
+    tolerance  : `float` relative length difference allowed within an episode cluster or a play all title
+    """
+
+    min_length: timedelta = timedelta(minutes=2)
+    main_feature: bool = True
+    episodes: bool = True
+    extras: bool = False
+    dedupe: bool = True
+    min_episodes: int = 3
+    tolerance: float = 0.1
+
+
+@dataclass(slots=True)
+class TitleSelection:
+    """
+    Titles chosen for ripping and why the rest were left out
+
+    Attributes
+    ----------
+    selected  : `list[MakeMKVTitleInfo]`
+    skipped  : `list[MakeMKVTitleInfo]`
+    reasons  : `dict[int, str]` title id to the reason it was selected or skipped
+    """
+
+    selected: list[MakeMKVTitleInfo] = field(default_factory=list)
+    skipped: list[MakeMKVTitleInfo] = field(default_factory=list)
+    reasons: dict[int, str] = field(default_factory=dict)
+
+    @property
+    def ids(self) -> list[int]:
+        return [t.id for t in self.selected]
+
+    @property
+    def selected_bytes(self) -> int:
+        return sum(t.size_bits for t in self.selected)
+
+    @property
+    def skipped_bytes(self) -> int:
+        return sum(t.size_bits for t in self.skipped)
+
+    def seconds_saved(self, rip_seconds: float) -> float:
+        """Rip time the skipped titles would have taken at the throughput of a rip of the selected titles"""
+        if self.selected_bytes == 0:
+            return 0.0
+        return rip_seconds * self.skipped_bytes / self.selected_bytes
+
+    def log_lines(self) -> list[str]:
+        """One line per title for the rip log"""
+        return [
+            f"rkiv: {'SELECT' if t in self.selected else 'SKIP'} title {t.id} {t.length} {t.size_bits} bytes - "
+            f"{self.reasons[t.id]}"
+            for t in sorted(self.selected + self.skipped, key=lambda t: t.id)
+        ]
+
+
+def _close(a: timedelta, b: timedelta, tolerance: float) -> bool:
+    return abs(a - b) <= max(a, b) * tolerance
+
+
+def _episode_clusters(titles: list[MakeMKVTitleInfo], rules: TitleRules) -> list[list[MakeMKVTitleInfo]]:
+    """Runs of titles, in length order, whose lengths are within `tolerance` of the shortest in the run"""
+
+    clusters: list[list[MakeMKVTitleInfo]] = []
+    for title in sorted(titles, key=lambda t: t.length):
+        if len(clusters) > 0 and _close(clusters[-1][0].length, title.length, rules.tolerance):
+            clusters[-1].append(title)
+        else:
+            clusters.append([title])
+
+    return [c for c in clusters if len(c) >= rules.min_episodes]
+
+
+def select_titles(info: MakeMKVInfo, rules: TitleRules | None = None) -> TitleSelection:
+    """
+    Apply `rules` to the titles of a scan. Titles are dropped when too short and when they duplicate an earlier
+    title, then the main feature and any episode clusters are selected. A long title that runs as long as an
+    episode cluster together is taken for a play all title and skipped.
+
+    Parameters
+    ----------
+    info : `MakeMKVInfo` scan of the disc
+    rules : `TitleRules` defaults to `TitleRules()`
+
+    Returns
+    -------
+    `TitleSelection`
+    """
+
+    _rules = TitleRules() if rules is None else rules
+    selection = TitleSelection()
+
+    def _skip(title: MakeMKVTitleInfo, reason: str) -> None:
+        selection.skipped.append(title)
+        selection.reasons[title.id] = reason
+
+    def _select(title: MakeMKVTitleInfo, reason: str) -> None:
+        selection.selected.append(title)
+        selection.reasons[title.id] = reason
+
+    candidates: list[MakeMKVTitleInfo] = []
+    seen: dict[TitleSignature, int] = {}
+    for title in info.titles:
+        if title.length < _rules.min_length:
+            _skip(title, f"shorter than {_rules.min_length}")
+            continue
+
+        if _rules.dedupe and title.signature in seen:
+            _skip(title, f"duplicate of title {seen[title.signature]}")
+            continue
+
+        seen[title.signature] = title.id
+        candidates.append(title)
+
+    if not (_rules.main_feature or _rules.episodes):
+        for title in candidates:
+            _select(title, "longer than the minimum length")
+        return selection
+
+    episodes = _episode_clusters(candidates, _rules) if _rules.episodes else []
+    for cluster in episodes:
+        for title in cluster:
+            _select(title, f"episode, one of {len(cluster)} titles of about {cluster[0].length}")
+
+    remaining = sorted(
+        (t for t in candidates if t.id not in selection.reasons), key=lambda t: (t.length, t.size_bits), reverse=True
+    )
+    for title in list(remaining):
+        cluster = next(
+            (c for c in episodes if _close(sum((t.length for t in c), timedelta()), title.length, _rules.tolerance)),
+            None,
+        )
+        if cluster is not None:
+            remaining.remove(title)
+            _skip(title, f"play all of episodes {', '.join(str(t.id) for t in cluster)}")
+
+    # On a disc of episodes the main feature has to outrun them, otherwise it is just the longest extra
+    longest_episode = max((t.length for c in episodes for t in c), default=timedelta())
+    if _rules.main_feature and len(remaining) > 0 and remaining[0].length > longest_episode:
+        main = remaining.pop(0)
+        _select(main, "main feature")
+
+    for title in remaining:
+        if _rules.extras:
+            _select(title, "extra")
+        else:
+            _skip(title, "extra")
+
+    selection.selected.sort(key=lambda t: t.id)
+    return selection
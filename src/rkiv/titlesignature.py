@@ -0,0 +1,134 @@
+"""
+Content signatures of the titles of a MakeMKV scan. Blu-rays carry dozens of obfuscation playlists that play the
+same segments in a shuffled order with identical duration, chapters and streams, and DVDs repeat titles through
+several program chains. Titles that share a signature play the same content, `group_titles` collects them so rips,
+extractions and the main title pick only ever see one title of each group.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Generic, Iterable, Protocol, TypeVar
+
+if TYPE_CHECKING:
+    from rkiv.makemkv import RobotTitle
+
+
+def parse_segments(segments_map: str) -> tuple[int, ...]:
+    """Segment ids of a TINFO 26 segments map such as `1-3,7`, in play order. Malformed entries are skipped."""
+
+    segments: list[int] = []
+    for part in segments_map.split(","):
+        first, _, last = part.strip().partition("-")
+        try:
+            if last == "":
+                segments.append(int(first))
+            else:
+                segments += range(int(first), int(last) + 1)
+        except ValueError:
+            continue
+
+    return tuple(segments)
+
+
+def _seconds(length: str) -> int:
+    try:
+        h, m, s = length.split(":")
+        return round(int(h) * 3600 + int(m) * 60 + float(s))
+    except ValueError:
+        return 0
+
+
+@dataclass(slots=True, frozen=True)
+class TitleSignature:
+    """
+    What a title plays, independent of its title id, playlist name and segment order
+
+    Attributes
+    ----------
+    seconds  : `int` duration rounded to the second
+    chapters  : `int`
+    segments  : `tuple[int, ...]` sorted segment ids, empty when the scan has no segments map
+    streams  : `tuple[tuple[str, str, str], ...]` type, codec and language of every stream in output order
+    """
+
+    seconds: int
+    chapters: int
+    segments: tuple[int, ...] = ()
+    streams: tuple[tuple[str, str, str], ...] = ()
+
+    @classmethod
+    def from_record(cls, title: RobotTitle) -> TitleSignature:
+        """Signature of a parsed title"""
+        return cls(
+            seconds=_seconds(title.attributes.get(9, "")),
+            chapters=int(title.attributes.get(8, 0)),
+            segments=tuple(sorted(parse_segments(title.attributes.get(26, "")))),
+            streams=tuple(
+                (s.type, s.attributes.get(6, ""), s.attributes.get(3, "")) for _, s in sorted(title.streams.items())
+            ),
+        )
+
+    def matches(self, other: TitleSignature) -> bool:
+        """
+        True if both play the same content. Segments and streams are only compared when both sides have them, so a
+        scan of a backup, which may leave out the segments map, still matches a scan of the disc.
+        """
+        if (self.seconds, self.chapters) != (other.seconds, other.chapters):
+            return False
+        if len(self.segments) > 0 and len(other.segments) > 0 and self.segments != other.segments:
+            return False
+        return len(self.streams) == 0 or len(other.streams) == 0 or self.streams == other.streams
+
+
+class SignedTitle(Protocol):
+    id: int
+    signature: TitleSignature
+
+
+T = TypeVar("T", bound=SignedTitle)
+
+
+@dataclass(slots=True)
+class TitleGroup(Generic[T]):
+    """
+    Titles sharing a signature
+
+    Attributes
+    ----------
+    signature  : `TitleSignature`
+    titles  : `list` in scan order, the first title represents the group
+    """
+
+    signature: TitleSignature
+    titles: list[T] = field(default_factory=list)
+
+    @property
+    def representative(self) -> T:
+        return self.titles[0]
+
+    @property
+    def duplicates(self) -> list[T]:
+        return self.titles[1:]
+
+
+def group_titles(titles: Iterable[T]) -> list[TitleGroup[T]]:
+    """
+    Groups titles by signature, in order of the first title of each group. MakeMKV lists titles in playlist order
+    so the representative is the lowest numbered playlist with that content.
+    """
+
+    groups: dict[TitleSignature, TitleGroup[T]] = {}
+    for title in titles:
+        groups.setdefault(title.signature, TitleGroup(signature=title.signature)).titles.append(title)
+
+    return list(groups.values())
+
+
+def unique_titles(titles: Iterable[T]) -> list[T]:
+    """The representative of every group of `titles`"""
+    return [g.representative for g in group_titles(titles)]
+
+
+def find_title(signature: TitleSignature, titles: Iterable[T]) -> T | None:
+    """First of `titles` that plays the same content as `signature`, see `TitleSignature.matches`"""
+    return next((t for t in titles if signature.matches(t.signature)), None)
@@ -12,6 +12,7 @@ from enum import Enum
 
 from rkiv.opticaldevices import OpticalDrive
 from rkiv.config import Config
+from rkiv.makemkv import classify_line
 from rkiv import __version__
 
 CONFIG = Config()
@@ -70,6 +71,7 @@ class RipperMessage:
     log_path: Path
     disc_name: str
     mount_path: Path
+    problems: list[str]
 
     def __init__(
         self,
@@ -78,12 +80,14 @@ class RipperMessage:
         log_path: Path,
         disc_name: str,
         mount_path: Path,
+        problems: list[str] | None = None,
     ) -> None:
         self.status = status
         self.temp_output = temp_output
         self.log_path = log_path
         self.disc_name = disc_name
         self.mount_path = mount_path
+        self.problems = [] if problems is None else problems
 
     @classmethod
     def waiting_message(cls) -> "RipperMessage":
@@ -193,7 +197,12 @@ class VideoRipper:
         )
         self._store_user_input(user_input=_user_input)
 
-    def _archive_disc(self, user_input: UserInput) -> None:
+    def _archive_disc(self, user_input: UserInput) -> list[str]:
+        """
+        Back up the disc, the output is written to the log and classified line by line as it arrives. Returns the
+        lines classified as issues.
+        """
+
         temp_dvd_output_holder = Path(user_input.output_path).joinpath(f"TEMP_{user_input.disc_name}")
         final_output_path = Path(user_input.output_path).joinpath(user_input.disc_name)
 
@@ -223,8 +232,16 @@ class VideoRipper:
         if not Path(user_input.log_path).parent.exists():
             Path(user_input.log_path).parent.mkdir(parents=True)
 
-        with open(user_input.log_path, "a+") as log:
-            _ = subprocess.run(cmd, stdout=log, stderr=log)
+        problems: list[str] = []
+        with open(user_input.log_path, "a+") as log, subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        ) as proc:
+            assert proc.stdout is not None
+            for line in proc.stdout:
+                log.write(line)
+                issue = classify_line(line)
+                if issue is not None:
+                    problems.append(issue.line)
 
         # Rename the disc
         if not self._is_blu_ray():
@@ -234,6 +251,7 @@ class VideoRipper:
             temp_dvd_output_holder.rmdir()
 
         _ = subprocess.run(["eject", str(self.drive.device_path)])
+        return problems
 
     def run(self, pipe: connection.Connection):
         pipe.send(RipperMessage.waiting_message())
@@ -251,7 +269,7 @@ class VideoRipper:
                         mount_path=Path(mount_location),
                     )
                 )
-                self._archive_disc(user_input=user_input)
+                problems = self._archive_disc(user_input=user_input)
                 pipe.send(
                     RipperMessage(
                         status=RipperStatus.FINISHED,
@@ -259,6 +277,7 @@ class VideoRipper:
                         log_path=Path(user_input.log_path),
                         disc_name=user_input.disc_name,
                         mount_path=Path(mount_location),
+                        problems=problems,
                     )
                 )
                 pipe.send(RipperMessage.waiting_message())
@@ -314,40 +333,13 @@ class AutoVideoRipper:
             self._child_processes.append(Process(target=video_ripper.run, args=[child]))
             self._ripping_state[drive.device_name] = RipperMessage.waiting_message()
 
-    def parse_log_file(self, drive_name: str, log_path: Path, disc_name: str) -> None:
-        # Grep for error
-        out = subprocess.run(
-            f"cat {log_path} | grep -i error",
-            shell=True,
-            capture_output=True,
-            text=True,
-        )
-        errors = out.stdout.rstrip().split("\n")
-        if errors[0] != "":
-            self.notifications.append(
-                Notification(
-                    drive_name=drive_name,
-                    disc_name=disc_name,
-                    problems=errors,
-                )
-            )
+    def notify_problems(self, drive_name: str, disc_name: str, problems: list[str]) -> None:
+        """
+        Add a notification for the issues a ripper found in its output
+        """
 
-        # Grep for fail, exclude makemkv's drive read fails
-        out = subprocess.run(
-            f'cat {log_path} | grep -i fail | grep -v "Failed to get full access to drive"',
-            shell=True,
-            capture_output=True,
-            text=True,
-        )
-        failures = out.stdout.rstrip().split("\n")
-        if failures[0] != "":
-            self.notifications.append(
-                Notification(
-                    drive_name=drive_name,
-                    disc_name=disc_name,
-                    problems=failures,
-                )
-            )
+        if len(problems) > 0:
+            self.notifications.append(Notification(drive_name=drive_name, disc_name=disc_name, problems=problems))
 
     def _update_ripping_state(self) -> None:
         """
@@ -357,10 +349,10 @@ class AutoVideoRipper:
             while pipe.poll():
                 _state: RipperMessage = pipe.recv()
                 if _state.status == RipperStatus.FINISHED:
-                    self.parse_log_file(
+                    self.notify_problems(
                         drive_name=drive,
-                        log_path=_state.log_path,
                         disc_name=_state.disc_name,
+                        problems=_state.problems,
                     )
                 self._ripping_state[drive] = _state
 
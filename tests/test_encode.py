@@ -0,0 +1,274 @@
+import json
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from rkiv import encode
+from rkiv.encode import (
+    EncodeScheduler,
+    EncodeStatus,
+    HandBrakeProgress,
+    chapter_ranges,
+    encode_chunked,
+    handbrake_command,
+    thread_hint,
+)
+from rkiv.handbrake import Chapter, Duration, HandBrakeScan
+from tests.test_handbrake import cli_output, title_set
+
+
+@pytest.fixture
+def handbrake(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """
+    HandBrakeCLI on PATH that scans every input as a 44 minute title, or 10 minutes for partial encodes, and writes
+    its output after a couple of progress lines. Encode command lines are appended to the returned file.
+    """
+
+    bin_dir = tmp_path.joinpath("bin")
+    bin_dir.mkdir()
+    calls = tmp_path.joinpath("calls")
+    full = tmp_path.joinpath("full.txt")
+    full.write_text(cli_output(title_set(1)))
+    short = title_set(1)
+    short["TitleList"][0]["Duration"]["Minutes"] = 10
+    tmp_path.joinpath("short.txt").write_text(cli_output(short))
+    short = tmp_path.joinpath("short.txt")
+
+    script = bin_dir.joinpath("HandBrakeCLI")
+    script.write_text(
+        "#!/bin/sh\n"
+        'for a; do case "$prev" in -i|--input) in="$a" ;; -o) out="$a" ;; esac; prev="$a"; done\n'
+        'case "$*" in\n'
+        f'  *--scan*) if grep -q partial "$in"; then cat {short}; else cat {full}; fi ;;\n'
+        f'  *) echo "$*" >> {calls}\n'
+        "     printf 'Encoding: task 1 of 1, 50.00 %% (120.00 fps, avg 110.00 fps, ETA 00h00m01s)\\r'\n"
+        "     printf 'Encoding: task 1 of 1, 100.00 %%\\n'\n"
+        '     case "$in" in *broken*) echo "[h265] encoder error" >&2 ;; esac\n'
+        '     echo encoded > "$out" ;;\n'
+        "esac\n"
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("HOME", str(tmp_path.joinpath("home")))
+    monkeypatch.setattr(encode.CONFIG, "workspace", tmp_path.joinpath("temp"))
+    return calls
+
+
+def test_progress_line() -> None:
+    """progress with and without a rate, the second of two passes"""
+
+    progress = HandBrakeProgress.from_line("Encoding: task 2 of 2, 50.00 % (30.50 fps, avg 29.00 fps, ETA 01h02m03s)")
+    assert progress is not None
+    assert progress.overall == pytest.approx(0.75)
+    assert progress.fps == 30.5
+    assert progress.eta is not None and progress.eta.total_seconds() == 3723
+
+    progress = HandBrakeProgress.from_line("Encoding: task 1 of 1, 0.42 %")
+    assert progress is not None and progress.fps == 0.0 and progress.eta is None
+    assert HandBrakeProgress.from_line("Muxing: this may take awhile...") is None
+
+
+def test_handbrake_command(tmp_path: Path) -> None:
+    """the thread hint is added to the encoder options of the preset"""
+
+    preset = tmp_path.joinpath("preset.json")
+    preset.write_text(
+        json.dumps(
+            {
+                "PresetList": [
+                    {
+                        "Folder": True,
+                        "ChildrenArray": [{"PresetName": "h265AutoRipMedMkv", "VideoOptionExtra": "aq-mode=3"}],
+                    }
+                ]
+            }
+        )
+    )
+
+    cmd = handbrake_command(Path("in.mkv"), Path("out.mkv"), threads=16, preset=preset)
+    assert cmd[cmd.index("--encopts") + 1] == "aq-mode=3:pools=16"
+    assert "--encopts" not in handbrake_command(Path("in.mkv"), Path("out.mkv"), preset=preset)
+    assert thread_hint(jobs=3, cores=64) == 21
+    assert thread_hint(jobs=128, cores=64) == 1
+
+
+def test_scheduler(tmp_path: Path, handbrake: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """outputs mirror the collection, good outputs are skipped and the manifest lets a re-run skip everything"""
+
+    collection = tmp_path.joinpath("collection")
+    output = tmp_path.joinpath("h265")
+    for name in ("movies/Alien/Alien.mkv", "movies/Dune/Dune.m4v", "tv/Cheers/Cheers_S01E01.mkv", "notes.txt"):
+        collection.joinpath(name).parent.mkdir(parents=True, exist_ok=True)
+        collection.joinpath(name).write_text("source")
+    collection.joinpath("movies/Brazil_broken.mkv").write_text("source")
+    # A finished encode from before the manifest and one cut short by a crash
+    output.joinpath("movies/Alien").mkdir(parents=True)
+    output.joinpath("movies/Alien/Alien.mkv").write_text("encoded")
+    output.joinpath("tv/Cheers").mkdir(parents=True)
+    output.joinpath("tv/Cheers/Cheers_S01E01.mkv").write_text("partial")
+
+    scheduler = EncodeScheduler(collection=collection, output=output, jobs=2, threads=4)
+    updates: list[str] = []
+    jobs = scheduler.run(on_update=lambda job, progress: updates.append(str(progress)))
+
+    status = {job.name: job.status for job in jobs}
+    assert status == {
+        "movies/Alien/Alien.mkv": EncodeStatus.SKIPPED,
+        "movies/Brazil_broken.mkv": EncodeStatus.FAILED,
+        "movies/Dune/Dune.m4v": EncodeStatus.DONE,
+        "tv/Cheers/Cheers_S01E01.mkv": EncodeStatus.DONE,
+    }
+    assert output.joinpath("movies/Dune/Dune.m4v").read_text() == "encoded\n"
+    assert all("pools=4" in line for line in handbrake.read_text().splitlines())
+    assert updates[-1].startswith("[4/4]")
+    assert scheduler.log_path(next(job for job in jobs if "Dune" in job.name)).name == "Dune.m4v.log"
+
+    broken = next(job for job in jobs if job.status == EncodeStatus.FAILED)
+    assert broken.entry.problems == ["[h265] encoder error"]
+    assert broken.entry.fps == 110.0
+
+    manifest = json.loads(output.joinpath(".rkiv-h265.json").read_text())
+    assert manifest["movies/Dune/Dune.m4v"]["status"] == "done"
+    assert manifest["movies/Dune/Dune.m4v"]["duration"] == 44 * 60 + 10
+
+    # Nothing is scanned again
+    tmp_path.joinpath("bin/HandBrakeCLI").unlink()
+    rerun = EncodeScheduler(collection=collection, output=output, jobs=2).plan()
+    assert [job.status for job in rerun].count(EncodeStatus.SKIPPED) == 3
+    assert next(job for job in rerun if "broken" in job.name).status == EncodeStatus.PENDING
+
+    # Without HandBrakeCLI a new source fails its scan, and an encode that raises fails its job, not the run
+    collection.joinpath("movies/Zardoz.mkv").write_text("source")
+    scheduler = EncodeScheduler(collection=collection, output=output, jobs=2)
+    jobs = scheduler.plan()
+    zardoz = next(job for job in jobs if "Zardoz" in job.name)
+    assert zardoz.status == EncodeStatus.FAILED and zardoz.entry.problems[0].startswith("Scan failed")
+
+    def _no_title_set(*_) -> list[str]:
+        raise ValueError("HandBrakeCLI printed no title set")
+
+    monkeypatch.setattr(encode, "run_handbrake", _no_title_set)
+    jobs = scheduler.run(jobs)
+    broken = next(job for job in jobs if "broken" in job.name)
+    assert broken.status == EncodeStatus.FAILED
+    assert broken.entry.problems == ["Encode failed: HandBrakeCLI printed no title set"]
+    manifest = json.loads(output.joinpath(".rkiv-h265.json").read_text())
+    assert manifest["movies/Brazil_broken.mkv"]["status"] == "failed"
+
+
+def feature(chapter_minutes: list[int]) -> dict:
+    """title set of a single title with chapters of the given minutes"""
+
+    obj = title_set(1)
+    title = obj["TitleList"][0]
+    title["ChapterList"] = [
+        {"Duration": {"Hours": 0, "Minutes": m, "Seconds": 0, "Ticks": m * 60 * 90000}, "Name": f"Chapter {c}"}
+        for c, m in enumerate(chapter_minutes, start=1)
+    ]
+    total = sum(chapter_minutes)
+    title["Duration"] = {"Hours": total // 60, "Minutes": total % 60, "Seconds": 0, "Ticks": total * 60 * 90000}
+    return obj
+
+
+def test_chapter_ranges() -> None:
+    """runs of whole chapters of about equal length"""
+
+    def chapters(minutes: list[int]) -> list[Chapter]:
+        return [Chapter(Duration=Duration(Hours=0, Minutes=m, Seconds=0, Ticks=m * 5400000), Name="") for m in minutes]
+
+    assert chapter_ranges(chapters([10] * 12), 4) == [(1, 3), (4, 6), (7, 9), (10, 12)]
+    assert chapter_ranges(chapters([50, 5, 5, 5, 5, 50]), 3) == [(1, 1), (2, 5), (6, 6)]
+    assert chapter_ranges(chapters([10, 10]), 8) == [(1, 1), (2, 2)]
+    assert chapter_ranges(chapters([10] * 3), 1) == [(1, 3)]
+    assert chapter_ranges([], 4) == []
+
+
+def test_encode_chunked(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """chapter ranges are encoded at once, checked against the source duration and appended in order"""
+
+    minutes = [20, 20, 20, 30, 30, 60]
+    ranges = chapter_ranges(HandBrakeScan.from_dict(feature(minutes)).TitleList[0].ChapterList, 3)
+    assert ranges == [(1, 3), (4, 5), (6, 6)]
+
+    scans = tmp_path.joinpath("scans")
+    scans.mkdir()
+    scans.joinpath("source.txt").write_text(cli_output(feature(minutes)))
+    for first, last in ranges:
+        scans.joinpath(f"{first}-{last}.txt").write_text(cli_output(feature(minutes[first - 1 : last])))
+    # The last chunk comes out a minute short once its scan is swapped
+    scans.joinpath("short.txt").write_text(cli_output(feature([59])))
+
+    bin_dir = tmp_path.joinpath("bin")
+    bin_dir.mkdir()
+    calls = tmp_path.joinpath("calls")
+    fail = tmp_path.joinpath("fail")
+    bin_dir.joinpath("HandBrakeCLI").write_text(
+        "#!/bin/sh\n"
+        'for a; do case "$prev" in -i|--input) in="$a" ;; -o) out="$a" ;; --chapters) chapters="$a" ;; esac; prev="$a"; done\n'
+        'case "$*" in\n'
+        f'  *--scan*) case "$(cat "$in")" in chunk*) cat {scans}/$(cut -c7- "$in").txt ;; *) cat {scans}/source.txt ;; esac ;;\n'
+        f'  *) echo "$chapters" >> {calls}\n'
+        "     printf 'Encoding: task 1 of 1, 100.00 %% (50.00 fps, avg 50.00 fps, ETA 00h00m00s)\\n'\n"
+        f'     [ "$chapters" = 4-5 ] && [ -e {fail} ] && echo "[h265] encoder error" >&2\n'
+        '     echo "chunk $chapters" > "$out" ;;\n'
+        "esac\n"
+    )
+    bin_dir.joinpath("mkvmerge").write_text(
+        "#!/bin/sh\n"
+        f'echo "$*" >> {calls}\n'
+        'out="$3"; shift 3\n'
+        'for a; do [ "$a" = "+" ] || cat "$a" >> "$out"; done\n'
+    )
+    for f in bin_dir.iterdir():
+        f.chmod(f.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("HOME", str(tmp_path.joinpath("home")))
+    monkeypatch.setattr(encode.CONFIG, "workspace", tmp_path.joinpath("temp"))
+
+    source = tmp_path.joinpath("Heat.mkv")
+    source.write_text("source")
+    output = tmp_path.joinpath("out/Heat.mkv")
+    output.parent.mkdir()
+    progress: list[HandBrakeProgress] = []
+
+    assert (
+        encode_chunked(source, output, tmp_path.joinpath("Heat.log"), chunks=3, progress_callback=progress.append) == []
+    )
+    assert output.read_text().splitlines() == ["chunk 1-3", "chunk 4-5", "chunk 6-6"]
+    *encodes, mkvmerge = calls.read_text().splitlines()
+    assert sorted(encodes) == ["1-3", "4-5", "6-6"]
+    assert [Path(a).name for a in mkvmerge.split()[3:]] == [
+        "Heat.c001-003.mkv",
+        "+",
+        "Heat.c004-005.mkv",
+        "+",
+        "Heat.c006-006.mkv",
+    ]
+    assert progress[-1].overall == pytest.approx(1.0)
+    assert list(tmp_path.joinpath("temp/chunks").iterdir()) == []
+
+    # Jobs whose outputs share a stem don't share pieces
+    outputs = [tmp_path.joinpath(f"out/{season}/Heat.mkv") for season in ("S01", "S02")]
+    for o in outputs:
+        o.parent.mkdir()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(lambda o: encode_chunked(source, o, o.with_suffix(".log"), chunks=3), outputs))
+    assert results == [[], []]
+    assert all(o.read_text().splitlines() == ["chunk 1-3", "chunk 4-5", "chunk 6-6"] for o in outputs)
+
+    # A failed piece fails the title and the partial pieces are removed
+    output.unlink()
+    fail.touch()
+    assert encode_chunked(source, output, tmp_path.joinpath("Heat.log"), chunks=3) == ["[h265] encoder error"]
+    assert not output.exists()
+    assert list(tmp_path.joinpath("temp/chunks").iterdir()) == []
+    fail.unlink()
+
+    scans.joinpath("short.txt").rename(scans.joinpath("6-6.txt"))
+    problems = encode_chunked(source, output, tmp_path.joinpath("Heat.log"), chunks=3)
+    assert problems[0].startswith("Chunks add up to 10740.00s of 10800.00s")
+    assert not output.exists()
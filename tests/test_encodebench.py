@@ -0,0 +1,113 @@
+import json
+import os
+import stat
+from pathlib import Path
+
+import pandas
+import pytest
+
+from rkiv import encodebench
+from rkiv.encodebench import BenchClip, BenchResult, run_bench, setting_matrix, summarize, write_results
+from tests.test_encode import feature
+from tests.test_handbrake import cli_output
+
+
+def result(setting: str, fps: float, bitrate_kbps: float, problems: str = "") -> BenchResult:
+    return BenchResult(
+        clip="clip",
+        setting=setting,
+        seconds=1.0,
+        fps=fps,
+        bitrate_kbps=bitrate_kbps,
+        size_bytes=0,
+        cpu=1.0,
+        problems=problems,
+    )
+
+
+def test_summarize() -> None:
+    """settings beaten on both rate and size, or matched on one and beaten on the other, are off the front"""
+
+    summary = summarize(
+        [
+            result("fast", 100.0, 4000.0),
+            result("fast", 80.0, 4000.0),
+            result("slow", 20.0, 2000.0),
+            result("worse", 20.0, 2500.0),
+            result("tied", 90.0, 4000.0),
+            result("broken", 500.0, 10.0, problems="[h265] encoder error"),
+        ]
+    )
+
+    assert list(summary.index) == ["fast", "tied", "slow", "worse"]
+    assert summary.loc["fast", "fps"] == 90.0
+    assert summary["pareto"].to_dict() == {"fast": True, "tied": True, "slow": True, "worse": False}
+
+
+def test_bench_encode(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """middle chapter excerpts of discs are encoded once per setting and the results written as csv and parquet"""
+
+    minutes = [5, 1, 1, 1, 1, 5]
+    scan = tmp_path.joinpath("scan.txt")
+    scan.write_text(cli_output(feature(minutes)))
+
+    bin_dir = tmp_path.joinpath("bin")
+    bin_dir.mkdir()
+    calls = tmp_path.joinpath("calls")
+    script = bin_dir.joinpath("HandBrakeCLI")
+    script.write_text(
+        "#!/bin/sh\n"
+        'for a; do case "$prev" in -o) out="$a" ;; --quality) quality="$a" ;; esac; prev="$a"; done\n'
+        'case "$*" in\n'
+        f"  *--scan*) cat {scan} ;;\n"
+        f'  *) echo "$*" >> {calls}\n'
+        "     printf 'Encoding: task 1 of 1, 100.00 %% (50.00 fps, avg 40.00 fps, ETA 00h00m00s)\\n'\n"
+        '     head -c $((30000 / quality)) /dev/zero > "$out" ;;\n'
+        "esac\n"
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("HOME", str(tmp_path.joinpath("home")))
+    monkeypatch.setattr(encodebench.CONFIG, "workspace", tmp_path.joinpath("temp"))
+
+    disc = tmp_path.joinpath("Movie")
+    disc.mkdir()
+    clip = BenchClip.excerpt(disc, seconds=150)
+    assert clip.chapters == (3, 5) and clip.seconds == 180
+
+    preset = tmp_path.joinpath("preset.json")
+    preset.write_text(json.dumps({"PresetList": [{"PresetName": "Fast 1080p30", "VideoOptionExtra": "aq-mode=3"}]}))
+    settings = setting_matrix([preset], encoder_presets=["medium"], qualities=[20, 30])
+    assert [s.label for s in settings] == ["preset/Fast 1080p30 medium q20", "preset/Fast 1080p30 medium q30"]
+
+    results = run_bench([clip], settings, threads=4)
+    encodes = calls.read_text().splitlines()
+    assert len(encodes) == 2
+    assert all("--chapters 3-5" in e and "-Z Fast 1080p30" in e and "pools=4" in e for e in encodes)
+    assert [r.size_bytes for r in results] == [1500, 1000]
+    assert results[0].bitrate_kbps == pytest.approx(1500 * 8 / 1000 / 180)
+    assert all(r.fps == 40.0 and r.problems == "" for r in results)
+    assert not tmp_path.joinpath("temp", "bench").exists()
+
+    write_results(results, tmp_path.joinpath("bench.csv"))
+    write_results(results, tmp_path.joinpath("bench.parquet"))
+    for frame in (
+        pandas.read_csv(tmp_path.joinpath("bench.csv")),
+        pandas.read_parquet(tmp_path.joinpath("bench.parquet")),
+    ):
+        assert list(frame["setting"]) == [s.label for s in settings]
+
+
+def test_setting_labels(tmp_path: Path) -> None:
+    """exports sharing a preset name are told apart by their file"""
+
+    presets = []
+    for name in ["film", "grain"]:
+        presets.append(tmp_path.joinpath(f"{name}.json"))
+        presets[-1].write_text(json.dumps({"PresetList": [{"PresetName": encodebench.PRESET_NAME}]}))
+
+    settings = setting_matrix(presets, qualities=[20])
+    assert [s.label for s in settings] == [
+        f"film/{encodebench.PRESET_NAME} q20",
+        f"grain/{encodebench.PRESET_NAME} q20",
+    ]
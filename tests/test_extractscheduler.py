@@ -0,0 +1,120 @@
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Iterator
+
+from rkiv.extractscheduler import ExtractJob, ExtractProgress, ExtractScheduler, JobStatus
+from rkiv.inventory import ArchivedDisc, MediaCategory, OpticalDiscType
+from rkiv.makemkv import AspectRatio, TitelInfoMMKV
+
+
+def disc(path: Path, title: str) -> ArchivedDisc:
+    return ArchivedDisc(
+        title=title,
+        disc_name=f"{title}_D01",
+        path=path.joinpath(title, f"{title}_D01"),
+        category=MediaCategory.MOVIE,
+        type=OpticalDiscType.DVD,
+        iso=False,
+        problem=False,
+    )
+
+
+class TestExtractScheduler:
+    """test ExtractScheduler"""
+
+    @staticmethod
+    def test_run(tmp_path: Path) -> None:
+        """scans and extractions reading one filesystem are limited, failures are reported on their job"""
+
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def read() -> None:
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+
+        def scan(disc: ArchivedDisc) -> TitelInfoMMKV:
+            read()
+            if disc.title == "Bad_Scan":
+                raise RuntimeError("no titles")
+            return TitelInfoMMKV(
+                id=3,
+                size_bytes=1024,
+                size_GB=1.0,
+                chapters=12,
+                streams=4,
+                aspect_ratio=AspectRatio.WIDE,
+                length=timedelta(hours=2),
+            )
+
+        def extract(disc: ArchivedDisc, location: Path, title: int, progress: Callable[[float], None]) -> list[str]:
+            progress(0.5)
+            read()
+            return ['MSG:5010,0,0,"Failed to open disc"'] if disc.title == "Bad_Rip" else []
+
+        titles = ["Alien", "Bad_Scan", "Brazil", "Bad_Rip", "Heat"]
+        updates: list[tuple[str, JobStatus]] = []
+        progressed: set[str] = set()
+
+        def on_update(job: ExtractJob, progress: ExtractProgress) -> None:
+            updates.append((job.disc.title, job.status))
+
+        scheduler = ExtractScheduler(
+            output=tmp_path.joinpath("out"), workers=4, per_source=1, per_destination=4, scan=scan, extract=extract
+        )
+        jobs = scheduler.run(
+            (disc(tmp_path, t) for t in titles),
+            on_update=on_update,
+            on_progress=lambda job: progressed.add(job.disc.title),
+        )
+
+        assert [j.disc.title for j in jobs] == titles
+        assert running[1] == 1
+        assert {j.disc.title: j.status for j in jobs} == {
+            "Alien": JobStatus.DONE,
+            "Bad_Scan": JobStatus.FAILED,
+            "Brazil": JobStatus.DONE,
+            "Bad_Rip": JobStatus.FAILED,
+            "Heat": JobStatus.DONE,
+        }
+        assert jobs[1].problems == ["Scan failed: no titles"]
+        assert ("Heat", JobStatus.EXTRACTING) in updates
+        assert progressed == {"Alien", "Brazil", "Bad_Rip", "Heat"}
+
+        running[1] = 0
+        scheduler.per_source = 3
+        scheduler.run((disc(tmp_path, t) for t in titles), on_update=on_update)
+        assert running[1] > 1
+
+    @staticmethod
+    def test_slow_walk(tmp_path: Path) -> None:
+        """discs found so far are scanned and extracted while the walk is still looking for the next"""
+
+        extracted = threading.Event()
+        waited: list[bool] = []
+
+        def walk() -> Iterator[ArchivedDisc]:
+            yield disc(tmp_path, "Alien")
+            waited.append(extracted.wait(timeout=5))
+            yield disc(tmp_path, "Heat")
+
+        def on_update(job: ExtractJob, progress: ExtractProgress) -> None:
+            if job.status == JobStatus.DONE:
+                extracted.set()
+
+        title = TitelInfoMMKV(
+            id=0, size_bytes=1, size_GB=0.0, chapters=1, streams=1, aspect_ratio=AspectRatio.WIDE, length=timedelta()
+        )
+        scheduler = ExtractScheduler(
+            output=tmp_path.joinpath("out"), scan=lambda _: title, extract=lambda *_: [], per_destination=1
+        )
+        jobs = scheduler.run(walk(), on_update=on_update)
+
+        assert waited == [True]
+        assert [j.status for j in jobs] == [JobStatus.DONE, JobStatus.DONE]
@@ -0,0 +1,159 @@
+import json
+import os
+import stat
+from pathlib import Path
+
+import pytest
+
+from rkiv.handbrake import HandBrakeScan, LazyModelList, read_json_title_set
+
+
+def title_set(titles: int) -> dict:
+    """HandBrakeCLI title set of `titles` titles with an audio track, two subtitles and three chapters each"""
+
+    duration = {"Hours": 0, "Minutes": 44, "Seconds": 10, "Ticks": 238500000}
+    subtitle_attributes = {
+        "4By3": False,
+        "Children": False,
+        "ClosedCaption": False,
+        "Commentary": False,
+        "Default": False,
+        "Forced": True,
+        "Large": False,
+        "Letterbox": False,
+        "Normal": True,
+        "PanScan": False,
+        "Wide": False,
+    }
+    audio = {
+        "Attributes": {
+            "AltCommentary": False,
+            "Commentary": False,
+            "Default": True,
+            "Normal": True,
+            "Secondary": False,
+            "VisuallyImpaired": False,
+        },
+        "BitRate": 448000,
+        "ChannelCount": 6,
+        "ChannelLayout": 1551,
+        "ChannelLayoutName": "5.1",
+        "Codec": 2048,
+        "CodecName": "ac3",
+        "CodecParam": 0,
+        "Description": "English (AC3, 5.1 ch)",
+        "LFECount": 1,
+        "Language": "English",
+        "LanguageCode": "eng",
+        "SampleRate": 48000,
+        "TrackNumber": 1,
+    }
+    return {
+        "MainFeature": 0,
+        "TitleList": [
+            {
+                "AngleCount": 1,
+                "AudioList": [audio],
+                "ChapterList": [{"Duration": duration, "Name": f"Chapter {c}"} for c in range(1, 4)],
+                "Color": {"ChromaLocation": 1, "Format": 0, "Matrix": 1, "Primary": 1, "Range": 1, "Transfer": 1},
+                "Crop": [0, 0, 0, 0],
+                "Duration": duration,
+                "FrameRate": {"Den": 1001, "Num": 24000},
+                "Geometry": {"Height": 1080, "PAR": {"Den": 1, "Num": 1}, "Width": 1920},
+                "Index": t + 1,
+                "InterlaceDetected": False,
+                "LooseCrop": [0, 0, 0, 0],
+                "Metadata": {},
+                "Name": 'Cheers {Season 1} "}"',
+                "Path": "/archive/tv/Cheers",
+                "Playlist": t,
+                "SubtitleList": [
+                    {
+                        "Attributes": subtitle_attributes,
+                        "Format": "bitmap",
+                        "Language": "English",
+                        "LanguageCode": "eng",
+                        "Source": 4,
+                        "SourceName": "PGS",
+                        "TrackNumber": s,
+                    }
+                    for s in (1, 2)
+                ],
+                "Type": 2,
+                "VideoCodec": "h264",
+            }
+            for t in range(titles)
+        ],
+    }
+
+
+def cli_output(obj: dict) -> str:
+    """stdout of HandBrakeCLI --json --scan"""
+
+    progress = 'Progress: {\n    "State": "SCANNING"\n}\n'
+    return f'Version: {{\n    "Name": "HandBrake"\n}}\n{progress * 3}JSON Title Set: {json.dumps(obj, indent=4)}\n'
+
+
+def test_read_json_title_set() -> None:
+    """progress records are skipped and braces inside strings do not end the title set"""
+
+    obj = title_set(2)
+    lines = iter(f"{cli_output(obj)}Progress: {{\n".splitlines(keepends=True))
+    raw, parsed = read_json_title_set(lines)
+
+    assert parsed == obj
+    assert json.loads(raw) == obj
+    assert next(lines) == "Progress: {\n"
+
+    assert read_json_title_set([f"JSON Title Set: {json.dumps(obj)}\n"])[1] == obj
+    with pytest.raises(ValueError):
+        read_json_title_set(cli_output(obj).splitlines(keepends=True)[:-5])
+
+
+def test_trusted_scan() -> None:
+    """a trusted scan holds the same values as a validated one, chapters and subtitles are built when read"""
+
+    obj = title_set(3)
+    validated = HandBrakeScan.from_dict(obj)
+    trusted = HandBrakeScan.from_dict(obj, trusted=True)
+
+    title = trusted.TitleList[2]
+    assert isinstance(title.ChapterList, LazyModelList)
+    assert len(title.ChapterList) == 3
+    assert title.ChapterList._items == [None, None, None]
+    assert title.ChapterList == validated.TitleList[2].ChapterList
+    assert title.SubtitleList[-1].Attributes.Forced
+    assert title.SubtitleList[0].Attributes.FourByThree is False
+    assert title.AudioList == validated.TitleList[2].AudioList
+    assert title.seconds == validated.TitleList[2].seconds == 44 * 60 + 10
+
+    del obj["TitleList"][0]["Crop"]
+    with pytest.raises(ValueError):
+        HandBrakeScan.from_dict(obj, trusted=True)
+
+
+def test_from_scan(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """the first scan is validated, the cached one is trusted"""
+
+    disc = tmp_path.joinpath("Cheers_S01_D01")
+    disc.joinpath("BDMV").mkdir(parents=True)
+    disc.joinpath("BDMV/index.bdmv").write_bytes(b"INDX0200")
+    disc.joinpath("BDMV/MovieObject.bdmv").write_bytes(b"MOBJ0200")
+
+    bin_dir = tmp_path.joinpath("bin")
+    bin_dir.mkdir()
+    output = tmp_path.joinpath("scan.txt")
+    output.write_text(cli_output(title_set(4)))
+    script = bin_dir.joinpath("HandBrakeCLI")
+    script.write_text(f"#!/bin/sh\ncat {output}\necho 'HandBrake has exited.' >&2\n")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("HOME", str(tmp_path.joinpath("home")))
+
+    fresh = HandBrakeScan.from_scan(disc)
+    cached = HandBrakeScan.from_scan(disc)
+
+    assert isinstance(fresh.TitleList[0].ChapterList, list)
+    assert isinstance(cached.TitleList[0].ChapterList, LazyModelList)
+    assert [len(t.ChapterList) for t in cached.TitleList] == [3, 3, 3, 3]
+    assert cached.TitleList[3].ChapterList == fresh.TitleList[3].ChapterList
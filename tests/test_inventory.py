@@ -0,0 +1,399 @@
+import json
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from rkiv.fingerprint import duplicate_discs
+from rkiv.inventory import (
+    ArchivedDisc,
+    DirectoryListing,
+    DiscArchiveDataFrame,
+    Inventory,
+    MediaCategory,
+    OpticalDiscType,
+    StreamObject,
+)
+from rkiv.inventoryindex import InventoryIndex
+from rkiv.inventorytable import InventoryTable
+from rkiv.inventorywatch import LiveInventory
+
+
+@pytest.fixture
+def disc_archive(tmp_path: Path) -> Path:
+    """Small disc archive for testing"""
+
+    layout = [
+        "movies/Alien/Alien_D01/VIDEO_TS/VIDEO_TS.IFO",
+        "movies/Alien/Alien_D02/BDMV/index.bdmv",
+        "tv/Cheers/Cheers_S01/Cheers_S01_D01/VIDEO_TS/VTS_01_0.IFO",
+        "problems/movies/Brazil/Brazil_D01/VIDEO_TS/VIDEO_TS.IFO",
+        "ArchiveShare/movies/Alien/Alien_D01/VIDEO_TS/VIDEO_TS.IFO",
+        "lost+found/Old/Old_D01/VIDEO_TS/VIDEO_TS.IFO",
+        "movies/Empty/readme.txt",
+    ]
+    for file in layout:
+        path = tmp_path.joinpath(file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+    return tmp_path
+
+
+class TestArchivedDisc:
+    """test ArchivedDisc"""
+
+    @staticmethod
+    def test_walk_disc_archive(disc_archive: Path) -> None:
+        """test it"""
+
+        discs = sorted(ArchivedDisc.walk_disc_archive(disc_archive), key=lambda d: str(d.path))
+        assert [d.path.relative_to(disc_archive) for d in discs] == [
+            Path("movies/Alien/Alien_D01"),
+            Path("movies/Alien/Alien_D02"),
+            Path("problems/movies/Brazil/Brazil_D01"),
+            Path("tv/Cheers/Cheers_S01/Cheers_S01_D01"),
+        ]
+
+        alien, alien_bd, brazil, cheers = discs
+        assert alien.type == OpticalDiscType.DVD
+        assert alien_bd.type == OpticalDiscType.BLU_RAY
+        assert alien.category == MediaCategory.MOVIE
+        assert brazil.problem
+        assert not alien.problem
+        assert cheers.title == "Cheers_S01"
+        assert cheers.category == MediaCategory.TV
+
+    @staticmethod
+    def test_walk_disc_archive_lists_once(disc_archive: Path) -> None:
+        """every directory is listed a single time"""
+
+        listed: list[Path] = []
+
+        def lister(dir: Path) -> DirectoryListing:
+            listed.append(dir)
+            return DirectoryListing.scan(dir)
+
+        roots = [disc_archive.joinpath("movies"), disc_archive.joinpath("tv")]
+        scans = ArchivedDisc.scan_disc_archives(roots, lister=lister)
+
+        assert len(listed) == len(set(listed))
+        assert [len(s.discs) for s in scans] == [2, 1]
+        assert [s.root_path for s in scans] == roots
+        assert all(s.seconds >= 0 for s in scans)
+
+    @staticmethod
+    def test_walk_disc_archive_root_is_disc(disc_archive: Path) -> None:
+        """root of the walk is a disc"""
+
+        root = disc_archive.joinpath("movies/Alien/Alien_D01")
+        discs = ArchivedDisc.walk_disc_archive(root)
+
+        assert discs == [ArchivedDisc.from_dir(root)]
+
+    @staticmethod
+    def test_iter_disc_archive(disc_archive: Path) -> None:
+        """the generator yields the same discs as the list walk and can be closed early"""
+
+        walked = sorted(str(d.path) for d in ArchivedDisc.walk_disc_archive(disc_archive))
+        assert sorted(str(d.path) for d in ArchivedDisc.iter_disc_archive(disc_archive, max_pending=1)) == walked
+
+        discs = ArchivedDisc.iter_disc_archive(disc_archive, max_workers=2, max_pending=1)
+        assert str(next(discs).path) in walked
+        discs.close()
+
+    @staticmethod
+    def test_aiter_disc_archive(disc_archive: Path) -> None:
+        """async variant"""
+
+        async def _collect() -> list[str]:
+            return [str(d.path) async for d in ArchivedDisc.aiter_disc_archive(disc_archive)]
+
+        walked = sorted(str(d.path) for d in ArchivedDisc.walk_disc_archive(disc_archive))
+        assert sorted(asyncio.run(_collect())) == walked
+
+    @staticmethod
+    def test_take_inventory(disc_archive: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        """every archive root is walked together on the shared pool"""
+
+        import rkiv.inventory
+
+        roots = [disc_archive.joinpath("movies"), disc_archive.joinpath("tv")]
+        walked: list[list[Path]] = []
+        scan_disc_archives = ArchivedDisc.scan_disc_archives
+
+        def _scan(root_paths: list[Path], **kwargs) -> list:
+            walked.append(root_paths)
+            return scan_disc_archives(root_paths, **kwargs)
+
+        monkeypatch.setenv("HOME", str(disc_archive.joinpath("home")))
+        monkeypatch.setattr(rkiv.inventory.CONFIG, "video_archives", roots)
+        monkeypatch.setattr(rkiv.inventory.CONFIG, "video_streams", [])
+        monkeypatch.setattr(ArchivedDisc, "scan_disc_archives", _scan)
+
+        inventory = Inventory.take_inventory(full=True)
+        assert walked == [roots]
+        assert [d.path.relative_to(disc_archive) for d in inventory.video_archive] == [
+            Path("movies/Alien/Alien_D01"),
+            Path("movies/Alien/Alien_D02"),
+            Path("tv/Cheers/Cheers_S01/Cheers_S01_D01"),
+        ]
+
+
+class TestInventoryIndex:
+    """test InventoryIndex"""
+
+    @staticmethod
+    def test_incremental_walk(disc_archive: Path, tmp_path_factory: pytest.TempPathFactory) -> None:
+        """unchanged directories are not listed again"""
+
+        db = tmp_path_factory.mktemp("index").joinpath("inventory.db")
+
+        index = InventoryIndex(path=db)
+        first = index.walk_disc_archives([disc_archive])[0].discs
+        index.save()
+        assert index.listed == index.visited
+
+        index = InventoryIndex(path=db)
+        second = index.walk_disc_archives([disc_archive])[0].discs
+        index.save()
+        assert index.listed == 0
+        assert sorted(first, key=lambda d: str(d.path)) == sorted(second, key=lambda d: str(d.path))
+        assert sorted(first, key=lambda d: str(d.path)) == index.archived_discs()
+
+        new_disc = disc_archive.joinpath("movies/Brazil/Brazil_D01/VIDEO_TS")
+        new_disc.mkdir(parents=True)
+
+        index = InventoryIndex(path=db)
+        third = index.walk_disc_archives([disc_archive])[0].discs
+        index.save()
+        assert index.listed == 3
+        assert len(third) == len(first) + 1
+
+        index = InventoryIndex(path=db, full=True)
+        index.walk_disc_archives([disc_archive])
+        assert index.listed == index.visited
+
+    @staticmethod
+    def test_removed_during_walk(disc_archive: Path, tmp_path_factory: pytest.TempPathFactory) -> None:
+        """a path removed between the walk finding it and indexing it gets an entry no stat matches"""
+
+        index = InventoryIndex(path=tmp_path_factory.mktemp("index").joinpath("inventory.db"))
+        removed = index._indexed(disc_archive.joinpath("movies/Heat/Heat_D01.iso"))
+        assert (removed.mtime_ns, removed.inode) == (-1, -1)
+        assert not removed.matches(disc_archive.stat())
+
+
+class TestLiveInventory:
+    """test LiveInventory"""
+
+    @staticmethod
+    def test_refresh(disc_archive: Path, tmp_path_factory: pytest.TempPathFactory) -> None:
+        """refresh picks up new, renamed and removed discs"""
+
+        stream = tmp_path_factory.mktemp("stream")
+        stream.joinpath("movies/Alien").mkdir(parents=True)
+        stream.joinpath("movies/Alien/Alien.mkv").touch()
+
+        db = tmp_path_factory.mktemp("index").joinpath("inventory.db")
+        live = LiveInventory(archive_roots=[disc_archive], stream_roots=[stream], index=InventoryIndex(path=db))
+        walked = live.take()
+
+        assert disc_archive.joinpath("movies") in walked
+        assert len(live.archived_discs) == 4
+        assert [d.title for d in live.inventory().unreleased_movies] == ["Brazil"]
+
+        movies = disc_archive.joinpath("movies")
+        movies.joinpath("Dune/Dune_D01/BDMV").mkdir(parents=True)
+        visited = live.refresh(movies)
+        assert movies.joinpath("Dune/Dune_D01") in visited
+        assert movies.joinpath("Dune/Dune_D01") in live.archived_discs
+        assert sorted(d.title for d in live.inventory().unreleased_movies) == ["Brazil", "Dune"]
+
+        movies.joinpath("Dune").rename(movies.joinpath("Dune_1984"))
+        live.refresh(movies)
+        assert movies.joinpath("Dune/Dune_D01") not in live.archived_discs
+        assert movies.joinpath("Dune_1984/Dune_D01") in live.archived_discs
+
+        live.refresh(disc_archive.joinpath("ArchiveShare/movies"))
+        assert len(live.archived_discs) == 5
+
+        stream.joinpath("movies/Dune_1984").mkdir()
+        stream.joinpath("movies/Dune_1984/Dune_1984.mkv").touch()
+        live.refresh(stream.joinpath("movies"))
+        assert [d.title for d in live.inventory().unreleased_movies] == ["Brazil"]
+
+    @staticmethod
+    def test_inventory_dict(disc_archive: Path) -> None:
+        """inventory survives the trip over the socket"""
+
+        discs = ArchivedDisc.walk_disc_archive(disc_archive)
+        inventory = Inventory.from_media(stream_objects=[], archived_discs=discs)
+        round_trip = Inventory.from_dict(json.loads(json.dumps(inventory.dict())))
+
+        assert round_trip.video_archive == inventory.video_archive
+        assert round_trip.unreleased_movies == inventory.unreleased_movies
+
+
+class TestDiscArchiveDataFrame:
+    """test DiscArchiveDataFrame"""
+
+    @staticmethod
+    def test_parquet_round_trip(disc_archive: Path, tmp_path_factory: pytest.TempPathFactory) -> None:
+        """snapshots keep their categoricals and can be projected"""
+
+        pytest.importorskip("pyarrow")
+        snapshot = tmp_path_factory.mktemp("snapshot").joinpath("inventory.parquet")
+        archive = DiscArchiveDataFrame.from_archive_list(ArchivedDisc.walk_disc_archive(disc_archive))
+        archive.to_parquet(snapshot)
+
+        loaded = DiscArchiveDataFrame.from_parquet(snapshot)
+        assert len(loaded.df) == 4
+        assert loaded.df["type"].dtype == OpticalDiscType.to_categorical()
+        assert loaded.df["category"].dtype == MediaCategory.to_categorical()
+        assert str(loaded.df["path"].dtype) == "category"
+
+        projected = DiscArchiveDataFrame.from_parquet(snapshot, columns=["title", "category", "type"])
+        assert list(projected.df.columns) == ["title", "category", "type"]
+
+        counts = projected.disc_counts()
+        assert counts.loc["movie", "dvd"] == 2
+        assert counts.loc["movie", "blu_ray"] == 1
+        assert counts.loc["tv", "dvd"] == 1
+
+        titles = projected.title_counts()
+        assert titles["movie"] == 2
+        assert titles["tv"] == 1
+
+    @staticmethod
+    def test_disc_sizes(disc_archive: Path, tmp_path_factory: pytest.TempPathFactory) -> None:
+        """sizes are summed once and then served from the cache"""
+
+        disc_archive.joinpath("movies/Alien/Alien_D01/VIDEO_TS/VTS_01_1.VOB").write_bytes(b"0" * 1000)
+        db = tmp_path_factory.mktemp("index").joinpath("inventory.db")
+        discs = ArchivedDisc.walk_disc_archive(disc_archive)
+
+        index = InventoryIndex(path=db)
+        sizes = index.disc_sizes(discs)
+        assert index.sized == 4
+        assert sizes[disc_archive.joinpath("movies/Alien/Alien_D01")] == 1000
+
+        index = InventoryIndex(path=db)
+        assert index.disc_sizes(discs) == sizes
+        assert index.sized == 0
+
+        archive = DiscArchiveDataFrame.from_archive_list(discs)
+        archive.df["size_bytes"] = [sizes[d.path] for d in discs]
+        assert archive.size_by("category")["movie"] == 1000
+        assert archive.size_by("type")["dvd"] == 1000
+
+    @staticmethod
+    def test_disc_fingerprints(disc_archive: Path, tmp_path_factory: pytest.TempPathFactory) -> None:
+        """discs archived twice share a fingerprint, fingerprints are cached and can be looked up"""
+
+        for disc in ("movies/Alien/Alien_D02", "movies/Aliens/Aliens_D01"):
+            disc_archive.joinpath(disc, "BDMV").mkdir(parents=True, exist_ok=True)
+            disc_archive.joinpath(disc, "AACS").mkdir()
+            disc_archive.joinpath(disc, "AACS/Unit_Key_RO.inf").write_bytes(b"UNIT KEY")
+        db = tmp_path_factory.mktemp("index").joinpath("inventory.db")
+        discs = ArchivedDisc.walk_disc_archive(disc_archive)
+
+        index = InventoryIndex(path=db)
+        fingerprints = index.disc_fingerprints(discs)
+        assert index.fingerprinted == 5
+        assert duplicate_discs(fingerprints) == [
+            [disc_archive.joinpath("movies/Alien/Alien_D02"), disc_archive.joinpath("movies/Aliens/Aliens_D01")]
+        ]
+
+        index = InventoryIndex(path=db)
+        assert index.disc_fingerprints(discs) == fingerprints
+        assert index.fingerprinted == 0
+
+        rip = disc_archive.joinpath("rips/Alien_D02")
+        rip.mkdir(parents=True)
+        index.add_fingerprint(rip, fingerprints[disc_archive.joinpath("movies/Alien/Alien_D02")])
+        assert rip in index.find_fingerprint(fingerprints[disc_archive.joinpath("movies/Alien/Alien_D02")])
+        assert index.find_fingerprint("aacs:unknown") == []
+
+
+class TestStreamObject:
+    """test StreamObject"""
+
+    @staticmethod
+    def test_walk_stream_library(tmp_path: Path) -> None:
+        """the walk stops at the layout depth"""
+
+        layout = [
+            "movies/Alien/Alien.mkv",
+            "movies/Alien/extras/deleted/Deleted.mkv",
+            "movies/Collections/Dune/Dune.mkv",
+            "tv/Cheers/Season_1/Cheers_S01E01.mkv",
+            "tv/Cheers/Season_2/extras/Blooper.mkv",
+            "tv/Cheers/Specials/Cheers_Special.mkv",
+            "library/movies/Brazil/Brazil.mkv",
+        ]
+        for file in layout:
+            path = tmp_path.joinpath(file)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.touch()
+
+        listed: list[Path] = []
+
+        def lister(dir: Path) -> DirectoryListing:
+            listed.append(dir)
+            return DirectoryListing.scan(dir)
+
+        stream_objects = sorted(StreamObject.walk_stream_library(tmp_path, lister=lister), key=lambda s: str(s.path))
+
+        assert [(s.match_name, s.category) for s in stream_objects] == [
+            ("Brazil", MediaCategory.MOVIE),
+            ("Alien", MediaCategory.MOVIE),
+            ("Cheers_S1", MediaCategory.TV),
+            ("Cheers_S2", MediaCategory.TV),
+            ("Cheers_SSpecials", MediaCategory.TV),
+        ]
+        assert tmp_path.joinpath("movies/Alien/extras") not in listed
+        assert tmp_path.joinpath("movies/Collections/Dune") not in listed
+        assert tmp_path.joinpath("tv/Cheers/Season_1") not in listed
+        assert len(listed) == len(set(listed))
+
+        season = tmp_path.joinpath("tv/Cheers/Season_2")
+        assert [s.path for s in StreamObject.walk_stream_library(season)] == [season]
+        assert StreamObject.walk_stream_library(tmp_path.joinpath("movies/Alien/extras")) == []
+
+
+class TestInventoryTable:
+    """test InventoryTable"""
+
+    @staticmethod
+    def test_unreleased(disc_archive: Path) -> None:
+        """vectorized unreleased check matches the object based one"""
+
+        discs = sorted(ArchivedDisc.walk_disc_archive(disc_archive), key=lambda d: str(d.path))
+        streams = [
+            StreamObject(
+                title="Alien", path=Path("/stream/movies/Alien"), category=MediaCategory.MOVIE, match_name="Alien"
+            )
+        ]
+        stream_titles = {s.match_name for s in streams}
+
+        table = InventoryTable.from_media(stream_objects=streams, archived_discs=discs)
+        assert list(table.unreleased()) == [d for d in discs if d.title not in stream_titles]
+        assert [d.title for d in table.unreleased(category=MediaCategory.MOVIE)] == ["Brazil"]
+        assert [d.title for d in table.unreleased(category=MediaCategory.TV)] == ["Cheers_S01"]
+        assert list(table.archived_discs(table.disc_mask(problem=True))) == [discs[2]]
+        assert list(table.archived_discs(table.disc_mask(disc_type=OpticalDiscType.BLU_RAY))) == [discs[1]]
+
+    @staticmethod
+    def test_lazy_rows(disc_archive: Path) -> None:
+        """rows loaded from dicts are only built when accessed"""
+
+        discs = sorted(ArchivedDisc.walk_disc_archive(disc_archive), key=lambda d: str(d.path))
+        table = InventoryTable.from_dicts(stream_objects=[], archived_discs=[d.dict() for d in discs])
+
+        rows = table.archived_discs()
+        assert rows[1] == discs[1]
+        assert table._discs.count(None) == len(discs) - 1
+        assert rows[1] is rows[1]
+        assert list(rows) == discs
+        assert list(rows[1:3]) == discs[1:3]
@@ -0,0 +1,181 @@
+import struct
+from pathlib import Path
+
+import pytest
+
+from rkiv.inventory import ArchivedDisc, MediaCategory, OpticalDiscType
+from rkiv.isoimage import SECTOR_SIZE, ISOImage, ImageFormatError, iso_root_dirs
+
+
+def _descriptor(tag: int) -> bytearray:
+    sector = bytearray(SECTOR_SIZE)
+    struct.pack_into("<H", sector, 0, tag)
+    return sector
+
+
+def _iso9660(path: Path, dirs: list[str]) -> Path:
+    """Writes a tiny ISO9660 image with `dirs` and a file in its root"""
+
+    image = bytearray(SECTOR_SIZE * 20)
+
+    def record(name: bytes, is_dir: bool) -> bytes:
+        length = 33 + len(name) + (len(name) + 1) % 2
+        rec = bytearray(length)
+        rec[0] = length
+        struct.pack_into("<I", rec, 2, 18)
+        rec[25] = 0x02 if is_dir else 0x00
+        rec[32] = len(name)
+        rec[33 : 33 + len(name)] = name
+        return bytes(rec)
+
+    records = record(b"\x00", True) + record(b"\x01", True)
+    records += b"".join(record(d.encode(), True) for d in dirs) + record(b"README.TXT;1", False)
+
+    pvd = bytearray(SECTOR_SIZE)
+    pvd[0:7] = b"\x01CD001\x01"
+    pvd[156] = 34
+    struct.pack_into("<I4xI", pvd, 156 + 2, 18, len(records))
+    image[16 * SECTOR_SIZE : 17 * SECTOR_SIZE] = pvd
+    image[17 * SECTOR_SIZE : 17 * SECTOR_SIZE + 7] = b"\xffCD001\x01"
+    image[18 * SECTOR_SIZE : 18 * SECTOR_SIZE + len(records)] = records
+
+    path.write_bytes(bytes(image))
+    return path
+
+
+def _udf(path: Path, dirs: list[str], metadata: bool = False) -> Path:
+    """Writes a tiny UDF image, `metadata` puts the file set in a UDF 2.50 metadata partition like Blu-ray"""
+
+    partition_start = 300
+    image = bytearray(SECTOR_SIZE * 340)
+
+    def put(sector: int, data: bytes) -> None:
+        image[sector * SECTOR_SIZE : sector * SECTOR_SIZE + len(data)] = data
+
+    for i, vsd in enumerate([b"BEA01", b"NSR03", b"TEA01"]):
+        put(16 + i, b"\x00" + vsd + b"\x01")
+
+    anchor = _descriptor(2)
+    struct.pack_into("<II", anchor, 16, 3 * SECTOR_SIZE, 257)
+    put(256, anchor)
+
+    partition = _descriptor(5)
+    struct.pack_into("<H", partition, 22, 0)
+    struct.pack_into("<I", partition, 188, partition_start)
+    put(257, partition)
+
+    logical_volume = _descriptor(6)
+    struct.pack_into("<IIH", logical_volume, 248, SECTOR_SIZE, 0, 1 if metadata else 0)
+    logical_volume[440:446] = bytes([1, 6, 1, 0, 0, 0])
+    if metadata:
+        struct.pack_into("<I", logical_volume, 268, 2)
+        metadata_map = bytearray(64)
+        metadata_map[0:2] = bytes([2, 64])
+        metadata_map[5:28] = b"*UDF Metadata Partition"
+        struct.pack_into("<HI", metadata_map, 38, 0, 10)
+        logical_volume[446:510] = metadata_map
+    else:
+        struct.pack_into("<I", logical_volume, 268, 1)
+    put(258, logical_volume)
+    put(259, _descriptor(8))
+
+    # Metadata file, its single extent holds the metadata partition's blocks
+    metadata_base = 20 if metadata else 0
+    if metadata:
+        metadata_file = _descriptor(266)
+        struct.pack_into("<II", metadata_file, 208, 0, 8)
+        struct.pack_into("<II", metadata_file, 216, 3 * SECTOR_SIZE, metadata_base)
+        put(partition_start + 10, metadata_file)
+
+    file_set = _descriptor(256)
+    struct.pack_into("<IIH", file_set, 400, SECTOR_SIZE, 1, 1 if metadata else 0)
+    put(partition_start + metadata_base, file_set)
+
+    def identifier(name: bytes, characteristics: int) -> bytes:
+        fid = bytearray(38)
+        struct.pack_into("<H", fid, 0, 257)
+        fid[18] = characteristics
+        fid[19] = len(name)
+        fid += name
+        return bytes(fid + b"\x00" * (-len(fid) % 4))
+
+    entries = identifier(b"", 0x0A) + b"".join(identifier(b"\x08" + d.encode(), 0x02) for d in dirs)
+    entries += identifier(b"\x10" + "readme.txt".encode("utf-16-be"), 0x00)
+
+    root = _descriptor(261)
+    struct.pack_into("<II", root, 168, 0, 8)
+    struct.pack_into("<II", root, 176, len(entries), 2)
+    put(partition_start + metadata_base + 1, root)
+    put(partition_start + metadata_base + 2, entries)
+
+    path.write_bytes(bytes(image))
+    return path
+
+
+class TestISOImage:
+    """test ISOImage"""
+
+    @staticmethod
+    def test_iso9660(tmp_path: Path) -> None:
+        """root directories of an ISO9660 image"""
+
+        image = _iso9660(tmp_path.joinpath("Alien_D01.iso"), ["AUDIO_TS", "VIDEO_TS"])
+        with ISOImage(image) as iso:
+            assert iso.root_dirs() == ["AUDIO_TS", "VIDEO_TS"]
+
+    @staticmethod
+    @pytest.mark.parametrize("metadata", [False, True])
+    def test_udf(tmp_path: Path, metadata: bool) -> None:
+        """root directories of a UDF image, with and without a metadata partition"""
+
+        image = _udf(tmp_path.joinpath("Dune_D01.iso"), ["BDMV", "CERTIFICATE"], metadata=metadata)
+        assert iso_root_dirs(image) == ["BDMV", "CERTIFICATE"]
+
+    @staticmethod
+    def test_unreadable(tmp_path: Path) -> None:
+        """images without volume descriptors"""
+
+        image = tmp_path.joinpath("junk.iso")
+        image.write_bytes(b"\x00" * SECTOR_SIZE * 32)
+        with pytest.raises(ImageFormatError):
+            with ISOImage(image) as iso:
+                iso.root_dirs()
+
+        tmp_path.joinpath("empty.iso").touch()
+        assert iso_root_dirs(tmp_path.joinpath("empty.iso")) == []
+        assert iso_root_dirs(image) == []
+
+    @staticmethod
+    def test_truncated_record(tmp_path: Path) -> None:
+        """a directory extent that ends inside a record"""
+
+        image = _iso9660(tmp_path.joinpath("Alien_D01.iso"), ["VIDEO_TS"])
+        data = bytearray(image.read_bytes())
+        # Root directory extent ends 16 bytes into the last record, before its flags
+        size = struct.unpack_from("<I", data, 16 * SECTOR_SIZE + 156 + 10)[0]
+        struct.pack_into("<I", data, 16 * SECTOR_SIZE + 156 + 10, size - 30)
+        image.write_bytes(bytes(data))
+
+        with pytest.raises(ImageFormatError):
+            with ISOImage(image) as iso:
+                iso.root_dirs()
+        assert iso_root_dirs(image) == []
+
+    @staticmethod
+    def test_walk_disc_archive(tmp_path: Path) -> None:
+        """ISO images in the archive are inventoried as discs"""
+
+        movies = tmp_path.joinpath("movies")
+        movies.joinpath("Alien").mkdir(parents=True)
+        movies.joinpath("Dune").mkdir(parents=True)
+        _iso9660(movies.joinpath("Alien/Alien_D01.iso"), ["VIDEO_TS"])
+        _udf(movies.joinpath("Dune/Dune_D01.iso"), ["BDMV"], metadata=True)
+        _iso9660(movies.joinpath("Dune/Extras.iso"), ["PICTURES"])
+
+        discs = sorted(ArchivedDisc.walk_disc_archive(tmp_path), key=lambda d: str(d.path))
+        assert [(d.title, d.disc_name, d.type, d.iso) for d in discs] == [
+            ("Alien", "Alien_D01", OpticalDiscType.DVD, True),
+            ("Dune", "Dune_D01", OpticalDiscType.BLU_RAY, True),
+        ]
+        assert all(d.category == MediaCategory.MOVIE for d in discs)
+        assert ArchivedDisc.from_dir(movies.joinpath("Alien/Alien_D01.iso")) == discs[0]
@@ -0,0 +1,235 @@
+import asyncio
+import os
+import stat
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+from rkiv import makemkv
+from rkiv.arm import UserInput
+from rkiv.inventory import ArchivedDisc, MediaCategory, OpticalDiscType
+from rkiv.opticaldevices import OpticalDrive
+from rkiv.makemkv import (
+    AspectRatio,
+    MakeMKVInfo,
+    MakeMKVRipper,
+    MakeMKVTitleInfo,
+    RobotParser,
+    TitelInfoMMKV,
+    VideoStreamInfo,
+    classify_line,
+    extract_mkv,
+)
+
+
+def robot_dump(titles: int, aspect: str = "16:9") -> list[str]:
+    """makemkvcon -r info output for a disc with `titles` titles of one video, two audio and a subtitle stream"""
+
+    lines = [
+        'MSG:1005,0,1,"MakeMKV v1.17.4 linux(x64-release) started","%1 started","MakeMKV v1.17.4 linux(x64-release)"',
+        'CINFO:1,6209,"Blu-ray disc"',
+        'CINFO:2,0,"Alien, Director\'s Cut"',
+        f"TCOUNT:{titles}",
+    ]
+    for t in range(titles):
+        lines += [
+            f'TINFO:{t},8,0,"{t % 32}"',
+            f'TINFO:{t},9,0,"{t // 60}:{t % 60:02d}:30"',
+            f'TINFO:{t},11,0,"{(t + 1) * 1024**3}"',
+            f'TINFO:{t},16,0,"{t:05d}.mpls"',
+            f'TINFO:{t},27,0,"Alien_t{t:02d}.mkv"',
+            f'SINFO:{t},0,1,6201,"Video"',
+            f'SINFO:{t},0,6,0,"V_MPEG4/ISO/AVC"',
+            f'SINFO:{t},0,19,0,"1920x1080"',
+            f'SINFO:{t},0,20,0,"{aspect}"',
+            f'SINFO:{t},0,21,0,"23.976 (24000/1001)"',
+            f'SINFO:{t},1,1,6202,"Audio"',
+            f'SINFO:{t},1,2,0,"Surround 7.1"',
+            f'SINFO:{t},1,3,0,"eng"',
+            f'SINFO:{t},1,6,0,"A_TRUEHD"',
+            f'SINFO:{t},2,1,6202,"Audio"',
+            f'SINFO:{t},2,3,0,"fra"',
+            f'SINFO:{t},3,1,6203,"Subtitles"',
+            f'SINFO:{t},3,3,0,"eng"',
+        ]
+    return lines
+
+
+class TestRobotParser:
+    """test RobotParser"""
+
+    @staticmethod
+    def test_parse() -> None:
+        """records are built in a single pass"""
+
+        parser = RobotParser.parse(robot_dump(3) + ["PRGV:10,20,40", "garbage", "TINFO:x,1,0,"])
+        assert parser.title_count == 3
+        assert parser.disc == {1: "Blu-ray disc", 2: "Alien, Director's Cut"}
+        assert list(parser.titles) == [0, 1, 2]
+        assert [s.type for s in parser.titles[1].streams.values()] == ["Video", "Audio", "Audio", "Subtitles"]
+        assert parser.progress == (10, 20, 40)
+        assert parser.messages[0].code == 1005
+        assert parser.messages[0].message == "MakeMKV v1.17.4 linux(x64-release) started"
+
+
+class TestMakeMKVInfo:
+    """test MakeMKVInfo"""
+
+    @staticmethod
+    def test_from_info() -> None:
+        """titles and streams"""
+
+        info = MakeMKVInfo.from_info("\n".join(robot_dump(3)))
+        assert info.name == "Alien, Director's Cut"
+        assert info.disc_type == "Blu-ray disc"
+        assert info.title_count == 3
+        assert [t.id for t in info.titles] == [0, 1, 2]
+
+        title = info.titles[2]
+        assert title.chapters == 2
+        assert title.length == timedelta(seconds=150)
+        assert title.size_bits == 3 * 1024**3
+        assert title.source_file == "00002.mpls"
+        assert title.export_name == "Alien_t02.mkv"
+        assert [a.language_code for a in title.audio_streams] == ["eng", "fra"]
+        assert [s.language_code for s in title.subtitle_streams] == ["eng"]
+        assert title.video_streams[0].resolution == "1920x1080"
+        assert info.gigabytes_titles == 6
+
+    @staticmethod
+    def test_csv_lists() -> None:
+        """the csv list constructors are views over the same records"""
+
+        lines = robot_dump(1)
+        tinfo = [i.partition(":")[2] for i in lines if i.startswith("TINFO")]
+        sinfo = [i.partition(":")[2] for i in lines if i.startswith("SINFO")]
+
+        title = MakeMKVTitleInfo.from_csv_lists(tinfo, sinfo)
+        assert title.id == 0
+        assert len(title.audio_streams) == 2
+        assert VideoStreamInfo.from_csv_list(sinfo[:5]).frame_rate == "23.976 (24000/1001)"
+
+
+class TestTitelInfoMMKV:
+    """test TitelInfoMMKV"""
+
+    @staticmethod
+    def test_parse_info() -> None:
+        """test it"""
+
+        titles = TitelInfoMMKV.parse_info(robot_dump(4, aspect="4:3"))
+        assert [t.id for t in titles] == [0, 1, 2, 3]
+        assert titles[3].streams == 4
+        assert titles[3].chapters == 3
+        assert titles[3].aspect_ratio == AspectRatio.FULL
+        assert max(titles).id == 3
+
+
+def test_extract_mkv(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """log lines are written as they arrive, progress is reported from PRGV"""
+
+    bin_dir = tmp_path.joinpath("bin")
+    bin_dir.mkdir()
+    script = bin_dir.joinpath("makemkvcon")
+    script.write_text(
+        "#!/bin/sh\n"
+        "for out; do :; done\n"
+        'echo \'MSG:1005,0,1,"MakeMKV started","%1 started","MakeMKV"\'\n'
+        "echo 'PRGV:0,25,100' >&2\n"
+        'echo \'MSG:2003,0,3,"Error reading sector 1024","%1","1024"\'\n'
+        "echo 'PRGV:0,100,100' >&2\n"
+        'touch "$out/title_t00.mkv"\n'
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(makemkv.CONFIG, "workspace", tmp_path.joinpath("temp"))
+
+    disc = ArchivedDisc(
+        title="Alien",
+        disc_name="Alien_D01",
+        path=tmp_path.joinpath("archive/Alien/Alien_D01"),
+        category=MediaCategory.MOVIE,
+        type=OpticalDiscType.DVD,
+        iso=False,
+        problem=False,
+    )
+    progress: list[float] = []
+    problems = extract_mkv(disc, tmp_path.joinpath("out"), 0, progress.append)
+
+    assert progress == [0.25, 1.0]
+    assert problems == ['MSG:2003,0,3,"Error reading sector 1024","%1","1024"']
+    assert [p.name for p in tmp_path.joinpath("out/Alien").iterdir()] == ["Alien.mkv"]
+
+    log = tmp_path.joinpath("logs/extract_mkv/Alien.log").read_text().splitlines()
+    assert len(log) == 2
+    assert extract_mkv(disc, tmp_path.joinpath("out"), 0) == ["Output path exists skipping title - Alien - 0"]
+
+
+def test_ripper_flood(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """a rip that writes more than a pipe buffer to stdout before touching stderr does not stall"""
+
+    bin_dir = tmp_path.joinpath("bin")
+    bin_dir.mkdir()
+    bin_dir.joinpath("eject").write_text("#!/bin/sh\n")
+    bin_dir.joinpath("makemkvcon").write_text(
+        "#!/bin/sh\n"
+        "i=0\n"
+        "while [ $i -lt 20000 ]; do\n"
+        '  echo "MSG:3307,0,2,\\"File 00$i.m2ts was added as title #$i\\",\\"%1\\",\\"$i\\""\n'
+        "  i=$((i + 1))\n"
+        "done\n"
+        "echo 'PRGV:0,65536,65536' >&2\n"
+        'echo \'MSG:2003,0,3,"Error reading sector 1024","%1","1024"\'\n'
+    )
+    for f in bin_dir.iterdir():
+        f.chmod(f.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(makemkv.CONFIG, "workspace", tmp_path.joinpath("temp"))
+    monkeypatch.setattr(makemkv.CONFIG, "video_rip_dir", tmp_path.joinpath("rips"))
+
+    drive = OpticalDrive(device_name="sr0", device_path=Path("/dev/sr0"), mount_path=Path("/media/sr0"))
+    progress: list[float] = []
+    ripper = MakeMKVRipper(stage="", progress=0.0, drive=drive, progress_callback=lambda _, p: progress.append(p))
+
+    out = asyncio.run(asyncio.wait_for(ripper.extract(UserInput(name="Alien", season=None, disc=1), drive), 30))
+
+    assert out == 'MSG:2003,0,3,"Error reading sector 1024","%1","1024"'
+    assert progress == [1.0]
+    assert len(ripper.messages) == makemkv.RIPPER_MESSAGES
+    assert ripper.messages[-1].code == 2003
+    assert ripper.messages[-1].message == "Error reading sector 1024"
+    assert ripper.messages[0].message == "File 0019901.m2ts was added as title #19901"
+
+    log = tmp_path.joinpath("logs/makemkv/Alien/Alien.D01.log").read_text()
+    assert len(log.splitlines()) == 20001
+
+
+@pytest.mark.parametrize(
+    "line,severity,code",
+    [
+        (
+            "MSG:2003,0,3,\"Error 'Scsi error' occurred while reading '/BDMV/STREAM/00800.m2ts' at offset '1024'\"",
+            "error",
+            2003,
+        ),
+        ('MSG:2016,0,3,"Failed to get full access to drive "PLDS DVDROM DH16D8SH".', None, None),
+        ('MSG:5010,0,0,"Failed to open disc","Failed to open disc"', "error", 5010),
+        ('MSG:3307,0,2,"File 00800.mpls was added as title #0","%1","00800.mpls"', None, None),
+        ('MSG:4004,0,1,"Title #3 was not written, AV sync failed","%1","3"', "error", 4004),
+        ("dvdbackup: error reading VTS_01_1.VOB", "error", None),
+        ("Failed to get full access to drive", None, None),
+        ("line0", None, None),
+    ],
+)
+def test_classify_line(line: str, severity: str | None, code: int | None) -> None:
+    """known codes first, then the message text"""
+
+    issue = classify_line(line + "\n")
+    if severity is None:
+        assert issue is None
+    else:
+        assert issue is not None
+        assert issue.severity.value == severity
+        assert issue.code == code
+        assert issue.line == line
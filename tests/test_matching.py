@@ -0,0 +1,113 @@
+from pathlib import Path
+
+import pytest
+
+from rkiv.inventory import ArchivedDisc, Inventory, MediaCategory, OpticalDiscType, StreamObject
+from rkiv.matching import TitleMatcher, normalize_title, title_year
+
+
+@pytest.mark.parametrize(
+    "title,key",
+    [
+        ("The_Thing_(1982)", "thing"),
+        ("Thing", "thing"),
+        ("Cheers_S01", "cheers s1"),
+        ("Cheers_S1", "cheers s1"),
+        ("Amélie", "amelie"),
+        ("Mr._Smith_Goes_to_Washington", "mr smith goes to washington"),
+        ("1917", "1917"),
+        ("The", "the"),
+        ("Blade_Runner_2049", "blade runner 2049"),
+        ("2001_A_Space_Odyssey", "2001 a space odyssey"),
+        ("Halloween_(2018)", "halloween"),
+    ],
+)
+def test_normalize_title(title: str, key: str) -> None:
+    """test it"""
+    assert normalize_title(title) == key
+
+
+def test_title_year() -> None:
+    """only a trailing parenthesized year is the year of the title"""
+    assert title_year("Halloween_(1978)") == 1978
+    assert title_year("Blade_Runner_2049") is None
+    assert title_year("1917") is None
+
+
+class TestTitleMatcher:
+    """test TitleMatcher"""
+
+    @staticmethod
+    def test_near_miss() -> None:
+        """closest title is found from the trigram candidates"""
+
+        matcher = TitleMatcher(["Alien", "Aliens", "Blade_Runner", "Brazil", "The_Thing"])
+
+        assert matcher.matches("Thing_(1982)")
+        assert not matcher.matches("Blade_Runer")
+
+        near_miss = matcher.near_miss("Blade_Runer")
+        assert near_miss is not None
+        assert near_miss.match_name == "Blade_Runner"
+        assert near_miss.score > 90
+
+        assert matcher.near_miss("Zzz") is None
+
+    @staticmethod
+    def test_remakes_and_sequels() -> None:
+        """dated titles only match the same year, a year inside a title is part of the title"""
+
+        matcher = TitleMatcher(["Blade_Runner", "Halloween_(1978)", "The_Thing_(1982)", "Alien"])
+
+        assert not matcher.matches("Blade_Runner_2049")
+        assert not matcher.matches("2001_A_Space_Odyssey")
+        assert not matcher.matches("Halloween_(2018)")
+        assert not matcher.matches("The_Thing_(2011)")
+        assert matcher.matches("Halloween")
+        assert matcher.matches("Thing_(1982)")
+        assert matcher.matches("Alien_(1979)")
+
+    @staticmethod
+    def test_inventory() -> None:
+        """normalized titles are released, the rest come with a near miss"""
+
+        def disc(title: str, category: MediaCategory) -> ArchivedDisc:
+            return ArchivedDisc(
+                title=title,
+                disc_name=f"{title}_D01",
+                path=Path(f"/archive/{category.value}/{title}/{title}_D01"),
+                category=category,
+                type=OpticalDiscType.DVD,
+                iso=False,
+                problem=False,
+            )
+
+        def stream(match_name: str, category: MediaCategory) -> StreamObject:
+            return StreamObject(
+                title=match_name, path=Path(f"/stream/{match_name}"), category=category, match_name=match_name
+            )
+
+        inventory = Inventory.from_media(
+            stream_objects=[
+                stream("The_Thing", MediaCategory.MOVIE),
+                stream("Cheers_S1", MediaCategory.TV),
+                stream("Halloween_(1978)", MediaCategory.MOVIE),
+                stream("Blade_Runner", MediaCategory.MOVIE),
+            ],
+            archived_discs=[
+                disc("Thing_(1982)", MediaCategory.MOVIE),
+                disc("The_Thingg", MediaCategory.MOVIE),
+                disc("Cheers_S01", MediaCategory.TV),
+                disc("Halloween_(1978)", MediaCategory.MOVIE),
+                disc("Halloween_(2018)", MediaCategory.MOVIE),
+                disc("Blade_Runner", MediaCategory.MOVIE),
+                disc("Blade_Runner_2049", MediaCategory.MOVIE),
+            ],
+        )
+
+        assert [d.title for d in inventory.unreleased_movies] == ["The_Thingg", "Halloween_(2018)", "Blade_Runner_2049"]
+        assert len(inventory.unreleased_tv) == 0
+
+        near_miss = inventory.near_miss(inventory.unreleased_movies[0])
+        assert near_miss is not None
+        assert near_miss.match_name == "The_Thing"
@@ -0,0 +1,75 @@
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+
+from rkiv import makemkv
+from rkiv.inventory import ArchivedDisc, MediaCategory, OpticalDiscType
+from rkiv.makemkv import MakeMKVInfo, extract_mkv
+from rkiv.replay import Recording, record, replay_rips, replay_sandbox, simulated_drives, write_shims
+
+
+@pytest.fixture
+def shims(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """stand-ins first on PATH replaying 50 times faster than recorded"""
+
+    bin_dir = tmp_path.joinpath("bin")
+    write_shims(bin_dir, recordings=tmp_path.joinpath("recordings"), speed=50.0, errors=[2003])
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("HOME", str(tmp_path.joinpath("home")))
+    monkeypatch.setattr(makemkv.CONFIG, "workspace", tmp_path.joinpath("temp"))
+    monkeypatch.setattr(makemkv.CONFIG, "video_rip_dir", tmp_path.joinpath("rips"))
+    return tmp_path.joinpath("recordings")
+
+
+def test_record(tmp_path: Path) -> None:
+    """lines are saved with the time they arrived"""
+
+    recording = record(["sh", "-c", "echo one; sleep 0.2; echo two >&2; echo three"], tmp_path)
+    assert [line for _, line in recording.stdout] == ["one", "three"]
+    assert [line for _, line in recording.stderr] == ["two"]
+    assert recording.stdout[1][0] >= 0.2
+    assert Recording.load(tmp_path, "sh", "sh") == recording
+
+
+def test_replay(shims: Path, tmp_path: Path) -> None:
+    """recorded scans and synthesized rips run through the real code paths"""
+
+    Recording(
+        tool="makemkvcon",
+        command="info",
+        stdout=[(0.0, 'CINFO:2,0,"Recorded"'), (0.5, "TCOUNT:1"), (1.0, 'TINFO:0,9,0,"1:30:00"')],
+        seconds=1.0,
+    ).save(shims)
+    info = MakeMKVInfo.scan_disc(tmp_path)
+    assert info.name == "Recorded"
+    assert info.titles[0].chapters == 0
+
+    disc = ArchivedDisc(
+        title="Alien",
+        disc_name="Alien_D01",
+        path=tmp_path.joinpath("Alien_D01"),
+        category=MediaCategory.MOVIE,
+        type=OpticalDiscType.BLU_RAY,
+        iso=False,
+        problem=False,
+    )
+    progress: list[float] = []
+    problems = extract_mkv(disc, tmp_path.joinpath("out"), 0, progress.append)
+    assert problems == ['MSG:2003,0,1,"Injected error 2003","Injected error %1","2003"']
+    assert progress[-1] == 1.0
+    assert tmp_path.joinpath("out/Alien/Alien.mkv").stat().st_size == 1024**2
+
+    # the sandbox keeps the synthetic rips and logs under its root and restores PATH and the config afterwards
+    root = tmp_path.joinpath("sandbox")
+    path = os.environ["PATH"]
+    with replay_sandbox(root) as bin_dir:
+        write_shims(bin_dir, speed=50.0)
+        seconds = asyncio.run(replay_rips(simulated_drives(2, root)))
+    assert list(seconds) == ["sr0", "sr1"]
+    assert len(list(root.joinpath("rips/makemkv/Replay_sr1/Replay_sr1.D01").iterdir())) == 1
+    assert root.joinpath("logs/makemkv/Replay_sr1/Replay_sr1.D01.log").exists()
+    assert os.environ["PATH"] == path
+    assert makemkv.CONFIG.video_rip_dir == tmp_path.joinpath("rips")
+    assert not tmp_path.joinpath("rips/makemkv").exists()
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import stat
+from pathlib import Path
+
+import pytest
+
+from rkiv.fingerprint import disc_fingerprint
+from rkiv.makemkv import MakeMKVInfo
+from rkiv.scancache import ScanCache
+
+ROBOT_OUTPUT = """CINFO:2,0,"Dune"
+TCOUNT:1
+TINFO:0,9,0,"2:17:00"
+TINFO:0,11,0,"1024"
+SINFO:0,0,1,6201,"Video"
+"""
+
+
+@pytest.fixture
+def blu_ray(tmp_path: Path) -> Path:
+    """Blu-ray backup"""
+
+    disc = tmp_path.joinpath("archive/movies/Dune/Dune_D01")
+    disc.joinpath("BDMV").mkdir(parents=True)
+    disc.joinpath("BDMV/index.bdmv").write_bytes(b"INDX0200")
+    disc.joinpath("BDMV/MovieObject.bdmv").write_bytes(b"MOBJ0200")
+    return disc
+
+
+@pytest.fixture
+def makemkvcon(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """makemkvcon on PATH that prints a scan and counts its runs"""
+
+    bin_dir = tmp_path.joinpath("bin")
+    bin_dir.mkdir()
+    runs = tmp_path.joinpath("runs")
+    script = bin_dir.joinpath("makemkvcon")
+    script.write_text(f"#!/bin/sh\necho run >> {runs}\ncat <<'EOF'\n{ROBOT_OUTPUT}EOF\n")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("HOME", str(tmp_path.joinpath("home")))
+    return runs
+
+
+class TestScanCache:
+    """test ScanCache"""
+
+    @staticmethod
+    def test_fingerprint(blu_ray: Path, tmp_path: Path) -> None:
+        """same content, same fingerprint"""
+
+        copy = tmp_path.joinpath("copy/Dune_D01")
+        copy.joinpath("BDMV").mkdir(parents=True)
+        for f in blu_ray.joinpath("BDMV").iterdir():
+            copy.joinpath("BDMV", f.name).write_bytes(f.read_bytes())
+
+        assert disc_fingerprint(blu_ray) is not None
+        assert disc_fingerprint(blu_ray) == disc_fingerprint(copy)
+        assert disc_fingerprint(tmp_path) is None
+
+        # The AACS disc id wins over the BDMV tables
+        blu_ray.joinpath("AACS").mkdir()
+        blu_ray.joinpath("AACS/Unit_Key_RO.inf").write_bytes(b"UNIT KEY")
+        fingerprint = disc_fingerprint(blu_ray)
+        assert fingerprint is not None and fingerprint.startswith("aacs:")
+        assert fingerprint != disc_fingerprint(copy)
+
+    @staticmethod
+    def test_scan_disc(blu_ray: Path, makemkvcon: Path) -> None:
+        """second scan is served from the cache until it is invalidated or the tool changes"""
+
+        first = MakeMKVInfo.scan_disc(blu_ray)
+        second = MakeMKVInfo.scan_disc(blu_ray)
+        assert makemkvcon.read_text().count("run") == 1
+        assert first.name == second.name == "Dune"
+        assert [t.length for t in second.titles] == [t.length for t in first.titles]
+
+        cache = ScanCache()
+        stats = cache.stats()[0]
+        assert (stats.tool, stats.entries, stats.hits, stats.misses) == ("makemkvcon", 1, 1, 1)
+        assert stats.hit_rate == 0.5
+
+        assert cache.invalidate(path=blu_ray.parent.parent) == 1
+        MakeMKVInfo.scan_disc(blu_ray)
+        assert makemkvcon.read_text().count("run") == 2
+
+        # Upgrading the tool makes the stored scans stale
+        tool = makemkvcon.parent.joinpath("bin/makemkvcon")
+        tool.write_text(tool.read_text() + "\n")
+        MakeMKVInfo.scan_disc(blu_ray)
+        assert makemkvcon.read_text().count("run") == 3
+
+        # A disc whose fingerprint changes replaces its stored scan rather than adding another
+        blu_ray.joinpath("AACS").mkdir()
+        blu_ray.joinpath("AACS/Unit_Key_RO.inf").write_bytes(b"UNIT KEY")
+        MakeMKVInfo.scan_disc(blu_ray)
+        assert makemkvcon.read_text().count("run") == 4
+        assert cache.stats()[0].entries == 1
+
+        # Scans stored under the fingerprints of an older version are dropped
+        con = sqlite3.connect(cache.path)
+        con.execute("PRAGMA user_version = 0")
+        con.close()
+        assert cache.stats()[0].entries == 0
@@ -0,0 +1,227 @@
+import asyncio
+import os
+import stat
+from pathlib import Path
+
+import pytest
+
+from rkiv import makemkv
+from rkiv.arm import UserInput
+from rkiv.makemkv import MakeMKVInfo, MakeMKVRipper, classify_output
+from rkiv.opticaldevices import OpticalDrive
+from rkiv.titleselect import TitleRules, select_titles
+from rkiv.titlesignature import group_titles, parse_segments, unique_titles
+
+
+def scan(titles: list[tuple[str, int, str]]) -> MakeMKVInfo:
+    """scan of a disc with titles of (length, chapters, segments map)"""
+
+    lines = ['CINFO:2,0,"Disc"', f"TCOUNT:{len(titles)}"]
+    for t, (length, chapters, segments) in enumerate(titles):
+        h, m, s = (int(i) for i in length.split(":"))
+        lines += [
+            f'TINFO:{t},8,0,"{chapters}"',
+            f'TINFO:{t},9,0,"{length}"',
+            f'TINFO:{t},11,0,"{(h * 3600 + m * 60 + s) * 1024**2}"',
+            f'TINFO:{t},26,0,"{segments}"',
+            f'SINFO:{t},0,1,6201,"Video"',
+        ]
+    return MakeMKVInfo.from_info("\n".join(lines))
+
+
+class TestSelectTitles:
+    """test select_titles"""
+
+    @staticmethod
+    def test_movie() -> None:
+        """main feature only, duplicate playlists and extras are skipped"""
+
+        info = scan(
+            [
+                ("0:01:30", 1, "10"),
+                ("2:01:00", 24, "1,2,3"),
+                ("2:01:00", 24, "1,2,3"),
+                ("0:20:00", 4, "7"),
+                ("1:58:00", 22, "1,3"),
+            ]
+        )
+        selection = select_titles(info)
+
+        assert selection.ids == [1]
+        assert selection.reasons[0].startswith("shorter than")
+        assert selection.reasons[2] == "duplicate of title 1"
+        assert selection.reasons[3] == selection.reasons[4] == "extra"
+        assert selection.seconds_saved(100.0) == pytest.approx(100.0 * (1.5 + 121 + 20 + 118) / 121, rel=0.01)
+
+        extras = select_titles(info, TitleRules(extras=True))
+        assert extras.ids == [1, 3, 4]
+
+    @staticmethod
+    def test_episodes() -> None:
+        """episode clusters are selected and the play all title is skipped"""
+
+        info = scan(
+            [
+                ("2:56:30", 16, "1,2,3,4"),
+                ("0:44:00", 4, "1"),
+                ("0:43:10", 4, "2"),
+                ("0:44:40", 4, "3"),
+                ("0:44:50", 4, "4"),
+                ("0:10:00", 1, "5"),
+            ]
+        )
+        selection = select_titles(info)
+
+        assert selection.ids == [1, 2, 3, 4]
+        assert selection.reasons[0] == "play all of episodes 2, 1, 3, 4"
+        assert selection.reasons[5] == "extra"
+
+        with_extras = select_titles(info, TitleRules(extras=True))
+        assert with_extras.ids == [1, 2, 3, 4, 5]
+
+
+def test_obfuscation_playlists() -> None:
+    """playlists that shuffle the same segments are one group, represented by the first playlist"""
+
+    assert parse_segments("3,1-2,x") == (3, 1, 2)
+
+    info = scan(
+        [
+            ("1:50:00", 20, "40,41,42"),
+            ("1:50:00", 20, "42,40,41"),
+            ("1:50:00", 20, "40-42"),
+            ("1:50:00", 20, "40,41,43"),
+            ("0:05:00", 1, "90"),
+        ]
+    )
+    groups = group_titles(info.titles)
+
+    assert [[t.id for t in g.titles] for g in groups] == [[0, 1, 2], [3], [4]]
+    assert [t.id for t in groups[0].duplicates] == [1, 2]
+    assert [t.id for t in unique_titles(info.titles)] == [0, 3, 4]
+    assert select_titles(info, TitleRules(extras=True)).ids == [0, 3, 4]
+
+
+def test_ripper_selection(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """one makemkvcon run per selected title, the skipped titles are logged"""
+
+    bin_dir = tmp_path.joinpath("bin")
+    bin_dir.mkdir()
+    runs = tmp_path.joinpath("runs")
+    bin_dir.joinpath("eject").write_text("#!/bin/sh\n")
+    calls = tmp_path.joinpath("calls")
+    bin_dir.joinpath("makemkvcon").write_text(
+        f'#!/bin/sh\necho "$*" >> {calls}\necho "$7" >> {runs}\necho \'PRGV:0,1,1\' >&2\n'
+    )
+    for f in bin_dir.iterdir():
+        f.chmod(f.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(makemkv.CONFIG, "workspace", tmp_path.joinpath("temp"))
+    monkeypatch.setattr(makemkv.CONFIG, "video_rip_dir", tmp_path.joinpath("rips"))
+
+    selection = select_titles(
+        scan([("0:44:00", 4, "1"), ("0:01:00", 1, "9"), ("0:44:10", 4, "2"), ("0:44:20", 4, "3")])
+    )
+    drive = OpticalDrive(device_name="sr0", device_path=Path("/dev/sr0"), mount_path=Path("/media/sr0"))
+    progress: list[float] = []
+    ripper = MakeMKVRipper(stage="", progress=0.0, drive=drive, progress_callback=lambda _, p: progress.append(p))
+    asyncio.run(ripper.extract(UserInput(name="Cheers", season=1, disc=1), drive, selection))
+
+    assert runs.read_text().split() == ["0", "2", "3"]
+    # the ids come from a scan at --minlength=0, which is what numbers the titles of every rip
+    assert all(c.split()[:4] == ["mkv", "-r", "--noscan", "--minlength=0"] for c in calls.read_text().splitlines())
+    assert progress[-1] == pytest.approx(1.0)
+    assert progress == sorted(progress)
+
+    log = tmp_path.joinpath("logs/makemkv/Cheers/Cheers.S01.D01.log").read_text()
+    assert "rkiv: SKIP title 1" in log
+    assert "skipped 1 titles saving about" in log
+
+    # a disc of short titles selects nothing and is ripped whole rather than ejected unripped
+    asyncio.run(
+        ripper.extract(UserInput(name="Short", season=0, disc=1), drive, select_titles(scan([("0:01:00", 1, "9")])))
+    )
+    assert runs.read_text().split()[-1] == "all"
+
+
+def test_backup_remux(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """the disc is decrypted once and ejected, then the selected titles are remuxed from the backup in parallel"""
+
+    bin_dir = tmp_path.joinpath("bin")
+    bin_dir.mkdir()
+    calls = tmp_path.joinpath("calls")
+    empty = tmp_path.joinpath("empty")
+    info = tmp_path.joinpath("info")
+    info.write_text(
+        "\n".join(
+            [
+                'CINFO:2,0,"Disc"',
+                "TCOUNT:2",
+                'TINFO:5,8,0,"4"',
+                'TINFO:5,9,0,"0:44:10"',
+                'TINFO:5,26,0,"2"',
+                'TINFO:6,8,0,"4"',
+                'TINFO:6,9,0,"0:44:00"',
+                'TINFO:6,26,0,"1"',
+            ]
+        )
+        + "\n"
+    )
+    bin_dir.joinpath("eject").write_text(f"#!/bin/sh\necho eject >> {calls}\n")
+    bin_dir.joinpath("makemkvcon").write_text(
+        "#!/bin/sh\n"
+        "for out; do :; done\n"
+        f'echo "$*" >> {calls}\n'
+        'case "$*" in\n'
+        "  mkv*) echo 'PRGV:0,1,1' >&2\n"
+        f'        test -e {empty} || echo MKV > "$out/title_t$(echo "$*" | awk \'{{print $(NF-1)}}\').mkv" ;;\n'
+        '  backup*) mkdir -p "$out/BDMV" && echo INDX > "$out/BDMV/index.bdmv" && echo MOBJ > "$out/BDMV/MovieObject.bdmv" ;;\n'
+        f"  *) cat {info} ;;\n"
+        "esac\n"
+    )
+    for f in bin_dir.iterdir():
+        f.chmod(f.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("HOME", str(tmp_path.joinpath("home")))
+    monkeypatch.setattr(makemkv.CONFIG, "workspace", tmp_path.joinpath("temp"))
+    monkeypatch.setattr(makemkv.CONFIG, "video_rip_dir", tmp_path.joinpath("rips"))
+
+    selection = select_titles(scan([("0:44:00", 4, "1"), ("0:44:10", 4, "2"), ("0:44:20", 4, "3")]))
+    drive = OpticalDrive(device_name="sr0", device_path=Path("/dev/sr0"), mount_path=Path("/media/sr0"))
+    ripper = MakeMKVRipper(stage="", progress=0.0, drive=drive, progress_callback=lambda *_: None)
+    user_input = UserInput(name="Cheers", season=1, disc=1)
+
+    backup, out = asyncio.run(ripper.backup(user_input, drive))
+    assert out == ""
+    assert calls.read_text().splitlines()[-1] == "eject"
+    assert backup.joinpath("BDMV/index.bdmv").exists()
+
+    out = asyncio.run(ripper.remux(user_input, backup, selection, workers=2))
+    remuxes = [c.split() for c in calls.read_text().splitlines() if c.startswith("mkv")]
+    assert all(c[:4] == ["mkv", "-r", "--noscan", "--minlength=0"] for c in remuxes)
+    remuxed = [c[-2] for c in remuxes]
+    # titles 5 and 6 of the backup are titles 1 and 0 of the disc, title 2 is not found and is not remuxed
+    assert sorted(remuxed) == ["5", "6"]
+    assert out == f"rkiv: remux failed, title 2 was not found in the backup {backup}"
+    assert [i.line for i in classify_output(out.splitlines())] == [out]
+    assert ripper.progress == pytest.approx(1.0)
+    assert backup.exists()
+
+    selection = select_titles(scan([("0:44:00", 4, "1"), ("0:44:10", 4, "2")]))
+    # makemkvcon exiting cleanly without writing the titles keeps the backup
+    empty.touch()
+    _, output, _ = MakeMKVRipper.rip_paths(user_input)
+    for mkv in output.glob("*.mkv"):
+        mkv.unlink()
+    out = asyncio.run(ripper.remux(user_input, backup, selection, workers=2))
+    assert out == f"rkiv: remux failed, 0 of {len(selection.selected)} titles were written to {output}"
+    assert backup.exists()
+
+    empty.unlink()
+    assert asyncio.run(ripper.remux(user_input, backup, selection, workers=2)) == ""
+    assert not backup.exists()
+
+    backup.joinpath("BDMV").mkdir(parents=True)
+    selection.selected.clear()
+    assert "no titles to remux" in asyncio.run(ripper.remux(user_input, backup, selection))
+    assert backup.exists()